@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib import admin
 
-from .models import Comedor, ConfiguracionEncuesta, PuntoCaptura, RespuestaEncuesta, Sede, Turno
+from .models import AlertaComedor, Comedor, ConfiguracionEncuesta, PuntoCaptura, RespuestaEncuesta, Sede, Turno
 
 
 class TurnoAdminForm(forms.ModelForm):
@@ -36,6 +36,24 @@ class PuntoCapturaAdminForm(forms.ModelForm):
         return turno
 
 
+class ComedoresConSedeMixin:
+    # Los desplegables de comedor muestran "Sede - Comedor": los comedores se leen con su sede.
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'comedor':
+            kwargs.setdefault('queryset', Comedor.objects.select_related('sede'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class FiltroComedor(admin.RelatedFieldListFilter):
+    # Cada opcion muestra "Sede - Comedor": los comedores se leen con su sede en una sola consulta.
+    def field_choices(self, field, request, model_admin):
+        comedores = Comedor.objects.select_related('sede')
+        ordenamiento = self.field_admin_ordering(field, request, model_admin)
+        if ordenamiento:
+            comedores = comedores.order_by(*ordenamiento)
+        return [(comedor.pk, str(comedor)) for comedor in comedores]
+
+
 @admin.register(Sede)
 class SedeAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'activo')
@@ -63,10 +81,10 @@ class TurnoAdmin(admin.ModelAdmin):
 
 
 @admin.register(PuntoCaptura)
-class PuntoCapturaAdmin(admin.ModelAdmin):
+class PuntoCapturaAdmin(ComedoresConSedeMixin, admin.ModelAdmin):
     form = PuntoCapturaAdminForm
-    list_display = ('identificador', 'comedor', 'turno_defecto', 'activo')
-    list_filter = ('activo', 'comedor__sede', 'comedor', 'turno_defecto')
+    list_display = ('identificador', 'comedor', 'turno_defecto', 'limite_envios_minuto', 'activo')
+    list_filter = ('activo', 'comedor__sede', ('comedor', FiltroComedor), 'turno_defecto')
     search_fields = ('identificador', 'comedor__nombre', 'comedor__sede__nombre')
     ordering = ('identificador',)
     list_select_related = ('comedor', 'comedor__sede', 'turno_defecto')
@@ -79,7 +97,7 @@ class ConfiguracionEncuestaAdmin(admin.ModelAdmin):
 
 
 @admin.register(RespuestaEncuesta)
-class RespuestaEncuestaAdmin(admin.ModelAdmin):
+class RespuestaEncuestaAdmin(ComedoresConSedeMixin, admin.ModelAdmin):
     list_display = (
         'fecha_hora_registro',
         'sede',
@@ -87,8 +105,17 @@ class RespuestaEncuestaAdmin(admin.ModelAdmin):
         'turno',
         'satisfaccion_general',
     )
-    list_filter = ('sede', 'comedor', 'turno', 'fecha_hora_registro')
+    list_filter = ('sede', ('comedor', FiltroComedor), 'turno', 'fecha_hora_registro')
     search_fields = ('comentario', 'sede__nombre', 'comedor__nombre')
     ordering = ('-fecha_hora_registro',)
-    list_select_related = ('sede', 'comedor', 'turno')
+    list_select_related = ('sede', 'comedor__sede', 'turno')
     readonly_fields = ('fecha_hora_registro',)
+
+
+@admin.register(AlertaComedor)
+class AlertaComedorAdmin(ComedoresConSedeMixin, admin.ModelAdmin):
+    list_display = ('creada', 'comedor', 'turno', 'metrica', 'promedio_ventana', 'promedio_referencia', 'resuelta')
+    list_filter = ('metrica', 'sede', ('comedor', FiltroComedor), 'resuelta')
+    ordering = ('-creada',)
+    list_select_related = ('comedor__sede', 'turno')
+    readonly_fields = ('promedio_ventana', 'promedio_referencia', 'respuestas_ventana', 'creada')
@@ -0,0 +1,115 @@
+import math
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .catalogos import obtener_nombres_catalogo
+from .filtros import FiltrosPortal
+from .models import AlertaComedor, RespuestaEncuesta
+
+PREFIJO_ESTADO = 'encuestas:alertas:estado'
+TIEMPO_CACHE_ESTADO = 60 * 60 * 24 * 30
+ETIQUETAS_METRICA = {
+    'satisfaccion_general': 'Satisfaccion general',
+    'calidad_comida': 'Calidad',
+    'variedad_menu': 'Variedad',
+    'limpieza_comedor': 'Limpieza',
+    'tiempo_atencion_fila': 'Tiempo de atencion',
+}
+
+
+def procesar_respuesta(respuesta: RespuestaEncuesta) -> None:
+    # Estadisticas en linea por (comedor, turno), O(1) por respuesta: una media y varianza
+    # exponenciales como referencia y una ventana movil con su suma. Igual que los limites de envio,
+    # el estado vive en la cache compartida y su actualizacion concurrente es aproximada.
+    clave = f'{PREFIJO_ESTADO}:{respuesta.comedor_id}:{respuesta.turno_id or 0}'
+    estado = cache.get(clave) or {}
+    ventana = settings.ENCUESTAS_VENTANA_ALERTAS
+    alfa = settings.ENCUESTAS_ALFA_EWMA_ALERTAS
+
+    for campo in RespuestaEncuesta.campos_puntaje:
+        valor = getattr(respuesta, campo)
+        metrica = estado.get(campo)
+        if metrica is None or metrica['valores'].maxlen != ventana:
+            metrica = estado[campo] = {
+                'media': float(valor),
+                'varianza': 0.0,
+                'n': 0,
+                'valores': deque(maxlen=ventana),
+                'suma': 0,
+                'alerta_id': None,
+            }
+
+        diferencia = valor - metrica['media']
+        metrica['media'] += alfa * diferencia
+        metrica['varianza'] = (1 - alfa) * (metrica['varianza'] + alfa * diferencia**2)
+        metrica['n'] += 1
+        if len(metrica['valores']) == ventana:
+            metrica['suma'] -= metrica['valores'][0]
+        metrica['valores'].append(valor)
+        metrica['suma'] += valor
+
+        if metrica['n'] < 2 * ventana:
+            continue
+        promedio_ventana = metrica['suma'] / ventana
+        en_alerta = _fuera_de_rango(promedio_ventana, metrica['media'], metrica['varianza'], ventana)
+        if en_alerta and metrica['alerta_id'] is None:
+            metrica['alerta_id'] = AlertaComedor.objects.create(
+                sede_id=respuesta.sede_id,
+                comedor_id=respuesta.comedor_id,
+                turno_id=respuesta.turno_id,
+                metrica=campo,
+                promedio_ventana=promedio_ventana,
+                promedio_referencia=metrica['media'],
+                respuestas_ventana=ventana,
+                fecha=respuesta.fecha_local,
+            ).pk
+        elif not en_alerta and metrica['alerta_id'] is not None:
+            AlertaComedor.objects.filter(pk=metrica['alerta_id'], resuelta__isnull=True).update(
+                resuelta=timezone.now()
+            )
+            metrica['alerta_id'] = None
+
+    cache.set(clave, estado, TIEMPO_CACHE_ESTADO)
+
+
+def listar_alertas(filtros: FiltrosPortal, limite: int = 50) -> dict:
+    nombres = obtener_nombres_catalogo()
+    filas = (
+        filtros.aplicar(AlertaComedor.objects.all(), campo_fecha='fecha')
+        .order_by(F('resuelta').asc(nulls_first=True), '-creada')
+        .values(
+            'sede_id',
+            'comedor_id',
+            'turno_id',
+            'metrica',
+            'promedio_ventana',
+            'promedio_referencia',
+            'respuestas_ventana',
+            'creada',
+            'resuelta',
+        )[:limite]
+    )
+    alertas = [
+        {
+            **fila,
+            'sede': nombres['sedes'].get(fila['sede_id'], ''),
+            'comedor': nombres['comedores'].get(fila['comedor_id'], ''),
+            'turno': nombres['turnos'].get(fila['turno_id'], '') if fila['turno_id'] else '',
+            'metrica': ETIQUETAS_METRICA.get(fila['metrica'], fila['metrica']),
+            'creada': timezone.localtime(fila['creada']),
+            'resuelta': fila['resuelta'] and timezone.localtime(fila['resuelta']),
+        }
+        for fila in filas
+    ]
+    return {'alertas': alertas, 'alertas_abiertas': sum(1 for alerta in alertas if alerta['resuelta'] is None)}
+
+
+def _fuera_de_rango(promedio_ventana: float, referencia: float, varianza: float, ventana: int) -> bool:
+    if promedio_ventana <= settings.ENCUESTAS_PROMEDIO_MINIMO_ALERTA:
+        return True
+    error = math.sqrt(varianza / ventana)
+    return error > 0 and referencia - promedio_ventana > settings.ENCUESTAS_DESVIACIONES_ALERTA * error
@@ -0,0 +1,111 @@
+import math
+from itertools import combinations_with_replacement
+
+from django.db.models import Count, F, Sum
+
+from .catalogos import obtener_nombres_catalogo
+from .filtros import FiltrosPortal
+from .fragmentos import repartir
+from .models import RespuestaEncuesta
+
+OBJETIVO = 'satisfaccion_general'
+IMPULSORES = ['calidad_comida', 'variedad_menu', 'limpieza_comedor', 'tiempo_atencion_fila']
+CAMPOS = [OBJETIVO, *IMPULSORES]
+
+
+def analizar_impulsores(filtros: FiltrosPortal) -> dict:
+    # Las sumas, sumas de cuadrados y productos cruzados por comedor son estadisticos suficientes
+    # para correlaciones y regresion lineal: se calculan en una consulta agrupada por base (y se
+    # suman entre fragmentos), sin que la base devuelva filas individuales.
+    anotaciones = {'n': Count('id')}
+    for campo in CAMPOS:
+        anotaciones[f's_{campo}'] = Sum(campo)
+    for campo_a, campo_b in combinations_with_replacement(CAMPOS, 2):
+        anotaciones[f'p_{campo_a}__{campo_b}'] = Sum(F(campo_a) * F(campo_b))
+    por_comedor = {}
+    for respuestas in repartir(filtros.aplicar(RespuestaEncuesta.objects.all()), filtros.sede_id):
+        for fila in respuestas.order_by().values('sede_id', 'comedor_id').annotate(**anotaciones):
+            acumulada = por_comedor.setdefault((fila['sede_id'], fila['comedor_id']), fila)
+            if acumulada is not fila:
+                for clave in anotaciones:
+                    acumulada[clave] = (acumulada[clave] or 0) + (fila[clave] or 0)
+    filas = list(por_comedor.values())
+
+    nombres = obtener_nombres_catalogo()
+    comedores = []
+    for fila in filas:
+        resultado = _analizar(fila)
+        resultado['sede_nombre'] = nombres['sedes'].get(fila['sede_id'], '')
+        resultado['comedor_nombre'] = nombres['comedores'].get(fila['comedor_id'], '')
+        resultado['comedor_id'] = fila['comedor_id']
+        comedores.append(resultado)
+    comedores.sort(key=lambda resultado: (resultado['sede_nombre'], resultado['comedor_nombre']))
+
+    total = {clave: sum(fila[clave] or 0 for fila in filas) for clave in anotaciones}
+    return {'objetivo': OBJETIVO, 'impulsores': IMPULSORES, 'general': _analizar(total), 'comedores': comedores}
+
+
+def _analizar(estadisticos: dict) -> dict:
+    n = estadisticos['n']
+    resultado = {
+        'respuestas': n,
+        'correlaciones': {campo: None for campo in IMPULSORES},
+        'pesos': {campo: None for campo in IMPULSORES},
+        'r2': None,
+        'principal': None,
+    }
+    if n < len(CAMPOS) + 1:
+        return resultado
+
+    covarianza = {}
+    for campo_a, campo_b in combinations_with_replacement(CAMPOS, 2):
+        suma_a = estadisticos[f's_{campo_a}']
+        suma_b = estadisticos[f's_{campo_b}']
+        valor = (estadisticos[f'p_{campo_a}__{campo_b}'] - suma_a * suma_b / n) / (n - 1)
+        covarianza[campo_a, campo_b] = covarianza[campo_b, campo_a] = valor
+
+    # Las metricas sin variacion (todas las respuestas iguales) no tienen correlacion definida.
+    con_varianza = [campo for campo in CAMPOS if covarianza[campo, campo] > 1e-12]
+    if OBJETIVO not in con_varianza:
+        return resultado
+
+    def correlacion(campo_a: str, campo_b: str) -> float:
+        return covarianza[campo_a, campo_b] / math.sqrt(covarianza[campo_a, campo_a] * covarianza[campo_b, campo_b])
+
+    explicativas = [campo for campo in IMPULSORES if campo in con_varianza]
+    for campo in explicativas:
+        resultado['correlaciones'][campo] = correlacion(campo, OBJETIVO)
+
+    # Pesos estandarizados: se resuelve R_xx * beta = r_xy con las correlaciones entre impulsores.
+    pesos = _resolver(
+        [[correlacion(campo_a, campo_b) for campo_b in explicativas] for campo_a in explicativas],
+        [resultado['correlaciones'][campo] for campo in explicativas],
+    )
+    if pesos is not None:
+        resultado['pesos'].update(zip(explicativas, pesos))
+        resultado['r2'] = sum(peso * resultado['correlaciones'][campo] for campo, peso in zip(explicativas, pesos))
+        resultado['principal'] = max(zip(explicativas, pesos), key=lambda par: abs(par[1]))[0]
+    return resultado
+
+
+def _resolver(matriz: list[list[float]], vector: list[float]) -> list[float] | None:
+    # Eliminacion de Gauss con pivoteo parcial; el sistema es de a lo sumo 4x4.
+    tamano = len(vector)
+    if not tamano:
+        return None
+    aumentada = [fila[:] + [valor] for fila, valor in zip(matriz, vector)]
+    for columna in range(tamano):
+        pivote = max(range(columna, tamano), key=lambda indice: abs(aumentada[indice][columna]))
+        if abs(aumentada[pivote][columna]) < 1e-10:
+            return None
+        aumentada[columna], aumentada[pivote] = aumentada[pivote], aumentada[columna]
+        for fila in range(columna + 1, tamano):
+            factor = aumentada[fila][columna] / aumentada[columna][columna]
+            for indice in range(columna, tamano + 1):
+                aumentada[fila][indice] -= factor * aumentada[columna][indice]
+
+    solucion = [0.0] * tamano
+    for fila in reversed(range(tamano)):
+        acumulado = sum(aumentada[fila][indice] * solucion[indice] for indice in range(fila + 1, tamano))
+        solucion[fila] = (aumentada[fila][tamano] - acumulado) / aumentada[fila][fila]
+    return solucion
@@ -0,0 +1,61 @@
+import logging
+import os
+import time
+from pathlib import Path
+
+from django.core.signals import request_finished, request_started
+
+VARIABLE_INICIO = 'ENCUESTAS_INICIO_PROCESO'
+MAXIMO_HERENCIA_INICIO = 300
+
+logger = logging.getLogger(__name__)
+_CARGA_MODULO = time.time()
+_aplicacion_lista = None
+_primera_solicitud = None
+
+
+def inicio_proceso() -> float:
+    # Hora de lanzamiento del proceso segun /proc (Linux) o, si no, la hora de carga de este modulo.
+    # Los workers de gunicorn son forks: heredan de arranque_rapido la hora del lanzamiento original,
+    # salvo que el worker se haya relanzado mucho despues (entonces cuenta su propio inicio).
+    propio = _inicio_segun_proc() or _CARGA_MODULO
+    heredado = os.getenv(VARIABLE_INICIO)
+    if heredado and propio - float(heredado) < MAXIMO_HERENCIA_INICIO:
+        return float(heredado)
+    return propio
+
+
+def esperar_primera_solicitud() -> None:
+    global _aplicacion_lista
+    _aplicacion_lista = time.time()
+    request_started.connect(_marcar_primera_solicitud, dispatch_uid='encuestas_arranque')
+    request_finished.connect(_reportar_arranque, dispatch_uid='encuestas_arranque')
+
+
+def _inicio_segun_proc() -> float | None:
+    try:
+        campos = Path('/proc/self/stat').read_text().rsplit(')', 1)[1].split()
+        inicio_tras_boot = int(campos[19]) / os.sysconf('SC_CLK_TCK')
+        return time.time() - (time.clock_gettime(time.CLOCK_BOOTTIME) - inicio_tras_boot)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _marcar_primera_solicitud(sender, **kwargs) -> None:
+    global _primera_solicitud
+    request_started.disconnect(dispatch_uid='encuestas_arranque')
+    _primera_solicitud = time.time()
+
+
+def _reportar_arranque(sender, **kwargs) -> None:
+    request_finished.disconnect(dispatch_uid='encuestas_arranque')
+    ahora = time.time()
+    inicio = inicio_proceso()
+    logger.info(
+        'Arranque en frio (pid %s): aplicacion lista a los %.2f s; primera solicitud servida a los %.2f s '
+        '(atendida en %.0f ms)',
+        os.getpid(),
+        _aplicacion_lista - inicio,
+        ahora - inicio,
+        (ahora - (_primera_solicitud or ahora)) * 1000,
+    )
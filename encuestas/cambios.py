@@ -0,0 +1,91 @@
+from django.db import connection, transaction
+
+from .models import CambioRespuesta, RespuestaEncuesta
+
+# Llave del advisory lock de PostgreSQL que ordena las escrituras del registro (cualquier entero fijo).
+BLOQUEO_REGISTRO_CAMBIOS = 4907
+
+CAMPOS_CAMBIO = [
+    'id',
+    'sede_id',
+    'comedor_id',
+    'turno_id',
+    'fecha_hora_registro',
+    'fecha_local',
+    *RespuestaEncuesta.campos_puntaje,
+    'comentario',
+]
+
+
+def registrar_altas(filas: list[dict]) -> None:
+    # Recibe las respuestas como diccionarios con CAMPOS_CAMBIO. Una respuesta ya registrada se ignora:
+    # recalcular_resumenes puede volver a pasar por respuestas que la senal ya agrego.
+    _agregar_cambios(
+        [
+            CambioRespuesta(
+                operacion=CambioRespuesta.Operacion.ALTA,
+                sede_id=fila['sede_id'],
+                respuesta_id=fila['id'],
+                datos={campo: fila[campo] for campo in CAMPOS_CAMBIO},
+            )
+            for fila in filas
+        ]
+    )
+
+
+def registrar_bajas(sede_id: int, respuesta_ids: list[int]) -> None:
+    _agregar_cambios(
+        [
+            CambioRespuesta(
+                operacion=CambioRespuesta.Operacion.BAJA,
+                sede_id=sede_id,
+                respuesta_id=respuesta_id,
+                datos={'id': respuesta_id, 'sede_id': sede_id},
+            )
+            for respuesta_id in respuesta_ids
+        ]
+    )
+
+
+def valores_respuesta(respuesta: RespuestaEncuesta) -> dict:
+    return {campo: getattr(respuesta, 'pk' if campo == 'id' else campo) for campo in CAMPOS_CAMBIO}
+
+
+def listar_cambios(desde: int, limite: int) -> dict:
+    # Lectura por rango de la llave primaria: el costo depende del tamano de la pagina, no del historial.
+    # Todo offset visible ya esta confirmado junto con los menores (ver _agregar_cambios).
+    cambios = list(
+        CambioRespuesta.objects.filter(id__gt=desde)
+        .order_by('id')
+        .values('id', 'operacion', 'registrado', 'datos')[: limite + 1]
+    )
+    hay_mas = len(cambios) > limite
+    cambios = cambios[:limite]
+    return {
+        'cambios': [
+            {
+                'offset': cambio['id'],
+                'operacion': cambio['operacion'],
+                'registrado': cambio['registrado'],
+                'respuesta': cambio['datos'],
+            }
+            for cambio in cambios
+        ],
+        'siguiente': cambios[-1]['id'] if cambios else desde,
+        'hay_mas': hay_mas,
+    }
+
+
+def _agregar_cambios(cambios: list[CambioRespuesta]) -> None:
+    # Los ids salen de una secuencia al insertar, no al confirmar: sin orden, una transaccion larga (un lote
+    # de purga, una carga de recalcular_resumenes) podria confirmar un offset menor que otro ya leido y el
+    # consumidor lo saltaria. En PostgreSQL un advisory lock de transaccion hace que quien inserta espere a
+    # que confirme el anterior; en SQLite la base ya admite un solo escritor a la vez. El lock se libera al
+    # confirmar la transaccion que registra el cambio, por eso se registra al final de cada una.
+    if not cambios:
+        return
+    with transaction.atomic(savepoint=False):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [BLOQUEO_REGISTRO_CAMBIOS])
+        CambioRespuesta.objects.bulk_create(cambios, batch_size=1000, ignore_conflicts=True)
@@ -0,0 +1,43 @@
+import time
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+CAMPOS_TIEMPO = ['fecha_local', 'hora_local', 'dia_semana']
+
+
+def rellenar_campos_tiempo(
+    modelo,
+    lote: int = 2000,
+    todas: bool = False,
+    pausa: float = 0.0,
+    al_avanzar=None,
+    alias: str = DEFAULT_DB_ALIAS,
+) -> int:
+    # Recibe el modelo como parametro para poder usarse tambien desde migraciones (modelo historico).
+    # Trabaja sobre una sola base: con fragmentos por sede, quien llama recorre aliases_respuestas().
+    ultimo_id = 0
+    actualizadas = 0
+    while True:
+        pendientes = modelo.objects.using(alias).filter(id__gt=ultimo_id)
+        if not todas:
+            pendientes = pendientes.filter(fecha_local__isnull=True)
+        filas = list(pendientes.order_by('id').values_list('id', 'fecha_hora_registro')[:lote])
+        if not filas:
+            return actualizadas
+
+        objetos = []
+        for respuesta_id, fecha_hora_registro in filas:
+            local = timezone.localtime(fecha_hora_registro)
+            objetos.append(
+                modelo(id=respuesta_id, fecha_local=local.date(), hora_local=local.hour, dia_semana=local.weekday())
+            )
+        with transaction.atomic(using=alias):
+            modelo.objects.using(alias).bulk_update(objetos, CAMPOS_TIEMPO)
+
+        ultimo_id = filas[-1][0]
+        actualizadas += len(filas)
+        if al_avanzar:
+            al_avanzar(actualizadas, ultimo_id)
+        if pausa:
+            time.sleep(pausa)
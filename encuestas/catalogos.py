@@ -0,0 +1,48 @@
+from django.core.cache import cache
+
+from .models import Comedor, Sede, Turno
+
+CLAVE_NOMBRES_CATALOGO = 'encuestas:catalogo:nombres'
+CLAVE_OPCIONES_FILTROS = 'encuestas:catalogo:opciones'
+CLAVE_TURNOS_ACTIVOS = 'encuestas:catalogo:turnos_activos'
+TIEMPO_CACHE_CATALOGO = 60 * 60
+
+
+def obtener_nombres_catalogo() -> dict[str, dict[int, str]]:
+    nombres = cache.get(CLAVE_NOMBRES_CATALOGO)
+    if nombres is None:
+        nombres = {
+            'sedes': dict(Sede.objects.order_by().values_list('id', 'nombre')),
+            'comedores': dict(Comedor.objects.order_by().values_list('id', 'nombre')),
+            'turnos': dict(Turno.objects.order_by().values_list('id', 'nombre')),
+        }
+        cache.set(CLAVE_NOMBRES_CATALOGO, nombres, TIEMPO_CACHE_CATALOGO)
+    return nombres
+
+
+def obtener_opciones_filtros() -> dict[str, list[dict]]:
+    opciones = cache.get(CLAVE_OPCIONES_FILTROS)
+    if opciones is None:
+        opciones = {
+            'sedes': list(Sede.objects.filter(activo=True).order_by('nombre').values('id', 'nombre')),
+            'comedores': list(
+                Comedor.objects.filter(activo=True)
+                .order_by('sede__nombre', 'nombre')
+                .values('id', 'nombre', 'sede_id', 'sede__nombre')
+            ),
+            'turnos': list(Turno.objects.filter(activo=True).order_by('nombre').values('id', 'nombre')),
+        }
+        cache.set(CLAVE_OPCIONES_FILTROS, opciones, TIEMPO_CACHE_CATALOGO)
+    return opciones
+
+
+def obtener_turnos_activos() -> list[Turno]:
+    turnos = cache.get(CLAVE_TURNOS_ACTIVOS)
+    if turnos is None:
+        turnos = list(Turno.objects.filter(activo=True).order_by('hora_inicio', 'nombre'))
+        cache.set(CLAVE_TURNOS_ACTIVOS, turnos, TIEMPO_CACHE_CATALOGO)
+    return turnos
+
+
+def invalidar_catalogo() -> None:
+    cache.delete_many([CLAVE_NOMBRES_CATALOGO, CLAVE_OPCIONES_FILTROS, CLAVE_TURNOS_ACTIVOS])
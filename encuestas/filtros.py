@@ -0,0 +1,97 @@
+import calendar
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+
+from django.http import HttpRequest
+from django.utils import timezone
+
+COMPARACIONES = {
+    'anterior': 'Periodo anterior',
+    'semana': 'Semana anterior',
+    'mes': 'Mes anterior',
+    'anio': 'Mismo periodo del ano anterior',
+}
+
+
+@dataclass(frozen=True)
+class FiltrosPortal:
+    sede_id: int | None = None
+    comedor_id: int | None = None
+    turno_id: int | None = None
+    sin_turno: bool = False
+    fecha_inicio: date | None = None
+    fecha_fin: date | None = None
+    comparar: str = ''
+
+    @classmethod
+    def desde_request(cls, request: HttpRequest) -> 'FiltrosPortal':
+        turno = request.GET.get('turno')
+        return cls(
+            sede_id=_parsear_id(request.GET.get('sede')),
+            comedor_id=_parsear_id(request.GET.get('comedor')),
+            turno_id=None if turno == 'sin_turno' else _parsear_id(turno),
+            sin_turno=turno == 'sin_turno',
+            fecha_inicio=_parsear_fecha(request.GET.get('fecha_inicio')),
+            fecha_fin=_parsear_fecha(request.GET.get('fecha_fin')),
+            comparar=request.GET.get('comparar') if request.GET.get('comparar') in COMPARACIONES else '',
+        )
+
+    def aplicar(self, queryset, campo_fecha: str = 'fecha_local', con_turno: bool = True):
+        if self.sede_id:
+            queryset = queryset.filter(sede_id=self.sede_id)
+        if self.comedor_id:
+            queryset = queryset.filter(comedor_id=self.comedor_id)
+        if con_turno:
+            if self.sin_turno:
+                queryset = queryset.filter(turno__isnull=True)
+            elif self.turno_id:
+                queryset = queryset.filter(turno_id=self.turno_id)
+        if self.fecha_inicio:
+            queryset = queryset.filter(**{f'{campo_fecha}__gte': self.fecha_inicio})
+        if self.fecha_fin:
+            queryset = queryset.filter(**{f'{campo_fecha}__lte': self.fecha_fin})
+        return queryset
+
+    @property
+    def filtra_turno(self) -> bool:
+        return self.sin_turno or self.turno_id is not None
+
+    def periodo_previo(self) -> 'FiltrosPortal | None':
+        # Mismos filtros sobre el periodo equivalente anterior. Sin fecha inicio no hay periodo que comparar;
+        # sin fecha fin el periodo actual termina hoy.
+        if not self.comparar or not self.fecha_inicio:
+            return None
+        inicio, fin = self.fecha_inicio, self.fecha_fin or timezone.localdate()
+        if self.comparar == 'anterior':
+            dias = timedelta(days=(fin - inicio).days + 1)
+            inicio, fin = inicio - dias, fin - dias
+        elif self.comparar == 'semana':
+            inicio, fin = inicio - timedelta(days=7), fin - timedelta(days=7)
+        else:
+            meses = 1 if self.comparar == 'mes' else 12
+            inicio, fin = _restar_meses(inicio, meses), _restar_meses(fin, meses)
+        return replace(self, fecha_inicio=inicio, fecha_fin=fin, comparar='')
+
+
+def _parsear_id(valor: str | None) -> int | None:
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        return None
+
+
+def _parsear_fecha(valor: str | None) -> date | None:
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        return None
+
+
+def _restar_meses(fecha: date, meses: int) -> date:
+    # El dia se ajusta al ultimo del mes si no existe (31 de marzo -> 28 o 29 de febrero).
+    anio, mes = divmod(fecha.year * 12 + fecha.month - 1 - meses, 12)
+    return date(anio, mes + 1, min(fecha.day, calendar.monthrange(anio, mes + 1)[1]))
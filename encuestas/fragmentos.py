@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+MODELO_FRAGMENTADO = 'encuestas.respuestaencuesta'
+
+
+def alias_de_sede(sede_id: int | None) -> str:
+    return settings.ENCUESTAS_FRAGMENTOS_SEDE.get(sede_id, DEFAULT_DB_ALIAS)
+
+
+def aliases_fragmentos() -> list[str]:
+    return sorted(set(settings.ENCUESTAS_FRAGMENTOS_SEDE.values()) - {DEFAULT_DB_ALIAS})
+
+
+def aliases_respuestas(sede_id: int | None = None) -> list[str]:
+    # Con una sede filtrada basta su base; si no, 'default' (sedes sin asignar) y cada fragmento.
+    if sede_id:
+        return [alias_de_sede(sede_id)]
+    return [DEFAULT_DB_ALIAS, *aliases_fragmentos()]
+
+
+def repartir(respuestas, sede_id: int | None = None) -> list:
+    # El mismo queryset de respuestas en cada base que puede tener filas; quien consulta combina
+    # los resultados (sumas y conteos, nunca promedios de promedios).
+    return [respuestas.using(alias) for alias in aliases_respuestas(sede_id)]
+
+
+def replicar_catalogo(instancia) -> None:
+    # Las respuestas de un fragmento apuntan a sedes, comedores y turnos con llaves foraneas:
+    # cada fragmento guarda una copia de esos catalogos con los mismos ids que 'default'.
+    valores = {
+        campo.attname: getattr(instancia, campo.attname)
+        for campo in instancia._meta.concrete_fields
+        if not campo.primary_key
+    }
+    for alias in aliases_fragmentos():
+        type(instancia).objects.using(alias).update_or_create(pk=instancia.pk, defaults=valores)
+
+
+def retirar_catalogo(instancia) -> None:
+    for alias in aliases_fragmentos():
+        type(instancia).objects.using(alias).filter(pk=instancia.pk).delete()
+
+
+class RouterFragmentos:
+    # Solo las respuestas se fragmentan: al guardar se elige la base por la sede de la respuesta.
+    # Las lecturas sin .using() van a 'default'; los reportes recorren las bases con repartir().
+
+    def db_for_write(self, model, **hints):
+        instancia = hints.get('instance')
+        if model._meta.label_lower == MODELO_FRAGMENTADO and isinstance(instancia, model):
+            return alias_de_sede(instancia.sede_id)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._meta.app_label == 'encuestas' and obj2._meta.app_label == 'encuestas':
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in aliases_fragmentos():
+            return app_label == 'encuestas'
+        return None
@@ -0,0 +1,124 @@
+import dataclasses
+import mmap
+import os
+import struct
+from collections import Counter, defaultdict
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .filtros import FiltrosPortal
+from .fragmentos import repartir
+from .models import RespuestaEncuesta
+
+# Archivo inmutable: cabecera y registros de tamano fijo ordenados por (fecha, sede, comedor, turno).
+# Cada registro guarda el conteo y la suma de las cinco metricas de un grupo; turno 0 es "sin turno".
+MAGIA = b'ENCI'
+VERSION = 1
+CABECERA = struct.Struct('<4sHII')
+REGISTRO = struct.Struct('<IIIII5I')
+CAMPOS_SUMA = [f's_{campo}' for campo in RespuestaEncuesta.campos_puntaje]
+
+_cargada = None
+
+
+class Instantanea:
+    def __init__(self, ruta: str):
+        # ACCESS_READ comparte las paginas del archivo entre todos los workers via la cache del
+        # sistema operativo: ningun proceso copia los datos a su propia memoria.
+        with open(ruta, 'rb') as archivo:
+            self._mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magia, version, corte, registros = CABECERA.unpack_from(self._mapa, 0)
+        if magia != MAGIA or version != VERSION:
+            raise ValueError(f'{ruta} no es una instantanea de respuestas valida.')
+        self.fecha_corte = date.fromordinal(corte)
+        self.registros = registros
+        self._datos = memoryview(self._mapa)[CABECERA.size:CABECERA.size + registros * REGISTRO.size]
+
+    def acumular(self, filtros: FiltrosPortal, grupos: dict) -> None:
+        desde = self._posicion(filtros.fecha_inicio.toordinal() if filtros.fecha_inicio else 0)
+        hasta_fecha = self.fecha_corte.toordinal() - 1
+        if filtros.fecha_fin:
+            hasta_fecha = min(hasta_fecha, filtros.fecha_fin.toordinal())
+        hasta = self._posicion(hasta_fecha + 1)
+        if desde >= hasta:
+            return
+
+        for _, sede_id, comedor_id, turno_id, total, *sumas in REGISTRO.iter_unpack(
+            self._datos[desde * REGISTRO.size:hasta * REGISTRO.size]
+        ):
+            if filtros.sede_id and sede_id != filtros.sede_id:
+                continue
+            if filtros.comedor_id and comedor_id != filtros.comedor_id:
+                continue
+            if filtros.sin_turno and turno_id:
+                continue
+            if filtros.turno_id and turno_id != filtros.turno_id:
+                continue
+            grupo = grupos[sede_id, comedor_id, turno_id or None]
+            grupo['total'] += total
+            for campo, suma in zip(CAMPOS_SUMA, sumas):
+                grupo[campo] += suma
+
+    def filtros_pendientes(self, filtros: FiltrosPortal) -> FiltrosPortal | None:
+        # Parte del rango que la instantanea no cubre (desde la fecha de corte): se consulta en vivo.
+        if filtros.fecha_fin and filtros.fecha_fin < self.fecha_corte:
+            return None
+        if filtros.fecha_inicio and filtros.fecha_inicio >= self.fecha_corte:
+            return filtros
+        return dataclasses.replace(filtros, fecha_inicio=self.fecha_corte)
+
+    def _posicion(self, ordinal: int) -> int:
+        # Primer registro con fecha >= ordinal (busqueda binaria sobre el campo fecha).
+        inicio, fin = 0, self.registros
+        while inicio < fin:
+            medio = (inicio + fin) // 2
+            if struct.unpack_from('<I', self._datos, medio * REGISTRO.size)[0] < ordinal:
+                inicio = medio + 1
+            else:
+                fin = medio
+        return inicio
+
+
+def obtener_instantanea() -> Instantanea | None:
+    # Un os.stat por consulta detecta si el archivo se reemplazo (nuevo inode) y se vuelve a mapear.
+    global _cargada
+    ruta = settings.ENCUESTAS_RUTA_INSTANTANEA
+    if not ruta:
+        return None
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    clave = (ruta, estado.st_ino, estado.st_mtime_ns, estado.st_size)
+    if _cargada is None or _cargada[0] != clave:
+        _cargada = (clave, Instantanea(ruta))
+    return _cargada[1]
+
+
+def construir_instantanea(fecha_corte: date, ruta: str | None = None) -> int:
+    # Agrega todos los dias anteriores a fecha_corte y escribe un archivo nuevo que reemplaza al
+    # anterior de forma atomica: los workers que aun mapean el viejo lo siguen leyendo sin errores.
+    ruta = Path(ruta or settings.ENCUESTAS_RUTA_INSTANTANEA)
+    anotaciones = {'total': Count('id'), **{campo: Sum(campo[2:]) for campo in CAMPOS_SUMA}}
+    grupos = defaultdict(Counter)
+    consulta = (
+        RespuestaEncuesta.objects.filter(fecha_local__lt=fecha_corte)
+        .order_by()
+        .values_list('fecha_local', 'sede_id', 'comedor_id', 'turno_id')
+        .annotate(**anotaciones)
+    )
+    for respuestas in repartir(consulta):
+        for fecha, sede_id, comedor_id, turno_id, *valores in respuestas:
+            grupos[fecha.toordinal(), sede_id, comedor_id, turno_id or 0].update(dict(zip(anotaciones, valores)))
+
+    temporal = ruta.with_name(f'{ruta.name}.{os.getpid()}.tmp')
+    with open(temporal, 'wb') as archivo:
+        archivo.write(CABECERA.pack(MAGIA, VERSION, fecha_corte.toordinal(), len(grupos)))
+        for clave in sorted(grupos):
+            grupo = grupos[clave]
+            archivo.write(REGISTRO.pack(*clave, grupo['total'], *(grupo[campo] for campo in CAMPOS_SUMA)))
+    os.replace(temporal, ruta)
+    return len(grupos)
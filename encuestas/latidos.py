@@ -0,0 +1,89 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import PuntoCaptura
+
+PREFIJO_LATIDO = 'encuestas:latidos:ultimo'
+PREFIJO_ENVIOS = 'encuestas:latidos:envios'
+CLAVE_VOLCADO = 'encuestas:latidos:volcado'
+TIEMPO_CACHE_LATIDO = 60 * 60 * 24 * 7
+TIEMPO_CACHE_ENVIOS = 60 * 60 * 3
+
+
+def registrar_latido(identificador: str) -> None:
+    cache.set(f'{PREFIJO_LATIDO}:{identificador}', time.time(), TIEMPO_CACHE_LATIDO)
+    if cache.add(CLAVE_VOLCADO, 1, settings.ENCUESTAS_INTERVALO_VOLCADO_LATIDOS):
+        volcar_latidos()
+
+
+def registrar_envio(identificador: str) -> None:
+    clave = f'{PREFIJO_ENVIOS}:{identificador}:{_hora_actual()}'
+    if not cache.add(clave, 1, TIEMPO_CACHE_ENVIOS):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 1, TIEMPO_CACHE_ENVIOS)
+
+
+def volcar_latidos() -> int:
+    puntos = list(PuntoCaptura.objects.only('id', 'identificador', 'ultimo_latido'))
+    latidos = _latidos_en_cache([punto.identificador for punto in puntos])
+
+    actualizados = []
+    for punto in puntos:
+        ultimo = latidos.get(punto.identificador)
+        if ultimo and (punto.ultimo_latido is None or ultimo > punto.ultimo_latido):
+            punto.ultimo_latido = ultimo
+            actualizados.append(punto)
+
+    if actualizados:
+        PuntoCaptura.objects.bulk_update(actualizados, ['ultimo_latido'], batch_size=500)
+    return len(actualizados)
+
+
+def estado_puntos(puntos: list[PuntoCaptura]) -> list[dict]:
+    identificadores = [punto.identificador for punto in puntos]
+    latidos = _latidos_en_cache(identificadores)
+    hora = _hora_actual()
+    claves_envios = {
+        f'{PREFIJO_ENVIOS}:{identificador}:{bloque}': (identificador, indice)
+        for identificador in identificadores
+        for indice, bloque in enumerate((hora, hora - 1))
+    }
+    envios = {identificador: [0, 0] for identificador in identificadores}
+    for clave, total in cache.get_many(list(claves_envios)).items():
+        identificador, indice = claves_envios[clave]
+        envios[identificador][indice] = total
+
+    ahora = datetime.now(dt_timezone.utc)
+    estados = []
+    for punto in puntos:
+        ultimo = max(
+            (valor for valor in (latidos.get(punto.identificador), punto.ultimo_latido) if valor),
+            default=None,
+        )
+        estados.append(
+            {
+                'punto': punto,
+                'ultimo_latido': ultimo,
+                'en_linea': bool(ultimo and (ahora - ultimo).total_seconds() <= settings.ENCUESTAS_VIGENCIA_LATIDO),
+                'envios_hora_actual': envios[punto.identificador][0],
+                'envios_hora_anterior': envios[punto.identificador][1],
+            }
+        )
+    return estados
+
+
+def _latidos_en_cache(identificadores: list[str]) -> dict[str, datetime]:
+    claves = {f'{PREFIJO_LATIDO}:{identificador}': identificador for identificador in identificadores}
+    return {
+        claves[clave]: datetime.fromtimestamp(marca, tz=dt_timezone.utc)
+        for clave, marca in cache.get_many(list(claves)).items()
+    }
+
+
+def _hora_actual() -> int:
+    return int(time.time() // 3600)
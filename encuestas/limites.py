@@ -0,0 +1,145 @@
+import ipaddress
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+
+from .models import PuntoCaptura
+
+logger = logging.getLogger(__name__)
+
+CLAVE_LIMITES_PUNTOS = 'encuestas:limites:puntos'
+PREFIJO_BALDE = 'encuestas:limites:balde'
+PREFIJO_RECHAZOS = 'encuestas:limites:rechazos'
+TIEMPO_CACHE_LIMITES = 60 * 60
+TIEMPO_CACHE_RECHAZOS = 60 * 60 * 24
+
+
+def limitar_envios_tablet(vista):
+    @wraps(vista)
+    def envoltura(request: HttpRequest, identificador: str, *args, **kwargs) -> HttpResponse:
+        if request.method == 'POST':
+            espera = verificar_limite_envio(identificador, _ip_cliente(request))
+            if espera:
+                return HttpResponse(
+                    'Demasiados envios, intente nuevamente en unos segundos.',
+                    status=429,
+                    content_type='text/plain; charset=utf-8',
+                    headers={'Retry-After': str(espera)},
+                )
+        return vista(request, identificador, *args, **kwargs)
+
+    return envoltura
+
+
+def verificar_limite_envio(identificador: str, ip_cliente: str) -> int:
+    # Se revisan ambos baldes antes de consumir: un envio rechazado por el cliente no gasta la cuota del punto.
+    # Un identificador desconocido no crea baldes (la vista responde 404) y sin IP de cliente identificable
+    # solo se aplica el limite del punto, para no juntar a todas las tablets en un mismo balde.
+    limites = obtener_limites_puntos()
+    if identificador not in limites:
+        return 0
+    limite_punto = limites[identificador]
+    if limite_punto is None:
+        limite_punto = settings.ENCUESTAS_LIMITE_ENVIOS_POR_MINUTO
+    baldes = {'punto': (f'{PREFIJO_BALDE}:punto:{identificador}', limite_punto)}
+    if ip_cliente:
+        baldes['cliente'] = (
+            f'{PREFIJO_BALDE}:cliente:{ip_cliente}',
+            settings.ENCUESTAS_LIMITE_ENVIOS_CLIENTE_POR_MINUTO,
+        )
+    ahora = time.time()
+    tokens = {}
+    for tipo, (clave, limite) in baldes.items():
+        tokens[tipo], espera = _leer_balde(clave, limite, ahora)
+        if espera:
+            _registrar_rechazo(tipo, identificador)
+            return espera
+    for tipo, (clave, _) in baldes.items():
+        cache.set(clave, (tokens[tipo] - 1, ahora), 120)
+    return 0
+
+
+def obtener_limites_puntos() -> dict[str, int | None]:
+    # Solo puntos activos: tambien sirve a los endpoints de la tablet para reconocer un identificador valido.
+    limites = cache.get(CLAVE_LIMITES_PUNTOS)
+    if limites is None:
+        limites = dict(
+            PuntoCaptura.objects.filter(activo=True).order_by().values_list('identificador', 'limite_envios_minuto')
+        )
+        cache.set(CLAVE_LIMITES_PUNTOS, limites, TIEMPO_CACHE_LIMITES)
+    return limites
+
+
+def invalidar_limites_puntos() -> None:
+    cache.delete(CLAVE_LIMITES_PUNTOS)
+
+
+def obtener_rechazos(identificadores: list[str]) -> dict[str, dict[str, int]]:
+    claves = {
+        f'{PREFIJO_RECHAZOS}:{tipo}:{identificador}': (identificador, tipo)
+        for identificador in identificadores
+        for tipo in ('punto', 'cliente')
+    }
+    valores = cache.get_many(list(claves))
+    rechazos = {identificador: {'punto': 0, 'cliente': 0} for identificador in identificadores}
+    for clave, total in valores.items():
+        identificador, tipo = claves[clave]
+        rechazos[identificador][tipo] = total
+    return rechazos
+
+
+def _leer_balde(clave: str, limite_por_minuto: int, ahora: float) -> tuple[float, int]:
+    # Devuelve los tokens disponibles y la espera (0 si alcanza). El estado del balde vive en la cache
+    # compartida; la lectura y escritura no son atomicas, por lo que bajo carga concurrente el limite es
+    # aproximado, suficiente para cortar rafagas. Un limite 0 bloquea todos los envios.
+    if limite_por_minuto <= 0:
+        return 0.0, 60
+    recarga_por_segundo = limite_por_minuto / 60
+
+    estado = cache.get(clave)
+    if estado is None:
+        tokens = float(limite_por_minuto)
+    else:
+        tokens, ultimo = estado
+        tokens = min(limite_por_minuto, tokens + (ahora - ultimo) * recarga_por_segundo)
+
+    if tokens < 1:
+        return tokens, max(1, math.ceil((1 - tokens) / recarga_por_segundo))
+    return tokens, 0
+
+
+def _registrar_rechazo(tipo: str, identificador: str) -> None:
+    clave = f'{PREFIJO_RECHAZOS}:{tipo}:{identificador}'
+    if not cache.add(clave, 1, TIEMPO_CACHE_RECHAZOS):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 1, TIEMPO_CACHE_RECHAZOS)
+    logger.warning('Envio rechazado por limite de %s en punto %s', tipo, identificador)
+
+
+def _ip_cliente(request: HttpRequest) -> str:
+    # X-Forwarded-For solo se considera si la conexion viene de un proxy confiable; se recorre desde la
+    # derecha y se toma el primer salto que no es un proxy confiable (lo de la izquierda lo escribe el cliente).
+    # Si todos los saltos son proxies no hay IP de cliente: se devuelve vacio y se omite el limite por cliente.
+    remota = request.META.get('REMOTE_ADDR', '')
+    if not _es_proxy_confiable(remota):
+        return remota
+    saltos = [salto.strip() for salto in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if salto.strip()]
+    for salto in reversed(saltos):
+        if not _es_proxy_confiable(salto):
+            return salto
+    return ''
+
+
+def _es_proxy_confiable(ip: str) -> bool:
+    try:
+        direccion = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(direccion in ipaddress.ip_network(red, strict=False) for red in settings.ENCUESTAS_PROXIES_CONFIABLES)
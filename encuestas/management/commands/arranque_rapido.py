@@ -0,0 +1,101 @@
+import argparse
+import hashlib
+import os
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.recorder import MigrationRecorder
+
+from encuestas.arranque import VARIABLE_INICIO, inicio_proceso
+from encuestas.fragmentos import aliases_fragmentos
+
+ARCHIVO_HUELLA_ESTATICOS = '.huella_estaticos'
+IGNORAR_ESTATICOS = ['CVS', '.*', '*~']
+
+
+class Command(BaseCommand):
+    help = (
+        'Prepara el arranque: migra y ejecuta collectstatic solo si hay cambios, y luego reemplaza '
+        'este proceso por el comando indicado (por ejemplo gunicorn mysite.wsgi).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true', help='Ejecuta migrate y collectstatic siempre.')
+        parser.add_argument(
+            '--solo-estaticos',
+            action='store_true',
+            help='Solo recolecta estaticos y guarda su huella, sin tocar las bases (fase de build de la imagen).',
+        )
+        parser.add_argument('comando', nargs=argparse.REMAINDER, help='Comando a ejecutar al terminar.')
+
+    def handle(self, *args, **options):
+        inicio = inicio_proceso()
+        forzar = options['forzar']
+
+        # STATIC_ROOT y su huella quedan dentro de la imagen si se recolectan en el build (railway.json);
+        # recolectados al arrancar, se pierden con cada contenedor nuevo y la comparacion nunca los omite.
+        if options['solo_estaticos']:
+            self._recolectar_estaticos(forzar)
+            return
+
+        for alias in [DEFAULT_DB_ALIAS, *aliases_fragmentos()]:
+            if forzar or _migraciones_pendientes(alias):
+                self.stdout.write(f'Migrando base {alias}...')
+                call_command('migrate', database=alias, interactive=False, verbosity=0)
+            else:
+                self.stdout.write(f'Base {alias} sin migraciones pendientes.')
+
+        self._recolectar_estaticos(forzar)
+
+        self.stdout.write(self.style.SUCCESS(f'Arranque preparado en {time.time() - inicio:.2f} s.'))
+        if options['comando']:
+            self.stdout.flush()
+            # El comando hereda la hora de lanzamiento para medir el arranque hasta la primera solicitud.
+            os.environ[VARIABLE_INICIO] = str(inicio)
+            os.execvp(options['comando'][0], options['comando'])
+
+    def _recolectar_estaticos(self, forzar: bool) -> None:
+        huella = _huella_estaticos()
+        archivo_huella = Path(settings.STATIC_ROOT) / ARCHIVO_HUELLA_ESTATICOS
+        if forzar or not archivo_huella.is_file() or archivo_huella.read_text() != huella:
+            self.stdout.write('Recolectando archivos estaticos...')
+            call_command('collectstatic', interactive=False, verbosity=0)
+            archivo_huella.write_text(huella)
+        else:
+            self.stdout.write('Archivos estaticos sin cambios.')
+
+
+def _migraciones_pendientes(alias: str) -> bool:
+    # Compara los archivos de migracion en disco con django_migrations: una consulta y sin importar
+    # los modulos de migracion. Ante cualquier diferencia se responde True y se ejecuta migrate.
+    en_disco = set()
+    for config in apps.get_app_configs():
+        carpeta = Path(config.path) / 'migrations'
+        if carpeta.is_dir():
+            en_disco.update(
+                (config.label, archivo.stem) for archivo in carpeta.glob('*.py') if archivo.stem != '__init__'
+            )
+    recorder = MigrationRecorder(connections[alias])
+    if not recorder.has_table():
+        return True
+    return not en_disco <= set(recorder.applied_migrations())
+
+
+def _huella_estaticos() -> str:
+    # Contenido de los archivos fuente de estaticos (pocos y pequenos): estable entre despliegues,
+    # a diferencia de las fechas de modificacion.
+    archivos = []
+    for finder in get_finders():
+        for ruta, storage in finder.list(IGNORAR_ESTATICOS):
+            archivos.append((getattr(storage, 'prefix', None) or '', ruta, storage.path(ruta)))
+    resumen = hashlib.md5(usedforsecurity=False)
+    for prefijo, ruta, ruta_absoluta in sorted(archivos):
+        resumen.update(f'{prefijo}/{ruta}\n'.encode())
+        resumen.update(Path(ruta_absoluta).read_bytes())
+    return resumen.hexdigest()
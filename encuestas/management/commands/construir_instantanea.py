@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from encuestas.instantanea import construir_instantanea
+from encuestas.reportes import invalidar_respuestas
+
+
+class Command(BaseCommand):
+    help = (
+        'Construye la instantanea binaria de dias cerrados que el portal lee por mmap. '
+        'Pensado para ejecutarse cada noche; el dia en curso siempre se consulta en vivo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corte',
+            type=date.fromisoformat,
+            help='Primer dia que queda fuera de la instantanea (por defecto, hoy).',
+        )
+        parser.add_argument('--ruta', help='Archivo de salida (por defecto ENCUESTAS_RUTA_INSTANTANEA).')
+
+    def handle(self, *args, **options):
+        ruta = options['ruta'] or settings.ENCUESTAS_RUTA_INSTANTANEA
+        if not ruta:
+            raise CommandError('Defina ENCUESTAS_RUTA_INSTANTANEA o use --ruta.')
+        corte = options['corte'] or timezone.localdate()
+        if corte > timezone.localdate():
+            raise CommandError('--corte no puede ser posterior a hoy: el dia en curso aun no esta cerrado.')
+
+        grupos = construir_instantanea(corte, ruta)
+        invalidar_respuestas()
+        self.stdout.write(self.style.SUCCESS(f'Instantanea hasta {corte} (excluido) en {ruta}. Grupos: {grupos}'))
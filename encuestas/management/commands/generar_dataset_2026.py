@@ -1,11 +1,15 @@
 import random
 from datetime import date, datetime, time, timedelta
 
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
 
+from encuestas.fragmentos import repartir
+from encuestas.instantanea import obtener_instantanea
 from encuestas.models import Comedor, ConfiguracionEncuesta, PuntoCaptura, RespuestaEncuesta, Sede, Turno
+from encuestas.retencion import purgar_respuestas
 
 
 class Command(BaseCommand):
@@ -32,11 +36,12 @@ class Command(BaseCommand):
         random.seed(seed)
         self.stdout.write(f'Generando dataset 2026 con total={total}, seed={seed}...')
 
-        with transaction.atomic():
-            if reset_2026:
-                eliminadas, _ = RespuestaEncuesta.objects.filter(fecha_hora_registro__year=2026).delete()
-                self.stdout.write(f'Respuestas 2026 eliminadas: {eliminadas}')
+        if reset_2026:
+            # Borrado por lotes fuera de la transaccion principal para no bloquear las tablets.
+            eliminadas = purgar_respuestas(RespuestaEncuesta.objects.filter(fecha_hora_registro__year=2026))
+            self.stdout.write(f'Respuestas 2026 eliminadas: {eliminadas}')
 
+        with transaction.atomic():
             turnos = self._asegurar_turnos()
             comedores = self._asegurar_sedes_y_comedores(turnos)
             self._asegurar_configuracion()
@@ -53,7 +58,13 @@ class Command(BaseCommand):
                 turnos=turnos,
             )
 
-        total_2026 = RespuestaEncuesta.objects.filter(fecha_hora_registro__year=2026).count()
+        # bulk_create no dispara senales: los resumenes se ponen al dia desde la marca.
+        call_command('recalcular_resumenes', stdout=self.stdout)
+        if obtener_instantanea() is not None:
+            call_command('construir_instantanea', stdout=self.stdout)
+
+        respuestas_2026 = RespuestaEncuesta.objects.filter(fecha_hora_registro__year=2026)
+        total_2026 = sum(respuestas.count() for respuestas in repartir(respuestas_2026))
         self.stdout.write(self.style.SUCCESS(f'Dataset generado correctamente. Total 2026: {total_2026}'))
 
     def _asegurar_turnos(self) -> dict[str, Turno]:
@@ -199,7 +210,6 @@ class Command(BaseCommand):
 
         batch_size = 1000
         objetos: list[RespuestaEncuesta] = []
-        fechas_objetivo: list[datetime] = []
 
         for indice in range(total):
             comedor = random.choices(comedores, weights=pesos_comedor, k=1)[0]
@@ -224,6 +234,7 @@ class Command(BaseCommand):
                     sede=comedor.sede,
                     comedor=comedor,
                     turno=turno,
+                    fecha_hora_registro=fecha_hora,
                     satisfaccion_general=satisfaccion_general,
                     calidad_comida=calidad,
                     variedad_menu=variedad,
@@ -232,23 +243,18 @@ class Command(BaseCommand):
                     comentario=comentario,
                 )
             )
-            fechas_objetivo.append(fecha_hora)
 
             if (indice + 1) % batch_size == 0:
-                self._insertar_batch(objetos, fechas_objetivo, batch_size)
+                self._insertar_batch(objetos, batch_size)
                 self.stdout.write(f'  Insertadas {indice + 1} / {total} respuestas...')
                 objetos = []
-                fechas_objetivo = []
 
         if objetos:
-            self._insertar_batch(objetos, fechas_objetivo, batch_size)
+            self._insertar_batch(objetos, batch_size)
             self.stdout.write(f'  Insertadas {total} / {total} respuestas...')
 
-    def _insertar_batch(self, objetos: list[RespuestaEncuesta], fechas_objetivo: list[datetime], batch_size: int):
-        creados = RespuestaEncuesta.objects.bulk_create(objetos, batch_size=batch_size)
-        for indice, respuesta in enumerate(creados):
-            respuesta.fecha_hora_registro = fechas_objetivo[indice]
-        RespuestaEncuesta.objects.bulk_update(creados, ['fecha_hora_registro'], batch_size=batch_size)
+    def _insertar_batch(self, objetos: list[RespuestaEncuesta], batch_size: int):
+        RespuestaEncuesta.objects.cargar(objetos, batch_size=batch_size)
 
     def _fecha_hora_en_turno(self, fecha: date, turno: Turno) -> datetime:
         inicio_seg = turno.hora_inicio.hour * 3600 + turno.hora_inicio.minute * 60
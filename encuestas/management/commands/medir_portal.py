@@ -0,0 +1,50 @@
+import asyncio
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from encuestas.catalogos import invalidar_catalogo
+from encuestas.filtros import FiltrosPortal
+from encuestas.reportes import calcular_portal_concurrente, calcular_portal_secuencial
+
+
+class Command(BaseCommand):
+    help = 'Compara el tiempo del portal calculando sus consultas en secuencia y en paralelo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5, help='Mediciones por modo.')
+        parser.add_argument('--sede', type=int, help='Filtrar por sede (id).')
+        parser.add_argument('--comedor', type=int, help='Filtrar por comedor (id).')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial (AAAA-MM-DD).')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final (AAAA-MM-DD).')
+        parser.add_argument('--aproximado', action='store_true', help='Usar el modo aproximado cuando aplique.')
+
+    def handle(self, *args, **options):
+        filtros = FiltrosPortal(
+            sede_id=options['sede'],
+            comedor_id=options['comedor'],
+            fecha_inicio=options['desde'],
+            fecha_fin=options['hasta'],
+        )
+        aproximado = options['aproximado']
+        repeticiones = max(options['repeticiones'], 1)
+
+        secuencial = self._medir(repeticiones, lambda: calcular_portal_secuencial(filtros, aproximado))
+        concurrente = self._medir(repeticiones, lambda: asyncio.run(calcular_portal_concurrente(filtros, aproximado)))
+
+        self.stdout.write(f'Secuencial:  mediana {secuencial:.1f} ms')
+        self.stdout.write(f'Concurrente: mediana {concurrente:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Diferencia: {secuencial - concurrente:.1f} ms'))
+
+    def _medir(self, repeticiones: int, funcion) -> float:
+        tiempos = []
+        for _ in range(repeticiones):
+            # Sin catalogo en cache, para medir tambien sus consultas. Solo se borran esas claves: la cache es
+            # compartida con los workers (latidos, limites de envio, estado de alertas, paginas de tablets).
+            invalidar_catalogo()
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos)
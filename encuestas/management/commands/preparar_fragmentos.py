@@ -0,0 +1,31 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from encuestas.fragmentos import aliases_fragmentos, replicar_catalogo
+from encuestas.models import Comedor, Sede, Turno
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica las migraciones en cada base de fragmento (DB_FRAGMENTOS_SEDE) y copia en ellas '
+        'los catalogos de sedes, comedores y turnos.'
+    )
+
+    def handle(self, *args, **options):
+        aliases = aliases_fragmentos()
+        if not aliases:
+            self.stdout.write('No hay fragmentos configurados (DB_FRAGMENTOS_SEDE).')
+            return
+
+        for alias in aliases:
+            self.stdout.write(f'Migrando base {alias}...')
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+
+        replicados = 0
+        for modelo in (Sede, Turno, Comedor):
+            for instancia in modelo.objects.all():
+                replicar_catalogo(instancia)
+                replicados += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Fragmentos listos: {", ".join(aliases)}. Registros de catalogo copiados: {replicados}')
+        )
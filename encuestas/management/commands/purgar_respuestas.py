@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from encuestas.fragmentos import repartir
+from encuestas.instantanea import obtener_instantanea
+from encuestas.models import RespuestaEncuesta
+from encuestas.retencion import purgar_respuestas
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina respuestas segun una politica de retencion (antiguedad, sede o comedor) en lotes '
+        'pequenos con transacciones cortas, sin bloquear el registro desde las tablets.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help='Elimina respuestas con mas de N dias de antiguedad.')
+        parser.add_argument('--antes', type=date.fromisoformat, help='Elimina respuestas anteriores a la fecha.')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Limita a respuestas desde la fecha.')
+        parser.add_argument('--sede', type=int, help='Limita a una sede (id).')
+        parser.add_argument('--comedor', type=int, help='Limita a un comedor (id).')
+        parser.add_argument('--lote', type=int, default=500, help='Respuestas eliminadas por transaccion.')
+        parser.add_argument('--pausa', type=float, default=0.2, help='Segundos de espera entre lotes.')
+        parser.add_argument('--archivar', type=Path, help='Agrega cada lote a este archivo JSONL antes de borrarlo.')
+        parser.add_argument('--simular', action='store_true', help='Solo informa cuantas respuestas se eliminarian.')
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError('El valor --lote debe ser mayor que cero.')
+        if options['dias'] is not None and options['antes']:
+            raise CommandError('Use --dias o --antes, no ambos.')
+
+        respuestas = RespuestaEncuesta.objects.all()
+        criterios = []
+        if options['dias'] is not None:
+            limite = timezone.localdate() - timedelta(days=options['dias'])
+            respuestas = respuestas.filter(fecha_local__lt=limite)
+            criterios.append(f'anteriores a {limite}')
+        if options['antes']:
+            respuestas = respuestas.filter(fecha_local__lt=options['antes'])
+            criterios.append(f"anteriores a {options['antes']}")
+        if options['desde']:
+            respuestas = respuestas.filter(fecha_local__gte=options['desde'])
+            criterios.append(f"desde {options['desde']}")
+        if options['sede']:
+            respuestas = respuestas.filter(sede_id=options['sede'])
+            criterios.append(f"sede #{options['sede']}")
+        if options['comedor']:
+            respuestas = respuestas.filter(comedor_id=options['comedor'])
+            criterios.append(f"comedor #{options['comedor']}")
+        if not criterios:
+            raise CommandError('Indique al menos un criterio: --dias, --antes, --desde, --sede o --comedor.')
+
+        descripcion = ', '.join(criterios)
+        if options['simular']:
+            total = sum(respuestas_base.count() for respuestas_base in repartir(respuestas))
+            self.stdout.write(f'Se eliminarian {total} respuestas ({descripcion}).')
+            return
+
+        def al_avanzar(eliminadas, ultimo_id):
+            self.stdout.write(f'  Eliminadas {eliminadas} respuestas (hasta #{ultimo_id})...')
+
+        self.stdout.write(f'Purgando respuestas ({descripcion}) en lotes de {options["lote"]}...')
+        if options['archivar']:
+            with options['archivar'].open('a', encoding='utf-8') as archivo:
+                eliminadas = purgar_respuestas(respuestas, options['lote'], options['pausa'], archivo, al_avanzar)
+        else:
+            eliminadas = purgar_respuestas(respuestas, options['lote'], options['pausa'], al_avanzar=al_avanzar)
+        self.stdout.write(self.style.SUCCESS(f'Purga completada. Respuestas eliminadas: {eliminadas}'))
+        if eliminadas and obtener_instantanea() is not None:
+            # La instantanea de dias cerrados aun cuenta las respuestas borradas.
+            call_command('construir_instantanea', stdout=self.stdout)
@@ -0,0 +1,75 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from encuestas.fragmentos import aliases_respuestas
+from encuestas.models import MarcaResumen, RespuestaEncuesta
+from encuestas.reportes import invalidar_respuestas
+from encuestas.resumenes import actualizar_resumenes, nombre_marca, reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = (
+        'Actualiza los resumenes precalculados (muestras e indice de terminos del portal) procesando solo '
+        'respuestas nuevas desde la ultima marca, o reconstruye un rango de fechas completo. La marca sigue ids: '
+        'las respuestas editadas despues de resumirse solo se corrigen reconstruyendo su rango con --desde/--hasta.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help='Respuestas por lote incremental.')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial (YYYY-MM-DD) a reconstruir.')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final (YYYY-MM-DD) a reconstruir.')
+        parser.add_argument(
+            '--reiniciar-marca',
+            action='store_true',
+            help='Vuelve la marca a cero para reprocesar todas las respuestas.',
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        desde = options['desde']
+        hasta = options['hasta']
+
+        if lote <= 0:
+            raise CommandError('El valor --lote debe ser mayor que cero.')
+        if bool(desde) != bool(hasta):
+            raise CommandError('Use --desde y --hasta juntos para reconstruir un rango.')
+
+        if desde:
+            if desde > hasta:
+                raise CommandError('--desde debe ser menor o igual que --hasta.')
+            estratos = reconstruir_resumenes(desde, hasta)
+            invalidar_respuestas()
+            self.stdout.write(self.style.SUCCESS(f'Rango {desde} a {hasta} reconstruido. Estratos: {estratos}'))
+            return
+
+        aliases = aliases_respuestas()
+        for alias in aliases:
+            if len(aliases) > 1:
+                self.stdout.write(f'Base {alias}:')
+            self._actualizar_base(alias, lote, options['reiniciar_marca'])
+
+    def _actualizar_base(self, alias: str, lote: int, reiniciar_marca: bool) -> None:
+        marca, _ = MarcaResumen.objects.get_or_create(nombre=nombre_marca(alias))
+        if reiniciar_marca:
+            marca.ultimo_id = 0
+            marca.save(update_fields=['ultimo_id', 'actualizado'])
+
+        # El tope se fija al inicio: lo que llegue despues queda para la siguiente ejecucion.
+        tope = RespuestaEncuesta.objects.using(alias).aggregate(tope=Max('id'))['tope'] or 0
+        if tope <= marca.ultimo_id:
+            self.stdout.write(self.style.SUCCESS(f'Resumenes al dia (marca #{marca.ultimo_id}).'))
+            return
+
+        self.stdout.write(f'Procesando respuestas #{marca.ultimo_id + 1} a #{tope} en lotes de {lote}...')
+        estratos = 0
+        while marca.ultimo_id < tope:
+            hasta_id = min(marca.ultimo_id + lote, tope)
+            estratos += actualizar_resumenes(marca.ultimo_id, hasta_id, alias)
+            marca.ultimo_id = hasta_id
+            marca.save(update_fields=['ultimo_id', 'actualizado'])
+            self.stdout.write(f'  Marca en #{hasta_id} ({estratos} estratos actualizados)')
+        invalidar_respuestas()
+
+        self.stdout.write(self.style.SUCCESS(f'Resumenes actualizados hasta #{tope}. Estratos: {estratos}'))
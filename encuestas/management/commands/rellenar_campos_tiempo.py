@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from encuestas.campos_tiempo import rellenar_campos_tiempo
+from encuestas.fragmentos import aliases_respuestas
+from encuestas.models import RespuestaEncuesta
+
+
+class Command(BaseCommand):
+    help = 'Completa en lotes las columnas de fecha, hora y dia de semana locales de las respuestas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Respuestas actualizadas por transaccion.')
+        parser.add_argument('--pausa', type=float, default=0.0, help='Segundos de espera entre lotes.')
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help='Recalcula todas las respuestas (por ejemplo, tras cambiar TIME_ZONE).',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError('El valor --lote debe ser mayor que cero.')
+
+        def al_avanzar(actualizadas, ultimo_id):
+            self.stdout.write(f'  Actualizadas {actualizadas} respuestas (hasta #{ultimo_id})...')
+
+        actualizadas = 0
+        aliases = aliases_respuestas()
+        for alias in aliases:
+            if len(aliases) > 1:
+                self.stdout.write(f'Base {alias}:')
+            actualizadas += rellenar_campos_tiempo(
+                RespuestaEncuesta,
+                lote=options['lote'],
+                todas=options['todas'],
+                pausa=options['pausa'],
+                al_avanzar=al_avanzar,
+                alias=alias,
+            )
+        self.stdout.write(self.style.SUCCESS(f'Campos de tiempo completados. Respuestas actualizadas: {actualizadas}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from encuestas.latidos import volcar_latidos
+
+
+class Command(BaseCommand):
+    help = 'Vuelca a la base de datos los latidos de tablets acumulados en cache.'
+
+    def handle(self, *args, **options):
+        actualizados = volcar_latidos()
+        self.stdout.write(self.style.SUCCESS(f'Latidos volcados. Puntos actualizados: {actualizados}'))
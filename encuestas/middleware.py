@@ -0,0 +1,130 @@
+import io
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+PARAMETRO_PERFIL = '_perfil'
+CABECERA_PERFIL = 'X-Perfilar'
+LIMITE_FUNCIONES = 40
+LIMITE_EXPLAIN = 15
+
+
+class PerfiladoMiddleware:
+    # Con ?_perfil=1 o la cabecera X-Perfilar: 1, un usuario staff recibe un reporte descargable
+    # (cProfile, SQL con tiempos y EXPLAIN) en lugar de la pagina. cProfile y los execute_wrapper
+    # solo observan el hilo y las conexiones de esta solicitud: el resto de usuarios no se ve afectado.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not self._solicitado(request):
+            return self.get_response(request)
+
+        # cProfile y pstats se importan solo al perfilar: no pesan en el arranque de cada worker.
+        import cProfile
+
+        consultas = []
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(_RegistroConsultas(conexion.alias, consultas)))
+            perfil.enable()
+            try:
+                response = self.get_response(request)
+                if response.streaming:
+                    # Las respuestas en streaming hacen su trabajo al iterarse; se consumen aqui.
+                    bytes_respuesta = sum(len(parte) for parte in response.streaming_content)
+                else:
+                    bytes_respuesta = len(response.content)
+            finally:
+                perfil.disable()
+        duracion = (time.perf_counter() - inicio) * 1000
+
+        reporte = _armar_reporte(request, response, bytes_respuesta, duracion, perfil, consultas)
+        marca = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+        return HttpResponse(
+            reporte,
+            content_type='text/plain; charset=utf-8',
+            headers={'Content-Disposition': f'attachment; filename="perfil-{marca}.txt"'},
+        )
+
+    def _solicitado(self, request: HttpRequest) -> bool:
+        if not settings.ENCUESTAS_PERFILADO_HABILITADO:
+            return False
+        if request.GET.get(PARAMETRO_PERFIL) != '1' and request.headers.get(CABECERA_PERFIL) != '1':
+            return False
+        usuario = getattr(request, 'user', None)
+        return bool(usuario and usuario.is_active and usuario.is_staff)
+
+
+class _RegistroConsultas:
+    def __init__(self, alias: str, consultas: list):
+        self.alias = alias
+        self.consultas = consultas
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append(
+                {
+                    'alias': self.alias,
+                    'sql': sql,
+                    'params': params,
+                    'many': many,
+                    'duracion': (time.perf_counter() - inicio) * 1000,
+                }
+            )
+
+
+def _armar_reporte(request, response, bytes_respuesta, duracion, perfil, consultas) -> str:
+    import pstats
+
+    salida = io.StringIO()
+    tiempo_sql = sum(consulta['duracion'] for consulta in consultas)
+    salida.write(f'{request.method} {request.get_full_path()}\n')
+    salida.write(f'Estado: {response.status_code}  Bytes: {bytes_respuesta}\n')
+    salida.write(f'Tiempo total: {duracion:.1f} ms  SQL: {tiempo_sql:.1f} ms en {len(consultas)} consultas\n')
+
+    salida.write('\n== Funciones (tiempo acumulado) ==\n')
+    pstats.Stats(perfil, stream=salida).sort_stats('cumulative').print_stats(LIMITE_FUNCIONES)
+
+    salida.write('\n== Consultas SQL (orden de ejecucion) ==\n')
+    for indice, consulta in enumerate(consultas, start=1):
+        salida.write(f"\n[{indice}] {consulta['duracion']:.2f} ms ({consulta['alias']})\n")
+        salida.write(f"{consulta['sql']}\n")
+        if consulta['params'] and not consulta['many']:
+            salida.write(f"params: {consulta['params']!r}\n")
+
+    salida.write('\n== EXPLAIN de las consultas mas lentas ==\n')
+    explicadas = set()
+    for consulta in sorted(consultas, key=lambda consulta: -consulta['duracion']):
+        if len(explicadas) >= LIMITE_EXPLAIN:
+            break
+        if consulta['many'] or not consulta['sql'].lstrip().upper().startswith('SELECT'):
+            continue
+        if consulta['sql'] in explicadas:
+            continue
+        explicadas.add(consulta['sql'])
+        salida.write(f"\n{consulta['duracion']:.2f} ms: {consulta['sql'][:200]}\n")
+        salida.write(_explicar(consulta))
+    return salida.getvalue()
+
+
+def _explicar(consulta: dict) -> str:
+    conexion = connections[consulta['alias']]
+    prefijo = conexion.ops.explain_query_prefix()
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(f"{prefijo} {consulta['sql']}", consulta['params'])
+            filas = cursor.fetchall()
+    except Exception as error:  # El reporte no debe fallar por una consulta que no se puede explicar.
+        return f'  (sin EXPLAIN: {error})\n'
+    return ''.join(f"  {' | '.join(str(valor) for valor in fila)}\n" for fila in filas)
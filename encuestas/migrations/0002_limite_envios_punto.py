@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuestas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='puntocaptura',
+            name='limite_envios_minuto',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Envios por minuto permitidos para este punto. Vacio usa el limite general.', null=True),
+        ),
+    ]
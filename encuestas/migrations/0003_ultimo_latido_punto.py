@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuestas', '0002_limite_envios_punto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='puntocaptura',
+            name='ultimo_latido',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuestas', '0003_ultimo_latido_punto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstratoMuestra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('tamano_muestra', models.PositiveIntegerField(default=0)),
+                ('comedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estratos_muestra', to='encuestas.comedor')),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='encuestas.sede')),
+            ],
+            options={
+                'ordering': ['fecha', 'comedor'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MuestraRespuesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('respuesta_id', models.BigIntegerField(db_index=True)),
+                ('fecha', models.DateField()),
+                ('satisfaccion_general', models.PositiveSmallIntegerField()),
+                ('calidad_comida', models.PositiveSmallIntegerField()),
+                ('variedad_menu', models.PositiveSmallIntegerField()),
+                ('limpieza_comedor', models.PositiveSmallIntegerField()),
+                ('tiempo_atencion_fila', models.PositiveSmallIntegerField()),
+                ('comedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='encuestas.comedor')),
+                ('estrato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='muestras', to='encuestas.estratomuestra')),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='encuestas.sede')),
+                ('turno', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='encuestas.turno')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='estratomuestra',
+            index=models.Index(fields=['fecha', 'sede'], name='estrato_fecha_sede_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='estratomuestra',
+            constraint=models.UniqueConstraint(fields=('comedor', 'fecha'), name='unique_estrato_por_comedor_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='muestrarespuesta',
+            index=models.Index(fields=['fecha', 'comedor'], name='muestra_fecha_comedor_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuestas', '0005_marca_resumen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='respuestaencuesta',
+            name='dia_semana',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='respuestaencuesta',
+            name='fecha_local',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='respuestaencuesta',
+            name='hora_local',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='respuestaencuesta',
+            name='fecha_hora_registro',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='respuestaencuesta',
+            index=models.Index(fields=['fecha_local', 'dia_semana', 'hora_local'], name='respuesta_tiempo_local_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+from encuestas.campos_tiempo import rellenar_campos_tiempo
+
+
+def rellenar(apps, schema_editor):
+    RespuestaEncuesta = apps.get_model('encuestas', 'RespuestaEncuesta')
+    rellenar_campos_tiempo(RespuestaEncuesta, alias=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    # Sin transaccion global: cada lote se confirma por separado para no bloquear escrituras.
+    atomic = False
+
+    dependencies = [
+        ('encuestas', '0006_campos_tiempo_local'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuestas', '0007_rellenar_campos_tiempo_local'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaComedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metrica', models.CharField(max_length=40)),
+                ('promedio_ventana', models.FloatField()),
+                ('promedio_referencia', models.FloatField()),
+                ('respuestas_ventana', models.PositiveIntegerField()),
+                ('fecha', models.DateField()),
+                ('creada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resuelta', models.DateTimeField(blank=True, null=True)),
+                ('comedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='encuestas.comedor')),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='encuestas.sede')),
+                ('turno', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='encuestas.turno')),
+            ],
+            options={
+                'verbose_name': 'Alerta de comedor',
+                'verbose_name_plural': 'Alertas de comedor',
+                'ordering': ['-creada'],
+                'indexes': [models.Index(fields=['fecha', 'comedor'], name='alerta_fecha_comedor_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuestas', '0008_alertas_comedor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoComentario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('respuesta_id', models.BigIntegerField()),
+                ('fecha', models.DateField()),
+                ('comedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='encuestas.comedor')),
+                ('sede', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='encuestas.sede')),
+                ('turno', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='encuestas.turno')),
+            ],
+            options={
+                'verbose_name': 'Termino de comentario',
+                'verbose_name_plural': 'Terminos de comentario',
+                'indexes': [models.Index(fields=['fecha', 'comedor', 'termino'], name='termino_fecha_comedor_idx'), models.Index(fields=['termino', 'fecha'], name='termino_termino_fecha_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='terminocomentario',
+            constraint=models.UniqueConstraint(fields=('sede', 'respuesta_id', 'termino'), name='unique_termino_por_respuesta'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuestas', '0009_terminos_comentario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetriaTablet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('metrica', models.CharField(max_length=20)),
+                ('muestras', models.PositiveIntegerField(default=0)),
+                ('suma_ms', models.PositiveBigIntegerField(default=0)),
+                ('cubetas', models.JSONField(default=list)),
+                ('punto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telemetria', to='encuestas.puntocaptura')),
+            ],
+            options={
+                'verbose_name': 'Telemetria de tablet',
+                'verbose_name_plural': 'Telemetria de tablets',
+                'ordering': ['-hora', 'punto', 'metrica'],
+                'indexes': [models.Index(fields=['hora'], name='telemetria_hora_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='telemetriatablet',
+            constraint=models.UniqueConstraint(fields=('punto', 'hora', 'metrica'), name='unique_telemetria_por_hora'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:30
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuestas', '0010_telemetria_tablet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioRespuesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operacion', models.CharField(choices=[('alta', 'Alta'), ('baja', 'Baja')], max_length=4)),
+                ('sede_id', models.BigIntegerField()),
+                ('respuesta_id', models.BigIntegerField()),
+                ('datos', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('registrado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Cambio de respuesta',
+                'verbose_name_plural': 'Cambios de respuesta',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cambiorespuesta',
+            constraint=models.UniqueConstraint(fields=('sede_id', 'respuesta_id', 'operacion'), name='unique_cambio_por_respuesta'),
+        ),
+    ]
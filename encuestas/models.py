@@ -1,6 +1,13 @@
+from collections import defaultdict
+
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from .fragmentos import alias_de_sede
 
 
 class Sede(models.Model):
@@ -70,6 +77,12 @@ class PuntoCaptura(models.Model):
         blank=True,
         related_name='puntos_captura_por_defecto',
     )
+    limite_envios_minuto = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text='Envios por minuto permitidos para este punto. Vacio usa el limite general.',
+    )
+    ultimo_latido = models.DateTimeField(null=True, blank=True, editable=False)
     activo = models.BooleanField(default=True)
 
     class Meta:
@@ -97,8 +110,62 @@ class ConfiguracionEncuesta(models.Model):
         return self.nombre
 
 
+class RespuestaEncuestaQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        # Sin .using() explicito, save() deja que el router elija la base segun la sede. La fila y lo que
+        # escriben sus senales en 'default' (estrato, muestra, registro de cambios, terminos) van en una sola
+        # transaccion: un error a mitad de camino no deja una respuesta guardada que el cliente reintente.
+        # Con fragmentos, la base de la sede confirma primero, mientras 'default' aun retiene el estrato.
+        respuesta = self.model(**kwargs)
+        alias = self._db or alias_de_sede(respuesta.sede_id)
+        with transaction.atomic(savepoint=False), transaction.atomic(using=alias, savepoint=False):
+            respuesta.save(force_insert=True, using=self._db)
+        return respuesta
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for respuesta in objs:
+            respuesta.asignar_campos_tiempo()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def cargar(self, objs, batch_size: int | None = None) -> int:
+        # Carga masiva: en PostgreSQL usa COPY, mucho mas rapido que INSERT con muchas filas.
+        # No asigna pk a los objetos ni dispara senales, igual que bulk_create. Sin .using(), con
+        # fragmentos configurados, cada respuesta va a la base de su sede.
+        objs = list(objs)
+        if self._db is None and settings.ENCUESTAS_FRAGMENTOS_SEDE:
+            por_base = defaultdict(list)
+            for respuesta in objs:
+                por_base[alias_de_sede(respuesta.sede_id)].append(respuesta)
+            return sum(self.using(alias).cargar(grupo, batch_size) for alias, grupo in por_base.items())
+
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql':
+            self.bulk_create(objs, batch_size=batch_size)
+            return len(objs)
+
+        campos = [campo for campo in self.model._meta.concrete_fields if not campo.primary_key]
+        columnas = ', '.join(connection.ops.quote_name(campo.column) for campo in campos)
+        tabla = connection.ops.quote_name(self.model._meta.db_table)
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            with cursor.copy(f'COPY {tabla} ({columnas}) FROM STDIN') as copia:
+                for respuesta in objs:
+                    respuesta.asignar_campos_tiempo()
+                    copia.write_row(
+                        [campo.get_db_prep_save(campo.pre_save(respuesta, True), connection) for campo in campos]
+                    )
+        return len(objs)
+
+
 class RespuestaEncuesta(models.Model):
     escala_validadores = [MinValueValidator(1), MaxValueValidator(5)]
+    campos_puntaje = [
+        'satisfaccion_general',
+        'calidad_comida',
+        'variedad_menu',
+        'limpieza_comedor',
+        'tiempo_atencion_fila',
+    ]
 
     sede = models.ForeignKey(Sede, on_delete=models.PROTECT, related_name='respuestas')
     comedor = models.ForeignKey(Comedor, on_delete=models.PROTECT, related_name='respuestas')
@@ -109,7 +176,10 @@ class RespuestaEncuesta(models.Model):
         blank=True,
         related_name='respuestas',
     )
-    fecha_hora_registro = models.DateTimeField(auto_now_add=True)
+    fecha_hora_registro = models.DateTimeField(default=timezone.now, editable=False)
+    fecha_local = models.DateField(null=True, blank=True, editable=False)
+    hora_local = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    dia_semana = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
     satisfaccion_general = models.PositiveSmallIntegerField(validators=escala_validadores)
     calidad_comida = models.PositiveSmallIntegerField(validators=escala_validadores)
     variedad_menu = models.PositiveSmallIntegerField(validators=escala_validadores)
@@ -117,13 +187,190 @@ class RespuestaEncuesta(models.Model):
     tiempo_atencion_fila = models.PositiveSmallIntegerField(validators=escala_validadores)
     comentario = models.TextField(blank=True)
 
+    objects = RespuestaEncuestaQuerySet.as_manager()
+
     class Meta:
         ordering = ['-fecha_hora_registro']
+        indexes = [
+            models.Index(fields=['fecha_local', 'dia_semana', 'hora_local'], name='respuesta_tiempo_local_idx'),
+        ]
 
     def clean(self) -> None:
         super().clean()
         if self.comedor.sede_id != self.sede_id:
             raise ValidationError('El comedor seleccionado no pertenece a la sede indicada.')
 
+    def save(self, *args, **kwargs) -> None:
+        self.asignar_campos_tiempo()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'fecha_hora_registro' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'fecha_local', 'hora_local', 'dia_semana'}
+        super().save(*args, **kwargs)
+
+    def asignar_campos_tiempo(self) -> None:
+        # Columnas derivadas en la zona horaria local para agrupar sin convertir fila por fila.
+        local = timezone.localtime(self.fecha_hora_registro)
+        self.fecha_local = local.date()
+        self.hora_local = local.hour
+        self.dia_semana = local.weekday()
+
     def __str__(self) -> str:
         return f'Respuesta #{self.pk or "nueva"} - {self.comedor.nombre}'
+
+
+class EstratoMuestra(models.Model):
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='+')
+    comedor = models.ForeignKey(Comedor, on_delete=models.CASCADE, related_name='estratos_muestra')
+    fecha = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+    tamano_muestra = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['fecha', 'comedor']
+        constraints = [
+            models.UniqueConstraint(fields=['comedor', 'fecha'], name='unique_estrato_por_comedor_fecha'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha', 'sede'], name='estrato_fecha_sede_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.comedor_id} - {self.fecha} ({self.tamano_muestra}/{self.total})'
+
+
+class MuestraRespuesta(models.Model):
+    estrato = models.ForeignKey(EstratoMuestra, on_delete=models.CASCADE, related_name='muestras')
+    respuesta_id = models.BigIntegerField(db_index=True)
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='+')
+    comedor = models.ForeignKey(Comedor, on_delete=models.CASCADE, related_name='+')
+    turno = models.ForeignKey(Turno, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fecha = models.DateField()
+    satisfaccion_general = models.PositiveSmallIntegerField()
+    calidad_comida = models.PositiveSmallIntegerField()
+    variedad_menu = models.PositiveSmallIntegerField()
+    limpieza_comedor = models.PositiveSmallIntegerField()
+    tiempo_atencion_fila = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha', 'comedor'], name='muestra_fecha_comedor_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Muestra de respuesta #{self.respuesta_id}'
+
+
+class MarcaResumen(models.Model):
+    nombre = models.CharField(max_length=80, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['nombre']
+        verbose_name = 'Marca de resumen'
+        verbose_name_plural = 'Marcas de resumen'
+
+    def __str__(self) -> str:
+        return f'{self.nombre} (hasta #{self.ultimo_id})'
+
+
+class AlertaComedor(models.Model):
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='+')
+    comedor = models.ForeignKey(Comedor, on_delete=models.CASCADE, related_name='alertas')
+    turno = models.ForeignKey(Turno, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    metrica = models.CharField(max_length=40)
+    promedio_ventana = models.FloatField()
+    promedio_referencia = models.FloatField()
+    respuestas_ventana = models.PositiveIntegerField()
+    fecha = models.DateField()
+    creada = models.DateTimeField(default=timezone.now)
+    resuelta = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-creada']
+        verbose_name = 'Alerta de comedor'
+        verbose_name_plural = 'Alertas de comedor'
+        indexes = [
+            models.Index(fields=['fecha', 'comedor'], name='alerta_fecha_comedor_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.comedor_id} - {self.metrica} ({self.promedio_ventana:.2f})'
+
+
+class TerminoComentario(models.Model):
+    # Indice invertido de comentarios: una fila por termino distinto de cada respuesta. Como las
+    # muestras, guarda el id de la respuesta sin llave foranea (la respuesta puede vivir en un fragmento).
+    termino = models.CharField(max_length=40)
+    respuesta_id = models.BigIntegerField()
+    sede = models.ForeignKey(Sede, on_delete=models.CASCADE, related_name='+')
+    comedor = models.ForeignKey(Comedor, on_delete=models.CASCADE, related_name='+')
+    turno = models.ForeignKey(Turno, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fecha = models.DateField()
+
+    class Meta:
+        verbose_name = 'Termino de comentario'
+        verbose_name_plural = 'Terminos de comentario'
+        constraints = [
+            models.UniqueConstraint(fields=['sede', 'respuesta_id', 'termino'], name='unique_termino_por_respuesta'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha', 'comedor', 'termino'], name='termino_fecha_comedor_idx'),
+            models.Index(fields=['termino', 'fecha'], name='termino_termino_fecha_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.termino} (respuesta #{self.respuesta_id})'
+
+
+class TelemetriaTablet(models.Model):
+    # Histograma por hora de una metrica de rendimiento medida en la tablet (cubetas de telemetria.CUBETAS_MS).
+    # La metrica 'errores' solo cuenta eventos: usa muestras y deja las cubetas vacias.
+    punto = models.ForeignKey(PuntoCaptura, on_delete=models.CASCADE, related_name='telemetria')
+    hora = models.DateTimeField()
+    metrica = models.CharField(max_length=20)
+    muestras = models.PositiveIntegerField(default=0)
+    suma_ms = models.PositiveBigIntegerField(default=0)
+    cubetas = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-hora', 'punto', 'metrica']
+        verbose_name = 'Telemetria de tablet'
+        verbose_name_plural = 'Telemetria de tablets'
+        constraints = [
+            models.UniqueConstraint(fields=['punto', 'hora', 'metrica'], name='unique_telemetria_por_hora'),
+        ]
+        indexes = [
+            models.Index(fields=['hora'], name='telemetria_hora_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.punto_id} - {self.metrica} ({self.hora:%Y-%m-%d %H}h)'
+
+
+class CambioRespuesta(models.Model):
+    # Registro de solo agregado de altas y bajas de respuestas; el id es el offset que usan los consumidores.
+    # La respuesta se identifica por (sede, id) sin llave foranea: puede vivir en un fragmento o ya no existir.
+    class Operacion(models.TextChoices):
+        ALTA = 'alta', 'Alta'
+        BAJA = 'baja', 'Baja'
+
+    operacion = models.CharField(max_length=4, choices=Operacion.choices)
+    sede_id = models.BigIntegerField()
+    respuesta_id = models.BigIntegerField()
+    datos = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    registrado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Cambio de respuesta'
+        verbose_name_plural = 'Cambios de respuesta'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sede_id', 'respuesta_id', 'operacion'],
+                name='unique_cambio_por_respuesta',
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f'#{self.pk} {self.operacion} respuesta #{self.respuesta_id}'
@@ -0,0 +1,268 @@
+import math
+import random
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from .catalogos import obtener_nombres_catalogo
+from .filtros import FiltrosPortal
+from .fragmentos import repartir
+from .models import EstratoMuestra, MuestraRespuesta, RespuestaEncuesta
+
+Z_95 = 1.96
+CLAVES_PROMEDIO = {
+    'satisfaccion_general': 'promedio_satisfaccion_general',
+    'calidad_comida': 'promedio_calidad',
+    'variedad_menu': 'promedio_variedad',
+    'limpieza_comedor': 'promedio_limpieza',
+    'tiempo_atencion_fila': 'promedio_tiempo',
+}
+
+
+def incorporar_respuesta(respuesta: RespuestaEncuesta) -> None:
+    # Muestreo de reservorio por estrato (comedor, dia): cada respuesta del dia tiene la misma
+    # probabilidad de quedar en la muestra. El UPDATE va primero para tomar el lock de escritura.
+    # Se ejecuta dentro de la transaccion que inserta la respuesta (RespuestaEncuesta.objects.create).
+    capacidad = settings.ENCUESTAS_TAMANO_MUESTRA_ESTRATO
+    fecha = respuesta.fecha_local
+    with transaction.atomic(savepoint=False):
+        estratos = EstratoMuestra.objects.filter(comedor_id=respuesta.comedor_id, fecha=fecha)
+        if not estratos.update(total=F('total') + 1):
+            try:
+                with transaction.atomic():
+                    EstratoMuestra.objects.create(
+                        sede_id=respuesta.sede_id,
+                        comedor_id=respuesta.comedor_id,
+                        fecha=fecha,
+                        total=1,
+                    )
+            except IntegrityError:
+                estratos.update(total=F('total') + 1)
+        estrato = estratos.get()
+
+        if estrato.tamano_muestra < capacidad:
+            MuestraRespuesta.objects.create(estrato=estrato, **_valores_muestra(respuesta, fecha))
+            estratos.update(tamano_muestra=F('tamano_muestra') + 1)
+        elif random.randrange(estrato.total) < capacidad:
+            reemplazada = estrato.muestras.order_by('id')[random.randrange(estrato.tamano_muestra)]
+            MuestraRespuesta.objects.filter(pk=reemplazada.pk).update(**_valores_muestra(respuesta, fecha))
+
+
+def descartar_respuesta(respuesta: RespuestaEncuesta) -> None:
+    fecha = respuesta.fecha_local
+    with transaction.atomic():
+        estrato_id = (
+            EstratoMuestra.objects.filter(comedor_id=respuesta.comedor_id, fecha=fecha)
+            .values_list('id', flat=True)
+            .first()
+        )
+        if estrato_id is None:
+            return
+        descartadas, _ = MuestraRespuesta.objects.filter(estrato_id=estrato_id, respuesta_id=respuesta.pk).delete()
+        EstratoMuestra.objects.filter(pk=estrato_id, total__gt=0).update(
+            total=F('total') - 1,
+            tamano_muestra=F('tamano_muestra') - descartadas,
+        )
+
+
+def descartar_respuestas(filas: list[dict]) -> None:
+    # Version por lotes de descartar_respuesta (purga): resta las filas borradas del total de sus estratos y
+    # quita de la muestra las que estaban en ella, sin releer las respuestas del dia. Las filas traen id,
+    # sede_id, comedor_id y fecha_local; la sede distingue ids repetidos entre fragmentos.
+    bajas = Counter((fila['comedor_id'], fila['fecha_local']) for fila in filas if fila['fecha_local'] is not None)
+    if not bajas:
+        return
+    ids_por_sede = defaultdict(list)
+    for fila in filas:
+        ids_por_sede[fila['sede_id']].append(fila['id'])
+    with transaction.atomic(savepoint=False):
+        descartadas = Counter()
+        for sede_id, respuesta_ids in ids_por_sede.items():
+            seleccion = MuestraRespuesta.objects.filter(sede_id=sede_id, respuesta_id__in=respuesta_ids)
+            muestras = list(seleccion.values_list('id', 'estrato_id'))
+            if muestras:
+                MuestraRespuesta.objects.filter(id__in=[muestra_id for muestra_id, _ in muestras]).delete()
+                descartadas.update(estrato_id for _, estrato_id in muestras)
+        estratos = EstratoMuestra.objects.filter(
+            comedor_id__in={comedor_id for comedor_id, _ in bajas}, fecha__in={fecha for _, fecha in bajas}
+        ).values_list('id', 'comedor_id', 'fecha')
+        for estrato_id, comedor_id, fecha in list(estratos):
+            if (comedor_id, fecha) in bajas:
+                EstratoMuestra.objects.filter(pk=estrato_id).update(
+                    total=Greatest(F('total') - bajas[comedor_id, fecha], 0),
+                    tamano_muestra=Greatest(F('tamano_muestra') - descartadas[estrato_id], 0),
+                )
+
+
+def reconstruir_muestras(fecha_inicio: date, fecha_fin: date, comedor_ids: set[int] | None = None) -> int:
+    # Cada dia se relee y reescribe en una transaccion que bloquea sus estratos. Un envio inserta la respuesta
+    # y suma a su estrato en una misma transaccion (RespuestaEncuesta.objects.create): o confirma antes de que
+    # se tome el bloqueo y se cuenta al releer, o espera en su UPDATE y se suma sobre el estrato reconstruido.
+    capacidad = settings.ENCUESTAS_TAMANO_MUESTRA_ESTRATO
+    campos = ['id', 'sede_id', 'comedor_id', 'turno_id', *RespuestaEncuesta.campos_puntaje]
+    estratos_reconstruidos = 0
+    fecha = fecha_inicio
+    while fecha <= fecha_fin:
+        respuestas = RespuestaEncuesta.objects.filter(fecha_local=fecha)
+        if comedor_ids is not None:
+            respuestas = respuestas.filter(comedor_id__in=comedor_ids)
+
+        # Las cargas masivas no crean estratos: se crean vacios antes para que tambien queden bloqueados.
+        sedes_por_comedor = {}
+        for respuestas_base in repartir(respuestas.order_by().values_list('comedor_id', 'sede_id').distinct()):
+            sedes_por_comedor.update(respuestas_base)
+        EstratoMuestra.objects.bulk_create(
+            [
+                EstratoMuestra(sede_id=sede_id, comedor_id=comedor_id, fecha=fecha)
+                for comedor_id, sede_id in sedes_por_comedor.items()
+            ],
+            ignore_conflicts=True,
+        )
+
+        with transaction.atomic():
+            estratos = EstratoMuestra.objects.filter(fecha=fecha)
+            if comedor_ids is not None:
+                estratos = estratos.filter(comedor_id__in=comedor_ids)
+            if connection.vendor == 'sqlite':
+                # select_for_update no bloquea nada en SQLite; un UPDATE, aunque no cambie valores, toma el
+                # lock de escritura de la base antes de leer, y un envio en curso confirma primero.
+                estratos.update(total=F('total'))
+            bloqueados = {estrato.comedor_id: estrato for estrato in estratos.select_for_update().order_by('id')}
+
+            por_comedor = defaultdict(list)
+            bloqueadas = respuestas.filter(comedor_id__in=list(bloqueados))
+            for respuestas_base in repartir(bloqueadas.order_by().values(*campos)):
+                for fila in respuestas_base.iterator(chunk_size=2000):
+                    por_comedor[fila['comedor_id']].append(fila)
+
+            MuestraRespuesta.objects.filter(estrato_id__in=[estrato.pk for estrato in bloqueados.values()]).delete()
+            EstratoMuestra.objects.filter(
+                pk__in=[estrato.pk for comedor_id, estrato in bloqueados.items() if comedor_id not in por_comedor]
+            ).delete()
+
+            for comedor_id, filas in por_comedor.items():
+                estrato = bloqueados[comedor_id]
+                estrato.total = len(filas)
+                estrato.tamano_muestra = min(len(filas), capacidad)
+                estrato.save(update_fields=['total', 'tamano_muestra'])
+                seleccion = filas if len(filas) <= capacidad else random.sample(filas, capacidad)
+                MuestraRespuesta.objects.bulk_create(
+                    [
+                        MuestraRespuesta(
+                            estrato=estrato,
+                            respuesta_id=fila['id'],
+                            sede_id=fila['sede_id'],
+                            comedor_id=comedor_id,
+                            turno_id=fila['turno_id'],
+                            fecha=fecha,
+                            **{campo: fila[campo] for campo in RespuestaEncuesta.campos_puntaje},
+                        )
+                        for fila in seleccion
+                    ]
+                )
+                estratos_reconstruidos += 1
+        fecha += timedelta(days=1)
+    return estratos_reconstruidos
+
+
+def debe_aproximar(filtros: FiltrosPortal) -> bool:
+    estratos = filtros.aplicar(EstratoMuestra.objects.all(), campo_fecha='fecha', con_turno=False)
+    total = estratos.aggregate(total=Sum('total'))['total'] or 0
+    return total >= settings.ENCUESTAS_UMBRAL_APROXIMADO
+
+
+def estimar_indicadores(filtros: FiltrosPortal) -> dict:
+    campos = RespuestaEncuesta.campos_puntaje
+    anotaciones = {'n': Count('id')}
+    for campo in campos:
+        anotaciones[f's_{campo}'] = Sum(campo)
+        anotaciones[f'q_{campo}'] = Sum(F(campo) * F(campo))
+    filas = list(
+        filtros.aplicar(MuestraRespuesta.objects.all(), campo_fecha='fecha')
+        .order_by()
+        .values('estrato_id', 'sede_id', 'comedor_id', 'estrato__total', 'estrato__tamano_muestra')
+        .annotate(**anotaciones)
+    )
+
+    promedios = {}
+    intervalos = {}
+    total = 0
+    for campo in campos:
+        media, semiancho, total = _estimar_media(filas, campo)
+        promedios[CLAVES_PROMEDIO[campo]] = media
+        intervalos[CLAVES_PROMEDIO[campo]] = semiancho
+
+    nombres = obtener_nombres_catalogo()
+    por_comedor = defaultdict(list)
+    for fila in filas:
+        por_comedor[(fila['sede_id'], fila['comedor_id'])].append(fila)
+    ranking = []
+    for (sede_id, comedor_id), filas_comedor in por_comedor.items():
+        media, semiancho, total_comedor = _estimar_media(filas_comedor, 'satisfaccion_general')
+        if media is None:
+            continue
+        ranking.append(
+            {
+                'sede_id': sede_id,
+                'comedor_id': comedor_id,
+                'sede_nombre': nombres['sedes'].get(sede_id, ''),
+                'comedor_nombre': nombres['comedores'].get(comedor_id, ''),
+                'promedio': media,
+                'intervalo': semiancho,
+                'total': round(total_comedor),
+            }
+        )
+    ranking.sort(key=lambda fila: (-fila['promedio'], -fila['total'], fila['comedor_nombre']))
+
+    return {
+        'total': round(total),
+        'promedios': promedios,
+        'intervalos': intervalos,
+        'ranking': ranking,
+        'tamano_muestra': sum(fila['n'] for fila in filas),
+    }
+
+
+def _estimar_media(filas: list[dict], campo: str) -> tuple[float | None, float | None, float]:
+    # Estimador de razon estratificado: cada fila de muestra pesa N_h / n_h dentro de su estrato.
+    # La varianza se aproxima por linealizacion con correccion por poblacion finita.
+    total = 0.0
+    suma = 0.0
+    for fila in filas:
+        peso = fila['estrato__total'] / fila['estrato__tamano_muestra']
+        total += peso * fila['n']
+        suma += peso * fila[f's_{campo}']
+    if not total:
+        return None, None, 0.0
+
+    media = suma / total
+    varianza = 0.0
+    for fila in filas:
+        poblacion = fila['estrato__total']
+        muestra = fila['estrato__tamano_muestra']
+        if muestra < 2 or muestra >= poblacion:
+            continue
+        suma_z = fila[f's_{campo}'] - media * fila['n']
+        suma_z2 = fila[f'q_{campo}'] - 2 * media * fila[f's_{campo}'] + media**2 * fila['n']
+        varianza_estrato = (suma_z2 - suma_z**2 / muestra) / (muestra - 1)
+        varianza += poblacion**2 * (1 - muestra / poblacion) * varianza_estrato / muestra
+    varianza /= total**2
+    return media, Z_95 * math.sqrt(max(varianza, 0.0)), total
+
+
+def _valores_muestra(respuesta: RespuestaEncuesta, fecha: date) -> dict:
+    valores = {
+        'respuesta_id': respuesta.pk,
+        'sede_id': respuesta.sede_id,
+        'comedor_id': respuesta.comedor_id,
+        'turno_id': respuesta.turno_id,
+        'fecha': fecha,
+    }
+    for campo in RespuestaEncuesta.campos_puntaje:
+        valores[campo] = getattr(respuesta, campo)
+    return valores
+
@@ -0,0 +1,26 @@
+import time
+
+from django.core.cache import cache
+
+CLAVE_VERSION_PAGINAS = 'encuestas:tablet:version'
+PREFIJO_PAGINA = 'encuestas:tablet:pagina'
+# Se renderiza la pagina con este valor en lugar del token CSRF y se reemplaza en cada respuesta.
+MARCADOR_CSRF = 'csrfpendientetablet'
+TIEMPO_CACHE_PAGINA = 60 * 60 * 24
+
+
+def obtener_pagina_tablet(identificador: str, estado_turno: str) -> str | None:
+    return cache.get(_clave_pagina(identificador, estado_turno))
+
+
+def guardar_pagina_tablet(identificador: str, estado_turno: str, html: str) -> None:
+    cache.set(_clave_pagina(identificador, estado_turno), html, TIEMPO_CACHE_PAGINA)
+
+
+def invalidar_paginas_tablet() -> None:
+    cache.set(CLAVE_VERSION_PAGINAS, time.time_ns(), None)
+
+
+def _clave_pagina(identificador: str, estado_turno: str) -> str:
+    version = cache.get_or_set(CLAVE_VERSION_PAGINAS, time.time_ns, None)
+    return f'{PREFIJO_PAGINA}:{version}:{identificador}:{estado_turno}'
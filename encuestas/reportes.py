@@ -0,0 +1,332 @@
+import asyncio
+import dataclasses
+import hashlib
+import heapq
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from operator import itemgetter, or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .alertas import listar_alertas
+from .catalogos import obtener_nombres_catalogo, obtener_opciones_filtros
+from .filtros import FiltrosPortal
+from .fragmentos import repartir
+from .instantanea import CAMPOS_SUMA, obtener_instantanea
+from .models import RespuestaEncuesta
+from .muestras import CLAVES_PROMEDIO, debe_aproximar, estimar_indicadores
+
+CLAVE_VERSION_RESPUESTAS = 'encuestas:respuestas:version'
+PREFIJO_SECCION = 'encuestas:seccion'
+# Un solo ejecutor por proceso: sus hilos (y sus conexiones, segun CONN_MAX_AGE) se reutilizan entre solicitudes.
+_EJECUTOR_PORTAL = ThreadPoolExecutor(max_workers=settings.ENCUESTAS_HILOS_PORTAL, thread_name_prefix='portal')
+
+
+def calcular_kpis(filtros: FiltrosPortal, aproximado: bool = False) -> dict:
+    if aproximado and debe_aproximar(filtros):
+        estimacion = estimar_indicadores(filtros)
+        return {
+            'respuestas_total': estimacion['total'],
+            'promedios': estimacion['promedios'],
+            'estimacion': estimacion,
+            'comparacion': None,
+        }
+
+    previo = filtros.periodo_previo()
+    actual, *anterior = map(_kpis_de_grupos, sumas_por_periodo([filtros, previo] if previo else [filtros]))
+    comparacion = None
+    if previo:
+        promedios_previos = anterior[0]['promedios']
+        comparacion = {
+            **anterior[0],
+            'fecha_inicio': previo.fecha_inicio,
+            'fecha_fin': previo.fecha_fin,
+            'diferencias': {
+                clave: _diferencia(valor, promedios_previos[clave]) for clave, valor in actual['promedios'].items()
+            },
+        }
+    return {**actual, 'estimacion': None, 'comparacion': comparacion}
+
+
+def calcular_ranking(filtros: FiltrosPortal, aproximado: bool = False) -> dict:
+    if aproximado and debe_aproximar(filtros):
+        estimacion = estimar_indicadores(filtros)
+        return {'ranking_comedores': estimacion['ranking'], 'estimacion': estimacion, 'comparacion': None}
+
+    previo = filtros.periodo_previo()
+    actual, *anterior = map(_satisfaccion_por_comedor, sumas_por_periodo([filtros, previo] if previo else [filtros]))
+    nombres = obtener_nombres_catalogo()
+    ranking = [
+        {
+            'sede_id': sede_id,
+            'comedor_id': comedor_id,
+            'promedio': promedio,
+            'total': total,
+            'sede_nombre': nombres['sedes'].get(sede_id, ''),
+            'comedor_nombre': nombres['comedores'].get(comedor_id, ''),
+        }
+        for (sede_id, comedor_id), (promedio, total) in actual.items()
+    ]
+    ranking.sort(key=lambda fila: (-fila['promedio'], -fila['total'], fila['comedor_nombre']))
+    comparacion = None
+    if previo:
+        comparacion = {'fecha_inicio': previo.fecha_inicio, 'fecha_fin': previo.fecha_fin}
+        for fila in ranking:
+            promedio_previo, total_previo = anterior[0].get((fila['sede_id'], fila['comedor_id']), (None, 0))
+            fila.update(
+                promedio_previo=promedio_previo,
+                total_previo=total_previo,
+                diferencia=_diferencia(fila['promedio'], promedio_previo),
+            )
+    return {'ranking_comedores': ranking, 'estimacion': None, 'comparacion': comparacion}
+
+
+def _kpis_de_grupos(grupos: dict[tuple, Counter]) -> dict:
+    sumas = Counter()
+    for grupo in grupos.values():
+        sumas.update(grupo)
+    total = sumas['total']
+    return {
+        'respuestas_total': total,
+        'promedios': {
+            clave: sumas[f's_{campo}'] / total if total else None for campo, clave in CLAVES_PROMEDIO.items()
+        },
+    }
+
+
+def _satisfaccion_por_comedor(grupos: dict[tuple, Counter]) -> dict[tuple, tuple[float, int]]:
+    sumas = Counter()
+    totales = Counter()
+    for (sede_id, comedor_id, _), grupo in grupos.items():
+        sumas[sede_id, comedor_id] += grupo['s_satisfaccion_general']
+        totales[sede_id, comedor_id] += grupo['total']
+    return {clave: (sumas[clave] / total, total) for clave, total in totales.items()}
+
+
+def _diferencia(actual: float | None, previo: float | None) -> float | None:
+    return None if actual is None or previo is None else actual - previo
+
+
+def listar_comentarios(filtros: FiltrosPortal) -> dict:
+    nombres = obtener_nombres_catalogo()
+    consultas = repartir(
+        filtros.aplicar(RespuestaEncuesta.objects.all())
+        .exclude(comentario='')
+        .order_by('-fecha_hora_registro')
+        .values_list('fecha_hora_registro', 'sede_id', 'comedor_id', 'turno_id', 'comentario'),
+        filtros.sede_id,
+    )
+    filas = heapq.merge(*consultas, key=itemgetter(0), reverse=True)
+    comentarios = [
+        {
+            'fecha_hora_registro': timezone.localtime(fecha_hora_registro),
+            'sede': nombres['sedes'].get(sede_id, ''),
+            'comedor': nombres['comedores'].get(comedor_id, ''),
+            'turno': nombres['turnos'].get(turno_id, '') if turno_id else '',
+            'comentario': comentario,
+        }
+        for fecha_hora_registro, sede_id, comedor_id, turno_id, comentario in filas
+    ]
+    return {'comentarios': comentarios}
+
+
+def calcular_facetas(filtros: FiltrosPortal) -> dict:
+    # Los grupos (sede, comedor, turno) se obtienen sin esos filtros; cada faceta suma los grupos que
+    # cumplen los otros dos filtros activos, como haria un filtro facetado.
+    grupos = sumas_por_grupo(
+        dataclasses.replace(filtros, sede_id=None, comedor_id=None, turno_id=None, sin_turno=False)
+    )
+    sedes, comedores, turnos = Counter(), Counter(), Counter()
+    for (sede_id, comedor_id, turno_id), grupo in grupos.items():
+        total = grupo['total']
+        coincide_sede = not filtros.sede_id or sede_id == filtros.sede_id
+        coincide_comedor = not filtros.comedor_id or comedor_id == filtros.comedor_id
+        if filtros.sin_turno:
+            coincide_turno = turno_id is None
+        else:
+            coincide_turno = not filtros.turno_id or turno_id == filtros.turno_id
+        if coincide_comedor and coincide_turno:
+            sedes[sede_id] += total
+        if coincide_sede and coincide_turno:
+            comedores[comedor_id] += total
+        if coincide_sede and coincide_comedor:
+            turnos[turno_id or 'sin_turno'] += total
+    return {'facetas': {'sedes': dict(sedes), 'comedores': dict(comedores), 'turnos': dict(turnos)}}
+
+
+def calcular_matriz_comedores(filtros: FiltrosPortal) -> dict:
+    # Pivote comedor x metrica a partir del conteo y la suma de las cinco metricas por grupo. Los
+    # promedios de sede y globales salen de esas mismas sumas.
+    campos = RespuestaEncuesta.campos_puntaje
+    por_comedor = defaultdict(Counter)
+    for (sede_id, comedor_id, _), grupo in sumas_por_grupo(filtros).items():
+        por_comedor[sede_id, comedor_id].update(grupo)
+
+    por_sede = defaultdict(Counter)
+    general = Counter()
+    for (sede_id, _), sumas in por_comedor.items():
+        por_sede[sede_id].update(sumas)
+        general.update(sumas)
+
+    def promedios(sumas: Counter) -> dict:
+        return {campo: sumas[f's_{campo}'] / sumas['total'] if sumas['total'] else None for campo in campos}
+
+    promedios_generales = promedios(general)
+    promedios_sede = {sede_id: promedios(sumas) for sede_id, sumas in por_sede.items()}
+    nombres = obtener_nombres_catalogo()
+    comedores = []
+    for (sede_id, comedor_id), sumas in por_comedor.items():
+        propios = promedios(sumas)
+        comedores.append(
+            {
+                'sede_id': sede_id,
+                'sede_nombre': nombres['sedes'].get(sede_id, ''),
+                'comedor_id': comedor_id,
+                'comedor_nombre': nombres['comedores'].get(comedor_id, ''),
+                'total': sumas['total'],
+                'metricas': {
+                    campo: {
+                        'promedio': propios[campo],
+                        'delta_sede': propios[campo] - promedios_sede[sede_id][campo],
+                        'delta_global': propios[campo] - promedios_generales[campo],
+                    }
+                    for campo in campos
+                },
+            }
+        )
+    comedores.sort(key=lambda comedor: (comedor['sede_nombre'], comedor['comedor_nombre']))
+    return {
+        'metricas': campos,
+        'general': {'total': general['total'], 'promedios': promedios_generales},
+        'sedes': [
+            {
+                'sede_id': sede_id,
+                'sede_nombre': nombres['sedes'].get(sede_id, ''),
+                'total': por_sede[sede_id]['total'],
+                'promedios': promedios_sede[sede_id],
+            }
+            for sede_id in sorted(por_sede, key=lambda sede_id: nombres['sedes'].get(sede_id, ''))
+        ],
+        'comedores': comedores,
+    }
+
+
+def sumas_por_grupo(filtros: FiltrosPortal) -> dict[tuple, Counter]:
+    return sumas_por_periodo([filtros])[0]
+
+
+def sumas_por_periodo(periodos: list[FiltrosPortal]) -> list[dict[tuple, Counter]]:
+    # Conteo y suma de cada metrica por (sede, comedor, turno) para cada periodo (mismos filtros, distintas
+    # fechas). Los dias cerrados que cubre la instantanea se leen del archivo mapeado; el resto (normalmente
+    # solo hoy) se consulta en vivo, con una consulta agrupada por base que nunca devuelve filas individuales.
+    # Con varios periodos la consulta es una sola: recorre la union de los rangos y separa cada periodo con
+    # agregaciones condicionales, asi comparar no duplica las consultas.
+    grupos = [defaultdict(Counter) for _ in periodos]
+    pendientes = {}
+    instantanea = obtener_instantanea()
+    for indice, filtros in enumerate(periodos):
+        if instantanea is not None:
+            instantanea.acumular(filtros, grupos[indice])
+            filtros = instantanea.filtros_pendientes(filtros)
+        if filtros is not None:
+            pendientes[indice] = filtros
+    if not pendientes:
+        return grupos
+
+    filtros = next(iter(pendientes.values()))
+    if len(pendientes) == 1:
+        respuestas = filtros.aplicar(RespuestaEncuesta.objects.all())
+        condiciones = {indice: None for indice in pendientes}
+    else:
+        condiciones = {indice: _rango_fechas(filtros_periodo) for indice, filtros_periodo in pendientes.items()}
+        respuestas = dataclasses.replace(filtros, fecha_inicio=None, fecha_fin=None).aplicar(
+            RespuestaEncuesta.objects.all()
+        )
+        respuestas = respuestas.filter(reduce(or_, condiciones.values()))
+
+    anotaciones = {}
+    for indice, condicion in condiciones.items():
+        anotaciones[f'p{indice}_total'] = Count('id', filter=condicion)
+        for campo in CLAVES_PROMEDIO:
+            anotaciones[f'p{indice}_s_{campo}'] = Sum(campo, filter=condicion)
+    for respuestas_base in repartir(respuestas, filtros.sede_id):
+        for fila in respuestas_base.order_by().values('sede_id', 'comedor_id', 'turno_id').annotate(**anotaciones):
+            clave = (fila['sede_id'], fila['comedor_id'], fila['turno_id'])
+            for indice in condiciones:
+                if fila[f'p{indice}_total']:
+                    grupos[indice][clave].update(
+                        {nombre: fila[f'p{indice}_{nombre}'] for nombre in ('total', *CAMPOS_SUMA)}
+                    )
+    return grupos
+
+
+def _rango_fechas(filtros: FiltrosPortal) -> Q:
+    condicion = Q(fecha_local__gte=filtros.fecha_inicio)
+    if filtros.fecha_fin:
+        condicion &= Q(fecha_local__lte=filtros.fecha_fin)
+    return condicion
+
+
+def calcular_portal_secuencial(filtros: FiltrosPortal, aproximado: bool = False) -> dict:
+    tareas = _tareas_portal(filtros, aproximado)
+    return {nombre: funcion(*argumentos) for nombre, (funcion, *argumentos) in tareas.items()}
+
+
+async def calcular_portal_concurrente(filtros: FiltrosPortal, aproximado: bool = False) -> dict:
+    # Cada consulta corre en un hilo con su propia conexion; sqlite3 y psycopg liberan el GIL
+    # mientras la base responde, asi que el tiempo total se acerca al de la consulta mas lenta.
+    tareas = _tareas_portal(filtros, aproximado)
+    loop = asyncio.get_running_loop()
+    resultados = await asyncio.gather(
+        *(
+            loop.run_in_executor(_EJECUTOR_PORTAL, _ejecutar_con_conexion_propia, funcion, *argumentos)
+            for funcion, *argumentos in tareas.values()
+        )
+    )
+    return dict(zip(tareas, resultados))
+
+
+def calcular_seccion(nombre: str, filtros: FiltrosPortal, aproximado: bool = False) -> dict:
+    funcion, *argumentos = _tareas_portal(filtros, aproximado)[nombre]
+    return funcion(*argumentos)
+
+
+def version_respuestas() -> int:
+    return cache.get_or_set(CLAVE_VERSION_RESPUESTAS, time.time_ns, None)
+
+
+def invalidar_respuestas() -> None:
+    cache.set(CLAVE_VERSION_RESPUESTAS, time.time_ns(), None)
+
+
+def clave_seccion(nombre: str, parametros) -> str:
+    consulta = '&'.join(f'{clave}={valor}' for clave, valor in sorted(parametros.items()) if valor)
+    resumen = hashlib.md5(consulta.encode(), usedforsecurity=False).hexdigest()
+    return f'{PREFIJO_SECCION}:{nombre}:{version_respuestas()}:{resumen}'
+
+
+def _tareas_portal(filtros: FiltrosPortal, aproximado: bool) -> dict[str, tuple]:
+    return {
+        'kpis': (calcular_kpis, filtros, aproximado),
+        'ranking': (calcular_ranking, filtros, aproximado),
+        'comentarios': (listar_comentarios, filtros),
+        'alertas': (listar_alertas, filtros),
+        'facetas': (calcular_facetas, filtros),
+        'opciones': (obtener_opciones_filtros,),
+    }
+
+
+def _ejecutar_con_conexion_propia(funcion, *argumentos):
+    # Los hilos del ejecutor no pasan por request_started/request_finished: aqui se aplica el mismo
+    # ciclo de Django a las conexiones del hilo (CONN_MAX_AGE y CONN_HEALTH_CHECKS).
+    close_old_connections()
+    try:
+        return funcion(*argumentos)
+    finally:
+        close_old_connections()
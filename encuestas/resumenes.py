@@ -0,0 +1,46 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .cambios import CAMPOS_CAMBIO, registrar_altas
+from .fragmentos import repartir
+from .models import RespuestaEncuesta
+from .muestras import reconstruir_muestras
+from .terminos import reindexar_respuestas
+
+MARCA_RESUMENES = 'resumenes'
+
+
+def nombre_marca(alias: str) -> str:
+    # Los ids de respuesta son propios de cada base: cada fragmento lleva su propia marca.
+    return MARCA_RESUMENES if alias == DEFAULT_DB_ALIAS else f'{MARCA_RESUMENES}:{alias}'
+
+
+def actualizar_resumenes(id_desde: int, id_hasta: int, alias: str = DEFAULT_DB_ALIAS) -> int:
+    respuestas = RespuestaEncuesta.objects.using(alias).filter(id__gt=id_desde, id__lte=id_hasta)
+    # Las cargas masivas no disparan senales: aqui entran al registro de cambios y al indice de terminos.
+    registrar_altas(list(respuestas.order_by('id').values(*CAMPOS_CAMBIO)))
+    reindexar_respuestas(respuestas.exclude(comentario=''))
+    estratos = (
+        respuestas.order_by()
+        .values_list('fecha_local', 'comedor_id')
+        .distinct()
+    )
+    comedores_por_fecha: dict[date, set[int]] = defaultdict(set)
+    for fecha, comedor_id in estratos:
+        comedores_por_fecha[fecha].add(comedor_id)
+
+    actualizados = 0
+    for fecha, comedor_ids in sorted(comedores_por_fecha.items()):
+        actualizados += reconstruir_muestras(fecha, fecha, comedor_ids)
+    return actualizados
+
+
+def reconstruir_resumenes(fecha_inicio: date, fecha_fin: date) -> int:
+    fecha = fecha_inicio
+    while fecha <= fecha_fin:
+        for respuestas in repartir(RespuestaEncuesta.objects.filter(fecha_local=fecha).exclude(comentario='')):
+            reindexar_respuestas(respuestas)
+        fecha += timedelta(days=1)
+    return reconstruir_muestras(fecha_inicio, fecha_fin)
@@ -0,0 +1,83 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .cambios import registrar_bajas
+from .fragmentos import repartir
+from .models import RespuestaEncuesta
+from .muestras import descartar_respuestas, reconstruir_muestras
+from .reportes import invalidar_respuestas
+from .terminos import retirar_respuestas
+
+_PURGA_EN_CURSO = ContextVar('encuestas_purga_en_curso', default=False)
+
+
+def purga_en_curso() -> bool:
+    return _PURGA_EN_CURSO.get()
+
+
+@contextmanager
+def _marcar_purga():
+    token = _PURGA_EN_CURSO.set(True)
+    try:
+        yield
+    finally:
+        _PURGA_EN_CURSO.reset(token)
+
+
+def purgar_respuestas(respuestas, lote: int = 500, pausa: float = 0.0, archivo=None, al_avanzar=None) -> int:
+    # Borra por rangos de id en transacciones cortas: cada lote solo escribe sus propias filas y lo que se
+    # deriva de ellas, y entre lotes las tablets pueden seguir registrando respuestas. Las senales por fila
+    # se omiten; el indice de terminos, el registro de cambios y los totales de los estratos se ajustan en
+    # la misma transaccion, asi una purga interrumpida no deja resumenes con respuestas ya borradas. Las
+    # muestras de los (dia, comedor) tocados se vuelven a sortear una sola vez, al terminar. Con fragmentos
+    # por sede se recorre cada base por separado (los ids se repiten entre bases); la transaccion de
+    # 'default' confirma antes que la del fragmento, y si la purga se corta entre ambas, la siguiente
+    # ejecucion vuelve a encontrar esas respuestas.
+    eliminadas = 0
+    afectados: dict[date, set[int]] = defaultdict(set)
+    campos = [campo.attname for campo in RespuestaEncuesta._meta.concrete_fields]
+    for respuestas_base in repartir(respuestas):
+        base = respuestas_base.db
+        ultimo_id = 0
+        while True:
+            with transaction.atomic(using=base), transaction.atomic(), _marcar_purga():
+                filas = list(respuestas_base.filter(id__gt=ultimo_id).order_by('id').values(*campos)[:lote])
+                if not filas:
+                    break
+                if archivo is not None:
+                    for fila in filas:
+                        archivo.write(json.dumps(fila, cls=DjangoJSONEncoder) + '\n')
+                    archivo.flush()
+                RespuestaEncuesta.objects.using(base).filter(id__in=[fila['id'] for fila in filas]).delete()
+
+                ids_por_sede = defaultdict(list)
+                for fila in filas:
+                    ids_por_sede[fila['sede_id']].append(fila['id'])
+                descartar_respuestas(filas)
+                for sede_id, respuesta_ids in ids_por_sede.items():
+                    retirar_respuestas(sede_id, respuesta_ids)
+                for sede_id, respuesta_ids in ids_por_sede.items():
+                    registrar_bajas(sede_id, respuesta_ids)
+
+            for fila in filas:
+                if fila['fecha_local'] is not None:
+                    afectados[fila['fecha_local']].add(fila['comedor_id'])
+            ultimo_id = filas[-1]['id']
+            eliminadas += len(filas)
+            if al_avanzar:
+                al_avanzar(eliminadas, ultimo_id)
+            if pausa:
+                time.sleep(pausa)
+
+    for fecha, comedor_ids in sorted(afectados.items()):
+        reconstruir_muestras(fecha, fecha, comedor_ids)
+    if eliminadas:
+        invalidar_respuestas()
+    return eliminadas
@@ -0,0 +1,91 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .alertas import procesar_respuesta
+from .cambios import registrar_altas, registrar_bajas, valores_respuesta
+from .catalogos import invalidar_catalogo
+from .fragmentos import replicar_catalogo, retirar_catalogo
+from .limites import invalidar_limites_puntos
+from .models import Comedor, ConfiguracionEncuesta, PuntoCaptura, RespuestaEncuesta, Sede, Turno
+from .muestras import descartar_respuesta, incorporar_respuesta
+from .paginas import invalidar_paginas_tablet
+from .reportes import invalidar_respuestas
+from .retencion import purga_en_curso
+from .terminos import indexar_respuesta, retirar_respuestas
+
+
+@receiver(post_save, sender=Sede)
+@receiver(post_delete, sender=Sede)
+@receiver(post_save, sender=Comedor)
+@receiver(post_delete, sender=Comedor)
+@receiver(post_save, sender=Turno)
+@receiver(post_delete, sender=Turno)
+def invalidar_nombres_catalogo(sender, **kwargs) -> None:
+    invalidar_catalogo()
+    invalidar_respuestas()
+    invalidar_paginas_tablet()
+
+
+@receiver(post_save, sender=Sede)
+@receiver(post_save, sender=Comedor)
+@receiver(post_save, sender=Turno)
+def replicar_catalogo_fragmentos(sender, instance, using, **kwargs) -> None:
+    if using == DEFAULT_DB_ALIAS:
+        replicar_catalogo(instance)
+
+
+@receiver(post_delete, sender=Sede)
+@receiver(post_delete, sender=Comedor)
+@receiver(post_delete, sender=Turno)
+def retirar_catalogo_fragmentos(sender, instance, using, **kwargs) -> None:
+    if using == DEFAULT_DB_ALIAS:
+        retirar_catalogo(instance)
+
+
+@receiver(post_save, sender=PuntoCaptura)
+@receiver(post_delete, sender=PuntoCaptura)
+def invalidar_limites_envio(sender, **kwargs) -> None:
+    invalidar_limites_puntos()
+    invalidar_paginas_tablet()
+
+
+@receiver(post_save, sender=ConfiguracionEncuesta)
+@receiver(post_delete, sender=ConfiguracionEncuesta)
+def invalidar_configuracion_tablet(sender, **kwargs) -> None:
+    invalidar_paginas_tablet()
+
+
+@receiver(post_save, sender=RespuestaEncuesta)
+def actualizar_muestra_respuesta(sender, instance, created, raw=False, **kwargs) -> None:
+    if created and not raw:
+        incorporar_respuesta(instance)
+    invalidar_respuestas()
+
+
+@receiver(post_save, sender=RespuestaEncuesta)
+def detectar_anomalias_respuesta(sender, instance, created, raw=False, **kwargs) -> None:
+    if created and not raw:
+        procesar_respuesta(instance)
+
+
+@receiver(post_save, sender=RespuestaEncuesta)
+def registrar_alta_respuesta(sender, instance, created, raw=False, **kwargs) -> None:
+    if created and not raw:
+        registrar_altas([valores_respuesta(instance)])
+
+
+@receiver(post_save, sender=RespuestaEncuesta)
+def indexar_comentario_respuesta(sender, instance, created, raw=False, **kwargs) -> None:
+    if not raw:
+        indexar_respuesta(instance, creada=created)
+
+
+@receiver(post_delete, sender=RespuestaEncuesta)
+def descartar_muestra_respuesta(sender, instance, **kwargs) -> None:
+    if purga_en_curso():
+        return
+    descartar_respuesta(instance)
+    retirar_respuestas(instance.sede_id, [instance.pk])
+    registrar_bajas(instance.sede_id, [instance.pk])
+    invalidar_respuestas()
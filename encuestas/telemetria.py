@@ -0,0 +1,195 @@
+import json
+import math
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import PuntoCaptura, TelemetriaTablet
+
+# Limites superiores (ms) de las cubetas del histograma; la ultima cubeta guarda lo que supera el mayor.
+CUBETAS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 30000)
+METRICAS_TELEMETRIA = {
+    'ttfb': 'Primer byte',
+    'interactiva': 'Formulario listo',
+    'carga': 'Carga completa',
+    'envio': 'Envio de respuesta',
+}
+METRICA_ERRORES = 'errores'
+TAMANO_MAXIMO_LOTE = 64 * 1024
+MAXIMO_MUESTRAS_LOTE = 500
+VALOR_MAXIMO_MS = 10 * 60 * 1000
+
+# Acumulado del proceso: (identificador, metrica, hora) -> [muestras, suma_ms, cubetas]; la hora es la de
+# llegada del lote. Cada worker vuelca el suyo cada ENCUESTAS_INTERVALO_VOLCADO_TELEMETRIA segundos: al
+# llegar un lote si ya paso el intervalo o, si no llegan mas, desde un temporizador. Si el worker termina
+# antes, esas muestras se pierden (es telemetria, no datos de encuesta).
+_acumulado: dict[tuple[str, str, datetime], list] = {}
+_candado = threading.Lock()
+_ultimo_volcado = time.monotonic()
+_temporizador: threading.Timer | None = None
+
+
+def leer_lote(cuerpo: bytes) -> dict:
+    # Los lotes llegan como JSON, comprimidos con gzip cuando el navegador tiene CompressionStream.
+    if cuerpo[:2] == b'\x1f\x8b':
+        descompresor = zlib.decompressobj(wbits=31)
+        try:
+            cuerpo = descompresor.decompress(cuerpo, TAMANO_MAXIMO_LOTE)
+        except zlib.error as error:
+            raise ValueError('Lote comprimido invalido.') from error
+        if descompresor.unconsumed_tail:
+            raise ValueError('Lote demasiado grande.')
+    try:
+        lote = json.loads(cuerpo)
+    except (UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError('Lote de telemetria invalido.') from error
+    if not isinstance(lote, dict) or not isinstance(lote.get('m', {}), dict):
+        raise ValueError('Lote de telemetria invalido.')
+    return lote
+
+
+def registrar_lote(identificador: str, lote: dict) -> int:
+    global _temporizador
+    hora = _hora_actual()
+    registradas = 0
+    with _candado:
+        for metrica, valores in lote.get('m', {}).items():
+            if metrica not in METRICAS_TELEMETRIA or not isinstance(valores, list):
+                continue
+            for valor in valores[:MAXIMO_MUESTRAS_LOTE]:
+                if _es_numero(valor) and 0 <= valor <= VALOR_MAXIMO_MS:
+                    _acumular(identificador, metrica, hora, valor)
+                    registradas += 1
+        errores = lote.get('e')
+        if _es_numero(errores) and errores > 0:
+            estado = _estado(identificador, METRICA_ERRORES, hora)
+            estado[0] += int(min(errores, MAXIMO_MUESTRAS_LOTE))
+
+        volcar = time.monotonic() - _ultimo_volcado >= settings.ENCUESTAS_INTERVALO_VOLCADO_TELEMETRIA
+        if not volcar and _acumulado and _temporizador is None:
+            _temporizador = threading.Timer(settings.ENCUESTAS_INTERVALO_VOLCADO_TELEMETRIA, _volcar_pendiente)
+            _temporizador.daemon = True
+            _temporizador.start()
+    if volcar:
+        volcar_telemetria()
+    return registradas
+
+
+def volcar_telemetria() -> int:
+    # Suma el acumulado del proceso a la fila de cada (punto, metrica) en la hora en que llegaron las muestras.
+    global _acumulado, _temporizador, _ultimo_volcado
+    with _candado:
+        pendientes, _acumulado = _acumulado, {}
+        _ultimo_volcado = time.monotonic()
+        if _temporizador is not None:
+            _temporizador.cancel()
+            _temporizador = None
+    if not pendientes:
+        return 0
+
+    puntos = dict(
+        PuntoCaptura.objects.filter(identificador__in={identificador for identificador, _, _ in pendientes})
+        .values_list('identificador', 'id')
+    )
+    actualizadas = 0
+    with transaction.atomic():
+        for (identificador, metrica, hora), (muestras, suma_ms, cubetas) in sorted(pendientes.items()):
+            if identificador not in puntos:
+                continue
+            fila, _ = TelemetriaTablet.objects.select_for_update().get_or_create(
+                punto_id=puntos[identificador],
+                hora=hora,
+                metrica=metrica,
+            )
+            fila.muestras += muestras
+            fila.suma_ms += suma_ms
+            if metrica != METRICA_ERRORES:
+                fila.cubetas = [a + b for a, b in zip(fila.cubetas or [0] * len(cubetas), cubetas)]
+            fila.save(update_fields=['muestras', 'suma_ms', 'cubetas'])
+            actualizadas += 1
+    return actualizadas
+
+
+def resumen_telemetria(desde: datetime) -> list[dict]:
+    # Combina los histogramas por hora del periodo y estima p50/p95 de cada metrica por punto.
+    filas = TelemetriaTablet.objects.filter(hora__gte=desde).select_related('punto__comedor__sede')
+    por_punto = {}
+    combinados = defaultdict(lambda: [0, 0, [0] * (len(CUBETAS_MS) + 1)])
+    for fila in filas:
+        por_punto[fila.punto_id] = fila.punto
+        combinado = combinados[fila.punto_id, fila.metrica]
+        combinado[0] += fila.muestras
+        combinado[1] += fila.suma_ms
+        combinado[2] = [a + b for a, b in zip(combinado[2], fila.cubetas or combinado[2])]
+
+    resumen = []
+    for punto_id, punto in sorted(por_punto.items(), key=lambda item: item[1].identificador):
+        metricas = {}
+        for metrica in METRICAS_TELEMETRIA:
+            muestras, suma_ms, cubetas = combinados.get((punto_id, metrica), (0, 0, []))
+            metricas[metrica] = {
+                'muestras': muestras,
+                'promedio': suma_ms / muestras if muestras else None,
+                'p50': percentil(cubetas, 0.50),
+                'p95': percentil(cubetas, 0.95),
+            }
+        resumen.append(
+            {
+                'punto': punto,
+                'metricas': metricas,
+                'errores': combinados.get((punto_id, METRICA_ERRORES), (0,))[0],
+            }
+        )
+    return resumen
+
+
+def percentil(cubetas: list[int], fraccion: float) -> int | None:
+    # Devuelve el limite superior de la cubeta que contiene el percentil; None si cae en la ultima
+    # cubeta (mas de CUBETAS_MS[-1] ms) o no hay muestras.
+    total = sum(cubetas)
+    if not total:
+        return None
+    acumulado = 0
+    for limite, conteo in zip(CUBETAS_MS, cubetas):
+        acumulado += conteo
+        if acumulado >= fraccion * total:
+            return limite
+    return None
+
+
+def _volcar_pendiente() -> None:
+    # Corre en el hilo del temporizador, fuera de cualquier solicitud: cierra las conexiones que abrio.
+    try:
+        volcar_telemetria()
+    finally:
+        connections.close_all()
+
+
+def _acumular(identificador: str, metrica: str, hora: datetime, valor: float) -> None:
+    estado = _estado(identificador, metrica, hora)
+    estado[0] += 1
+    estado[1] += round(valor)
+    indice = next((indice for indice, limite in enumerate(CUBETAS_MS) if valor <= limite), len(CUBETAS_MS))
+    estado[2][indice] += 1
+
+
+def _estado(identificador: str, metrica: str, hora: datetime) -> list:
+    clave = (identificador, metrica, hora)
+    if clave not in _acumulado:
+        _acumulado[clave] = [0, 0, [0] * (len(CUBETAS_MS) + 1)]
+    return _acumulado[clave]
+
+
+def _hora_actual() -> datetime:
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def _es_numero(valor) -> bool:
+    # json.loads acepta 1e400 (inf) y NaN: solo se aceptan valores finitos.
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool) and math.isfinite(valor)
@@ -0,0 +1,138 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .catalogos import obtener_nombres_catalogo
+from .filtros import FiltrosPortal
+from .fragmentos import alias_de_sede
+from .models import RespuestaEncuesta, TerminoComentario
+
+LONGITUD_MINIMA = 3
+LONGITUD_MAXIMA = 40
+# Palabras vacias del espanol, ya sin tildes (los terminos se comparan normalizados).
+PALABRAS_VACIAS = frozenset(
+    '''
+    algo algun alguna algunas alguno algunos ante antes aqui asi aun cada como con contra cual cuales cuando
+    del desde donde durante ella ellas ello ellos entre era eran eres esa esas ese eso esos esta estaba estado
+    estamos estan estar estas este esto estos estoy fue fueron hay hace hacen hasta les mas mis mucha muchas
+    mucho muchos muy nada nos nosotros otra otras otro otros para pero poco por porque pues que quien quienes
+    sea ser siempre sido sin sobre solo son su sus tambien tan tanto tenemos tener tiene tienen toda todas
+    todo todos una unas uno unos usted ustedes vez
+    '''.split()
+)
+
+
+def normalizar_terminos(texto: str) -> set[str]:
+    # Minusculas sin tildes ni signos; se descartan palabras cortas, numeros y palabras vacias.
+    plano = unicodedata.normalize('NFKD', texto.lower()).encode('ascii', 'ignore').decode()
+    return {
+        palabra[:LONGITUD_MAXIMA]
+        for palabra in re.findall(r'[a-z]+', plano)
+        if len(palabra) >= LONGITUD_MINIMA and palabra not in PALABRAS_VACIAS
+    }
+
+
+def indexar_respuesta(respuesta: RespuestaEncuesta, creada: bool = False) -> None:
+    # Al editar en el admin se reemplazan los terminos; una respuesta nueva no tiene terminos que borrar
+    # y, sin comentario, no escribe nada. Corre dentro de la transaccion que guarda la respuesta.
+    if creada and not respuesta.comentario:
+        return
+    with transaction.atomic(savepoint=False):
+        if not creada:
+            TerminoComentario.objects.filter(sede_id=respuesta.sede_id, respuesta_id=respuesta.pk).delete()
+        TerminoComentario.objects.bulk_create(_filas_indice(_valores_respuesta(respuesta)))
+
+
+def retirar_respuestas(sede_id: int, respuesta_ids: list[int]) -> None:
+    TerminoComentario.objects.filter(sede_id=sede_id, respuesta_id__in=respuesta_ids).delete()
+
+
+def reindexar_respuestas(respuestas) -> int:
+    # Para cargas masivas sin senales (recalcular_resumenes): recibe un queryset ya dirigido a su base.
+    campos = ['id', 'sede_id', 'comedor_id', 'turno_id', 'fecha_local', 'comentario']
+    ids_por_sede = defaultdict(list)
+    filas = []
+    for valores in respuestas.order_by().values(*campos).iterator(chunk_size=2000):
+        ids_por_sede[valores['sede_id']].append(valores['id'])
+        filas.extend(_filas_indice(valores))
+
+    with transaction.atomic():
+        for sede_id, respuesta_ids in ids_por_sede.items():
+            retirar_respuestas(sede_id, respuesta_ids)
+        TerminoComentario.objects.bulk_create(filas, batch_size=2000)
+    return len(filas)
+
+
+def terminos_frecuentes(filtros: FiltrosPortal, limite: int = 30) -> list[dict]:
+    # Cuenta comentarios por termino directamente sobre el indice, sin releer el texto.
+    filas = (
+        filtros.aplicar(TerminoComentario.objects.all(), campo_fecha='fecha')
+        .values('termino')
+        .annotate(total=Count('id'))
+        .order_by('-total', 'termino')[:limite]
+    )
+    return list(filas)
+
+
+def comentarios_con_termino(filtros: FiltrosPortal, termino: str, limite: int = 200) -> list[dict]:
+    # El indice da las respuestas que contienen el termino; el texto se lee solo de esas filas, con una
+    # consulta por base. Los ids de respuesta se repiten entre sedes: el par (sede, id) descarta los cruces.
+    claves = set(
+        filtros.aplicar(TerminoComentario.objects.filter(termino=termino), campo_fecha='fecha')
+        .order_by('-fecha', '-respuesta_id')
+        .values_list('sede_id', 'respuesta_id')[:limite]
+    )
+    claves_por_base = defaultdict(list)
+    for sede_id, respuesta_id in claves:
+        claves_por_base[alias_de_sede(sede_id)].append((sede_id, respuesta_id))
+
+    nombres = obtener_nombres_catalogo()
+    comentarios = []
+    for alias, claves_base in claves_por_base.items():
+        filas = (
+            RespuestaEncuesta.objects.using(alias)
+            .filter(sede_id__in={sede_id for sede_id, _ in claves_base}, id__in=[id_ for _, id_ in claves_base])
+            .values_list('sede_id', 'id', 'fecha_hora_registro', 'comedor_id', 'turno_id', 'comentario')
+        )
+        comentarios += [
+            {
+                'fecha_hora_registro': timezone.localtime(fecha_hora_registro),
+                'sede': nombres['sedes'].get(sede_id, ''),
+                'comedor': nombres['comedores'].get(comedor_id, ''),
+                'turno': nombres['turnos'].get(turno_id, '') if turno_id else '',
+                'comentario': comentario,
+            }
+            for sede_id, respuesta_id, fecha_hora_registro, comedor_id, turno_id, comentario in filas
+            if (sede_id, respuesta_id) in claves
+        ]
+    comentarios.sort(key=lambda fila: fila['fecha_hora_registro'], reverse=True)
+    return comentarios
+
+
+def _valores_respuesta(respuesta: RespuestaEncuesta) -> dict:
+    return {
+        'id': respuesta.pk,
+        'sede_id': respuesta.sede_id,
+        'comedor_id': respuesta.comedor_id,
+        'turno_id': respuesta.turno_id,
+        'fecha_local': respuesta.fecha_local,
+        'comentario': respuesta.comentario,
+    }
+
+
+def _filas_indice(valores: dict) -> list[TerminoComentario]:
+    return [
+        TerminoComentario(
+            termino=termino,
+            respuesta_id=valores['id'],
+            sede_id=valores['sede_id'],
+            comedor_id=valores['comedor_id'],
+            turno_id=valores['turno_id'],
+            fecha=valores['fecha_local'],
+        )
+        for termino in sorted(normalizar_terminos(valores['comentario']))
+    ]
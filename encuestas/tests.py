@@ -1,15 +1,56 @@
-from datetime import time
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time as reloj
+from contextlib import ExitStack
+from datetime import date, datetime, time
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.db import OperationalError, connection, connections
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from .models import Comedor, ConfiguracionEncuesta, PuntoCaptura, RespuestaEncuesta, Sede, Turno
+from . import arranque, telemetria
+from .analitica import analizar_impulsores
+from .catalogos import obtener_nombres_catalogo
+from .filtros import FiltrosPortal
+from .fragmentos import RouterFragmentos, aliases_respuestas, repartir
+from .limites import _ip_cliente, verificar_limite_envio
+from .models import (
+    AlertaComedor,
+    CambioRespuesta,
+    Comedor,
+    ConfiguracionEncuesta,
+    EstratoMuestra,
+    MarcaResumen,
+    MuestraRespuesta,
+    PuntoCaptura,
+    RespuestaEncuesta,
+    Sede,
+    TelemetriaTablet,
+    TerminoComentario,
+    Turno,
+)
+from .muestras import estimar_indicadores, reconstruir_muestras
+from .reportes import calcular_kpis, calcular_matriz_comedores, calcular_ranking, listar_comentarios
+from .retencion import purgar_respuestas
+from .telemetria import percentil, volcar_telemetria
+from .terminos import normalizar_terminos, terminos_frecuentes
 
 
 class FlujoTabletTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.sede = Sede.objects.create(nombre='Sede Test')
         self.comedor = Comedor.objects.create(
             sede=self.sede,
@@ -51,6 +92,20 @@ class FlujoTabletTests(TestCase):
         self.assertEqual(respuesta.sede, self.sede)
         self.assertEqual(respuesta.comedor, self.comedor)
 
+    def test_envio_en_modo_kiosco_informa_el_turno_vigente_de_la_pagina(self):
+        turno_horario = Turno.objects.create(
+            nombre='Turno Full Day',
+            modo_asignacion=Turno.ModoAsignacion.HORARIO,
+            hora_inicio=time(hour=0, minute=0),
+            hora_fin=time(hour=23, minute=59),
+        )
+        url = reverse('encuestas:tablet_encuesta', args=[self.punto.identificador])
+
+        self.assertContains(self.client.get(url), f'data-estado-turno="{turno_horario.pk}"')
+        response = self.client.post(url, data=self._payload(), HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.json()['estado_turno'], str(turno_horario.pk))
+
     def test_requiere_turno_manual_si_no_hay_horario_automatico(self):
         turno_manual = Turno.objects.create(
             nombre='Turno Manual',
@@ -79,9 +134,315 @@ class FlujoTabletTests(TestCase):
         )
         self.assertEqual(RespuestaEncuesta.objects.count(), 1)
 
+    def test_formulario_se_sirve_desde_cache_hasta_cambiar_configuracion(self):
+        url = reverse('encuestas:tablet_encuesta', args=[self.punto.identificador])
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'csrfpendientetablet')
+
+        configuracion = ConfiguracionEncuesta.objects.get()
+        configuracion.texto_bienvenida = 'Bienvenida actualizada'
+        configuracion.save()
+
+        self.assertContains(self.client.get(url), 'Bienvenida actualizada')
+
+    def test_envio_en_modo_kiosco_responde_json_sin_redireccion(self):
+        url = reverse('encuestas:tablet_encuesta', args=[self.punto.identificador])
+
+        response = self.client.post(url, data=self._payload(), HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['ok'])
+        self.assertEqual(response.json()['estado_turno'], 'libre')
+        self.assertEqual(RespuestaEncuesta.objects.count(), 1)
+
+        payload = self._payload()
+        del payload['satisfaccion_general']
+        response_invalida = self.client.post(url, data=payload, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response_invalida.status_code, 400)
+        self.assertIn('satisfaccion_general', response_invalida.json()['errores'])
+        self.assertEqual(RespuestaEncuesta.objects.count(), 1)
+
+        # Sin conexion el formulario no se reenvia solo: queda en pantalla con un aviso para reintentar.
+        self.assertContains(self.client.get(url), 'No se pudo enviar la respuesta.')
+
+    def test_limita_envios_por_punto_sin_registrar_respuesta(self):
+        self.punto.limite_envios_minuto = 1
+        self.punto.save()
+        Turno.objects.create(
+            nombre='Turno Full Day',
+            modo_asignacion=Turno.ModoAsignacion.HORARIO,
+            hora_inicio=time(hour=0, minute=0),
+            hora_fin=time(hour=23, minute=59),
+        )
+        url = reverse('encuestas:tablet_encuesta', args=[self.punto.identificador])
+
+        self.client.post(url, data=self._payload())
+        response = self.client.post(url, data=self._payload())
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(RespuestaEncuesta.objects.count(), 1)
+
+        staff = get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        metricas = self.client.get(reverse('encuestas:portal_rechazos_envio')).json()
+        self.assertEqual(metricas['rechazos'][self.punto.identificador]['punto'], 1)
+
+    @override_settings(ENCUESTAS_LIMITE_ENVIOS_CLIENTE_POR_MINUTO=1, ENCUESTAS_PROXIES_CONFIABLES=['10.0.0.0/8'])
+    def test_limite_por_cliente_ignora_encabezado_falso_y_no_gasta_cuota_del_punto(self):
+        self.punto.limite_envios_minuto = 2
+        self.punto.save()
+
+        self.assertEqual(verificar_limite_envio(self.punto.identificador, '198.51.100.7'), 0)
+        self.assertGreater(verificar_limite_envio(self.punto.identificador, '198.51.100.7'), 0)
+        self.assertGreater(verificar_limite_envio(self.punto.identificador, '198.51.100.7'), 0)
+        self.assertEqual(verificar_limite_envio(self.punto.identificador, '198.51.100.8'), 0)
+
+        fabrica = RequestFactory()
+        directa = fabrica.post('/', HTTP_X_FORWARDED_FOR='1.2.3.4', REMOTE_ADDR='198.51.100.7')
+        self.assertEqual(_ip_cliente(directa), '198.51.100.7')
+        por_proxy = fabrica.post('/', HTTP_X_FORWARDED_FOR='1.2.3.4, 198.51.100.7, 10.0.0.3', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(_ip_cliente(por_proxy), '198.51.100.7')
+
+    @override_settings(ENCUESTAS_LIMITE_ENVIOS_CLIENTE_POR_MINUTO=1, ENCUESTAS_PROXIES_CONFIABLES=['10.0.0.0/8'])
+    def test_sin_ip_de_cliente_solo_aplica_el_limite_del_punto(self):
+        solo_proxies = RequestFactory().post('/', HTTP_X_FORWARDED_FOR='10.0.0.3', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(_ip_cliente(solo_proxies), '')
+
+        self.assertEqual(verificar_limite_envio(self.punto.identificador, ''), 0)
+        self.assertEqual(verificar_limite_envio(self.punto.identificador, ''), 0)
+        self.assertIsNone(cache.get('encuestas:limites:balde:cliente:'))
+
+    def test_identificador_desconocido_no_crea_baldes(self):
+        self.assertEqual(verificar_limite_envio('tablet-inexistente', '198.51.100.7'), 0)
+        self.assertIsNone(cache.get('encuestas:limites:balde:punto:tablet-inexistente'))
+        self.assertIsNone(cache.get('encuestas:limites:balde:cliente:198.51.100.7'))
+
+    def test_limite_cero_bloquea_el_punto(self):
+        self.punto.limite_envios_minuto = 0
+        self.punto.save()
+
+        self.assertGreater(verificar_limite_envio(self.punto.identificador, '198.51.100.7'), 0)
+
+
+class EnvioTabletAtomicoTests(TransactionTestCase):
+    # La transaccion de la respuesta solo se observa confirmada fuera de TestCase.
+    def setUp(self):
+        cache.clear()
+        sede = Sede.objects.create(nombre='Sede Atomica')
+        comedor = Comedor.objects.create(sede=sede, nombre='Comedor Atomico')
+        self.punto = PuntoCaptura.objects.create(identificador='tablet-atomica-01', comedor=comedor)
+        ConfiguracionEncuesta.objects.create(nombre='configuracion_principal')
+
+    def test_error_en_escrituras_derivadas_no_deja_la_respuesta_guardada(self):
+        cliente = self.client_class(raise_request_exception=False)
+        url = reverse('encuestas:tablet_encuesta', args=[self.punto.identificador])
+        datos = {
+            'satisfaccion_general': 5,
+            'calidad_comida': 4,
+            'variedad_menu': 3,
+            'limpieza_comedor': 5,
+            'tiempo_atencion_fila': 4,
+        }
+
+        with mock.patch('encuestas.signals.registrar_altas', side_effect=OperationalError('database is locked')):
+            response = cliente.post(url, data=datos, HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(RespuestaEncuesta.objects.exists())
+        self.assertFalse(EstratoMuestra.objects.exists())
+
+        response = cliente.post(url, data=datos, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(RespuestaEncuesta.objects.count(), 1)
+        self.assertEqual(EstratoMuestra.objects.get().total, 1)
+
+
+class LatidosTabletTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sede = Sede.objects.create(nombre='Sede Latidos')
+        comedor = Comedor.objects.create(sede=sede, nombre='Comedor Latidos')
+        self.punto = PuntoCaptura.objects.create(identificador='tablet-latido-01', comedor=comedor)
+        self.staff_user = get_user_model().objects.create_user(
+            username='staff',
+            password='testpass123',
+            is_staff=True,
+        )
+
+    def test_latidos_se_acumulan_en_cache_y_se_vuelcan_en_lote(self):
+        url = reverse('encuestas:tablet_latido', args=[self.punto.identificador])
+        self.assertEqual(self.client.post(url).status_code, 204)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.post(url).status_code, 204)
+
+        call_command('volcar_latidos', stdout=StringIO())
+        self.punto.refresh_from_db()
+        self.assertIsNotNone(self.punto.ultimo_latido)
+
+    def test_latido_de_punto_desconocido_o_inactivo_responde_404(self):
+        response = self.client.post(reverse('encuestas:tablet_latido', args=['tablet-inexistente']))
+        self.assertEqual(response.status_code, 404)
+
+        self.punto.activo = False
+        self.punto.save()
+        response = self.client.post(reverse('encuestas:tablet_latido', args=[self.punto.identificador]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_portal_tablets_muestra_estado_en_linea(self):
+        self.client.post(reverse('encuestas:tablet_latido', args=[self.punto.identificador]))
+        self.client.login(username='staff', password='testpass123')
+
+        response = self.client.get(reverse('encuestas:portal_tablets'))
+
+        self.assertContains(response, 'tablet-latido-01')
+        self.assertContains(response, 'En linea')
+
+
+class TelemetriaTabletTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        volcar_telemetria()
+        sede = Sede.objects.create(nombre='Sede Telemetria')
+        comedor = Comedor.objects.create(sede=sede, nombre='Comedor Telemetria')
+        self.punto = PuntoCaptura.objects.create(identificador='tablet-telemetria-01', comedor=comedor)
+        self.url = reverse('encuestas:tablet_telemetria', args=[self.punto.identificador])
+
+    def _enviar(self, lote, comprimir=False):
+        cuerpo = json.dumps(lote).encode()
+        if comprimir:
+            cuerpo = gzip.compress(cuerpo)
+        return self.client.post(self.url, cuerpo, content_type='text/plain')
+
+    def test_lotes_se_acumulan_en_memoria_y_se_vuelcan_como_histograma(self):
+        with self.settings(ENCUESTAS_INTERVALO_VOLCADO_TELEMETRIA=3600):
+            self._enviar({'m': {'carga': [800, 900]}})
+            with self.assertNumQueries(0):
+                response = self._enviar({'m': {'carga': [1200, 40000], 'envio': [250], 'otra': [1]}, 'e': 2}, True)
+            self.assertEqual(response.status_code, 204)
+        self.assertFalse(TelemetriaTablet.objects.exists())
+
+        self.assertEqual(volcar_telemetria(), 3)
+        carga = TelemetriaTablet.objects.get(metrica='carga')
+        self.assertEqual((carga.muestras, carga.suma_ms), (4, 42900))
+        self.assertEqual(percentil(carga.cubetas, 0.5), 1000)
+        self.assertIsNone(percentil(carga.cubetas, 0.95))
+        self.assertEqual(TelemetriaTablet.objects.get(metrica='errores').muestras, 2)
+
+        with self.settings(ENCUESTAS_INTERVALO_VOLCADO_TELEMETRIA=0):
+            self._enviar({'m': {'carga': [100]}})
+        self.assertEqual(TelemetriaTablet.objects.get(metrica='carga').muestras, 5)
+
+    def test_rechaza_lotes_invalidos_y_puntos_desconocidos(self):
+        self.assertEqual(self.client.post(self.url, b'no es json', content_type='text/plain').status_code, 400)
+        self.assertEqual(self._enviar(['carga']).status_code, 400)
+        url = reverse('encuestas:tablet_telemetria', args=['tablet-inexistente'])
+        self.assertEqual(self.client.post(url, b'{}', content_type='text/plain').status_code, 404)
+
+    def test_valores_no_finitos_se_descartan(self):
+        cuerpo = b'{"m": {"carga": [1e400, NaN, 300]}, "e": 1e400}'
+        self.assertEqual(self.client.post(self.url, cuerpo, content_type='text/plain').status_code, 204)
+
+        volcar_telemetria()
+        self.assertEqual(TelemetriaTablet.objects.get().muestras, 1)
+
+    def test_muestras_se_guardan_en_su_hora_y_se_vuelcan_sin_nuevos_lotes(self):
+        hora = timezone.make_aware(datetime(2026, 3, 2, 9, 0))
+        with self.settings(ENCUESTAS_INTERVALO_VOLCADO_TELEMETRIA=3600):
+            with mock.patch('encuestas.telemetria.timezone.now', return_value=hora.replace(minute=59)):
+                self._enviar({'m': {'carga': [800]}})
+            self._enviar({'m': {'carga': [900]}})
+        # Sin mas lotes, un temporizador vuelca lo pendiente; un volcado explicito lo cancela.
+        self.assertIsNotNone(telemetria._temporizador)
+
+        self.assertEqual(volcar_telemetria(), 2)
+        self.assertIsNone(telemetria._temporizador)
+        self.assertEqual(TelemetriaTablet.objects.get(hora=hora).suma_ms, 800)
+        self.assertEqual(TelemetriaTablet.objects.exclude(hora=hora).get().suma_ms, 900)
+
+    def test_portal_muestra_percentiles_por_punto(self):
+        with self.settings(ENCUESTAS_INTERVALO_VOLCADO_TELEMETRIA=0):
+            self._enviar({'m': {'ttfb': [90, 120, 180], 'envio': [400]}})
+        staff = get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse('encuestas:portal_telemetria'))
+        self.assertContains(response, 'tablet-telemetria-01')
+        self.assertContains(response, '200 / 200')
+        datos = self.client.get(reverse('encuestas:portal_telemetria'), {'formato': 'json'}).json()
+        self.assertEqual(datos['puntos'][0]['metricas']['envio']['p95'], 500)
+
+
+@override_settings(ENCUESTAS_TOKEN_CAMBIOS='token-bi')
+class RegistroCambiosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sede = Sede.objects.create(nombre='Sede Cambios')
+        self.comedor = Comedor.objects.create(sede=self.sede, nombre='Comedor Cambios')
+        self.respuestas = [self._respuesta(puntaje) for puntaje in (2, 3, 4)]
+        self.url = reverse('encuestas:portal_cambios')
+
+    def _respuesta(self, puntaje):
+        return RespuestaEncuesta(
+            sede=self.sede,
+            comedor=self.comedor,
+            satisfaccion_general=puntaje,
+            calidad_comida=puntaje,
+            variedad_menu=puntaje,
+            limpieza_comedor=puntaje,
+            tiempo_atencion_fila=puntaje,
+        )
+
+    def _leer(self, **parametros):
+        return self.client.get(self.url, parametros, HTTP_AUTHORIZATION='Bearer token-bi').json()
+
+    def test_altas_y_bajas_se_leen_por_offset_en_paginas(self):
+        for respuesta in self.respuestas:
+            respuesta.save()
+        eliminada_id = self.respuestas[0].id
+        self.respuestas[0].delete()
+
+        pagina = self._leer(limite=3)
+        self.assertEqual([cambio['operacion'] for cambio in pagina['cambios']], ['alta', 'alta', 'alta'])
+        self.assertEqual(pagina['cambios'][1]['respuesta']['satisfaccion_general'], 3)
+        self.assertTrue(pagina['hay_mas'])
+
+        pagina = self._leer(desde=pagina['siguiente'])
+        self.assertEqual(pagina['cambios'][0]['operacion'], 'baja')
+        self.assertEqual(pagina['cambios'][0]['respuesta'], {'id': eliminada_id, 'sede_id': self.sede.id})
+        self.assertFalse(pagina['hay_mas'])
+        self.assertEqual(self._leer(desde=pagina['siguiente'])['cambios'], [])
+
+    def test_cambios_se_leen_al_confirmar_y_se_exige_autorizacion(self):
+        self.respuestas[0].save()
+        self.assertEqual(len(self._leer()['cambios']), 1)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer otro').status_code, 401)
+
+        staff = get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(len(self.client.get(self.url).json()['cambios']), 1)
+
+    def test_cargas_masivas_y_purgas_quedan_registradas_una_vez(self):
+        RespuestaEncuesta.objects.cargar(self.respuestas)
+        self.assertFalse(CambioRespuesta.objects.exists())
+        call_command('recalcular_resumenes', stdout=StringIO())
+        call_command('recalcular_resumenes', '--reiniciar-marca', stdout=StringIO())
+        self.assertEqual(CambioRespuesta.objects.filter(operacion='alta').count(), 3)
+
+        purgar_respuestas(RespuestaEncuesta.objects.filter(satisfaccion_general__lt=4))
+        self.assertEqual(CambioRespuesta.objects.filter(operacion='baja').count(), 2)
+
 
 class PortalReporteriaTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.sede = Sede.objects.create(nombre='Sede Reportes')
         self.comedor = Comedor.objects.create(
             sede=self.sede,
@@ -118,18 +479,790 @@ class PortalReporteriaTests(TestCase):
         response = self.client.get(reverse('encuestas:portal_inicio'))
 
         self.assertEqual(response.status_code, 200)
-        self.assertContains(response, 'Encuestas registradas')
         self.assertContains(response, 'Ranking de comedores')
+        self.assertContains(response, reverse('encuestas:portal_seccion', args=['kpis']))
+
+        response = self.client.get(reverse('encuestas:portal_seccion', args=['kpis']))
+        self.assertContains(response, 'Encuestas registradas')
+        response = self.client.get(reverse('encuestas:portal_seccion', args=['comentarios']))
         self.assertContains(response, 'Buen servicio')
 
+    def test_secciones_se_cachean_y_se_invalidan_con_nuevas_respuestas(self):
+        self.client.login(username='staff', password='testpass123')
+        url = reverse('encuestas:portal_seccion', args=['kpis'])
+
+        primera = self.client.get(url, {'formato': 'json'})
+        self.assertIn('cache miss', primera['Server-Timing'])
+        self.assertEqual(primera.json()['respuestas_total'], 1)
+        self.assertIn('cache hit', self.client.get(url, {'formato': 'json'})['Server-Timing'])
+
+        RespuestaEncuesta.objects.create(
+            sede=self.sede,
+            comedor=self.comedor,
+            satisfaccion_general=2,
+            calidad_comida=2,
+            variedad_menu=2,
+            limpieza_comedor=2,
+            tiempo_atencion_fila=2,
+        )
+        self.assertEqual(self.client.get(url, {'formato': 'json'}).json()['respuestas_total'], 2)
+
+    def test_seccion_inexistente_responde_404(self):
+        self.client.login(username='staff', password='testpass123')
+        response = self.client.get(reverse('encuestas:portal_seccion', args=['otra']))
+        self.assertEqual(response.status_code, 404)
+
     def test_exportacion_csv_respeta_filtros(self):
         self.client.login(username='staff', password='testpass123')
         response = self.client.get(reverse('encuestas:portal_exportar_csv'), {'sede': self.sede.id})
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv')
-        self.assertIn('fecha_hora_registro,sede,comedor,turno', response.content.decode())
-        self.assertIn('Sede Reportes', response.content.decode())
+        contenido = b''.join(response.streaming_content).decode()
+        self.assertIn('fecha_hora_registro,sede,comedor,turno', contenido)
+        self.assertIn('Sede Reportes', contenido)
+
+    def test_perfilado_devuelve_reporte_solo_para_staff(self):
+        response = self.client.get(reverse('encuestas:portal_exportar_csv'), {'_perfil': '1'})
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='staff', password='testpass123')
+        response = self.client.get(reverse('encuestas:portal_exportar_csv'), {'_perfil': '1'})
+
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('attachment; filename="perfil-', response['Content-Disposition'])
+        reporte = response.content.decode()
+        self.assertIn('== Consultas SQL', reporte)
+        self.assertIn('encuestas_respuestaencuesta', reporte)
+        self.assertIn('== EXPLAIN', reporte)
+
+    def test_facetas_cuentan_respuestas_respetando_los_otros_filtros(self):
+        otro_comedor = Comedor.objects.create(sede=self.sede, nombre='Comedor Anexo')
+        RespuestaEncuesta.objects.create(
+            sede=self.sede,
+            comedor=otro_comedor,
+            satisfaccion_general=3,
+            calidad_comida=3,
+            variedad_menu=3,
+            limpieza_comedor=3,
+            tiempo_atencion_fila=3,
+        )
+        self.client.login(username='staff', password='testpass123')
+
+        facetas = self.client.get(
+            reverse('encuestas:portal_seccion', args=['facetas']),
+            {'comedor': self.comedor.id},
+        ).json()['facetas']
+
+        self.assertEqual(facetas['sedes'], {str(self.sede.id): 1})
+        self.assertEqual(facetas['comedores'], {str(self.comedor.id): 1, str(otro_comedor.id): 1})
+        self.assertEqual(facetas['turnos'], {str(self.turno.id): 1})
+
+        facetas = self.client.get(
+            reverse('encuestas:portal_seccion', args=['facetas']),
+            {'turno': 'sin_turno'},
+        ).json()['facetas']
+        self.assertEqual(facetas['comedores'], {str(otro_comedor.id): 1})
+        self.assertEqual(facetas['turnos'], {str(self.turno.id): 1, 'sin_turno': 1})
+
+    def test_ranking_y_csv_reflejan_cambios_de_nombre_en_catalogo(self):
+        self.client.login(username='staff', password='testpass123')
+        self.client.get(reverse('encuestas:portal_seccion', args=['ranking']))
+
+        self.comedor.nombre = 'Comedor Renombrado'
+        self.comedor.save()
+
+        response = self.client.get(reverse('encuestas:portal_seccion', args=['ranking']))
+        self.assertContains(response, 'Sede Reportes - Comedor Renombrado')
+        response_csv = self.client.get(reverse('encuestas:portal_exportar_csv'))
+        self.assertIn('Comedor Renombrado,Almuerzo', b''.join(response_csv.streaming_content).decode())
+
+
+class PortalConcurrenteTests(TransactionTestCase):
+    # Las consultas corren en otros hilos, que solo ven datos confirmados.
+    def setUp(self):
+        cache.clear()
+        sede = Sede.objects.create(nombre='Sede Concurrente')
+        comedor = Comedor.objects.create(sede=sede, nombre='Comedor Concurrente', ubicacion_referencial='Patio')
+        RespuestaEncuesta.objects.create(
+            sede=sede,
+            comedor=comedor,
+            satisfaccion_general=5,
+            calidad_comida=4,
+            variedad_menu=4,
+            limpieza_comedor=5,
+            tiempo_atencion_fila=3,
+            comentario='Todo rapido',
+        )
+        get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+
+    def test_portal_completo_requiere_staff(self):
+        response = self.client.get(reverse('encuestas:portal_inicio_async'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/admin/login/', response.url)
+
+    def test_portal_completo_renderiza_secciones_calculadas_en_paralelo(self):
+        self.client.login(username='staff', password='testpass123')
+        response = self.client.get(reverse('encuestas:portal_inicio_async'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Server-Timing', response)
+        self.assertContains(response, 'Comedor Concurrente')
+        self.assertContains(response, 'Todo rapido')
+        self.assertNotContains(response, 'data-seccion=')
+        self.assertContains(response, 'id="facetas-portal"')
+
+    def test_medir_portal_conserva_la_cache_compartida(self):
+        cache.set('encuestas:latidos:tablet-ajena', 1)
+        salida = StringIO()
+
+        call_command('medir_portal', repeticiones=1, stdout=salida)
+
+        self.assertIn('Concurrente', salida.getvalue())
+        self.assertEqual(cache.get('encuestas:latidos:tablet-ajena'), 1)
+
+
+class ModoAproximadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sede = Sede.objects.create(nombre='Sede Muestras')
+        self.comedor = Comedor.objects.create(sede=self.sede, nombre='Comedor Muestras')
+        self.staff_user = get_user_model().objects.create_user(
+            username='staff',
+            password='testpass123',
+            is_staff=True,
+        )
+
+    def _crear_respuestas(self, puntajes):
+        for puntaje in puntajes:
+            RespuestaEncuesta.objects.create(
+                sede=self.sede,
+                comedor=self.comedor,
+                satisfaccion_general=puntaje,
+                calidad_comida=puntaje,
+                variedad_menu=puntaje,
+                limpieza_comedor=puntaje,
+                tiempo_atencion_fila=puntaje,
+            )
+
+    @override_settings(ENCUESTAS_TAMANO_MUESTRA_ESTRATO=2)
+    def test_muestra_por_estrato_no_supera_capacidad(self):
+        self._crear_respuestas([1, 2, 3, 4, 5])
+
+        estrato = EstratoMuestra.objects.get()
+        self.assertEqual(estrato.total, 5)
+        self.assertEqual(estrato.tamano_muestra, 2)
+        self.assertEqual(MuestraRespuesta.objects.count(), 2)
+
+        RespuestaEncuesta.objects.first().delete()
+        estrato.refresh_from_db()
+        self.assertEqual(estrato.total, 4)
+        self.assertEqual(estrato.tamano_muestra, MuestraRespuesta.objects.count())
+
+    def test_estimacion_coincide_con_exacto_si_la_muestra_es_completa(self):
+        self._crear_respuestas([2, 4, 4, 5])
+
+        estimacion = estimar_indicadores(FiltrosPortal())
+
+        self.assertEqual(estimacion['total'], 4)
+        self.assertAlmostEqual(estimacion['promedios']['promedio_satisfaccion_general'], 3.75)
+        self.assertEqual(estimacion['intervalos']['promedio_satisfaccion_general'], 0)
+        self.assertEqual(estimacion['ranking'][0]['comedor_nombre'], 'Comedor Muestras')
+
+    @override_settings(ENCUESTAS_UMBRAL_APROXIMADO=3)
+    def test_portal_usa_modo_aproximado_solo_sobre_el_umbral(self):
+        self.client.login(username='staff', password='testpass123')
+        self._crear_respuestas([4, 4])
+
+        url = reverse('encuestas:portal_seccion', args=['kpis'])
+        response = self.client.get(url, {'aproximado': '1'})
+        self.assertNotContains(response, 'Resultados aproximados')
+
+        self._crear_respuestas([5])
+        response = self.client.get(url, {'aproximado': '1'})
+        self.assertContains(response, 'Resultados aproximados')
+
+
+@override_settings(ENCUESTAS_VENTANA_ALERTAS=3)
+class AlertasEnLineaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sede = Sede.objects.create(nombre='Sede Alertas')
+        self.comedor = Comedor.objects.create(sede=self.sede, nombre='Comedor Alertas')
+
+    def _responder(self, puntaje, veces):
+        for _ in range(veces):
+            RespuestaEncuesta.objects.create(
+                sede=self.sede,
+                comedor=self.comedor,
+                satisfaccion_general=puntaje,
+                calidad_comida=5,
+                variedad_menu=5,
+                limpieza_comedor=5,
+                tiempo_atencion_fila=5,
+            )
+
+    def test_caida_en_la_ventana_abre_y_luego_resuelve_alerta(self):
+        self._responder(5, 6)
+        self.assertFalse(AlertaComedor.objects.exists())
+
+        self._responder(1, 2)
+        alerta = AlertaComedor.objects.get()
+        self.assertEqual(alerta.metrica, 'satisfaccion_general')
+        self.assertIsNone(alerta.resuelta)
+
+        self._responder(5, 3)
+        alerta.refresh_from_db()
+        self.assertIsNotNone(alerta.resuelta)
+        self.assertEqual(AlertaComedor.objects.count(), 1)
+
+    def test_portal_muestra_alertas_abiertas(self):
+        self._responder(5, 6)
+        self._responder(1, 1)
+        staff = get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse('encuestas:portal_seccion', args=['alertas']))
+
+        self.assertContains(response, 'Comedor Alertas')
+        self.assertContains(response, 'Abierta')
+
+
+class RecalcularResumenesTests(TestCase):
+    def setUp(self):
+        sede = Sede.objects.create(nombre='Sede Carga')
+        self.comedor = Comedor.objects.create(sede=sede, nombre='Comedor Carga')
+        RespuestaEncuesta.objects.cargar(
+            [
+                RespuestaEncuesta(
+                    sede=sede,
+                    comedor=self.comedor,
+                    satisfaccion_general=puntaje,
+                    calidad_comida=puntaje,
+                    variedad_menu=puntaje,
+                    limpieza_comedor=puntaje,
+                    tiempo_atencion_fila=puntaje,
+                )
+                for puntaje in (3, 4, 5)
+            ]
+        )
+
+    def test_procesa_solo_respuestas_nuevas_desde_la_marca(self):
+        self.assertFalse(EstratoMuestra.objects.exists())
+
+        salida = StringIO()
+        call_command('recalcular_resumenes', lote=2, stdout=salida)
+
+        estrato = EstratoMuestra.objects.get()
+        self.assertEqual(estrato.total, 3)
+        marca = MarcaResumen.objects.get()
+        self.assertEqual(marca.ultimo_id, RespuestaEncuesta.objects.order_by('-id').first().id)
+
+        salida = StringIO()
+        call_command('recalcular_resumenes', stdout=salida)
+        self.assertIn('al dia', salida.getvalue())
+
+    def test_reconstruye_rango_de_fechas(self):
+        hoy = timezone.localdate().isoformat()
+        call_command('recalcular_resumenes', '--desde', hoy, '--hasta', hoy, stdout=StringIO())
+
+        self.assertEqual(EstratoMuestra.objects.get().total, 3)
+        self.assertFalse(MarcaResumen.objects.exists())
+
+    def test_reconstruccion_corrige_estratos_en_su_lugar(self):
+        hoy = timezone.localdate()
+        call_command('recalcular_resumenes', stdout=StringIO())
+        estrato = EstratoMuestra.objects.get()
+        EstratoMuestra.objects.filter(pk=estrato.pk).update(total=99)
+        vacio = Comedor.objects.create(sede=self.comedor.sede, nombre='Comedor Sin Respuestas')
+        EstratoMuestra.objects.create(sede=vacio.sede, comedor=vacio, fecha=hoy, total=5)
+
+        reconstruir_muestras(hoy, hoy)
+
+        estrato.refresh_from_db()
+        self.assertEqual((estrato.total, estrato.tamano_muestra), (3, 3))
+        self.assertFalse(EstratoMuestra.objects.filter(comedor=vacio).exists())
+        self.assertEqual(MuestraRespuesta.objects.filter(estrato=estrato).count(), 3)
+
+
+class PurgaRetencionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sede = Sede.objects.create(nombre='Sede Retencion')
+        self.comedor = Comedor.objects.create(sede=self.sede, nombre='Comedor Retencion')
+        for dia, puntaje in [(1, 2), (1, 3), (2, 4), (20, 5)]:
+            RespuestaEncuesta.objects.create(
+                sede=self.sede,
+                comedor=self.comedor,
+                fecha_hora_registro=timezone.make_aware(datetime(2026, 1, dia, 12, 0)),
+                satisfaccion_general=puntaje,
+                calidad_comida=puntaje,
+                variedad_menu=puntaje,
+                limpieza_comedor=puntaje,
+                tiempo_atencion_fila=puntaje,
+            )
+
+    def test_purga_por_lotes_archiva_y_reconstruye_muestras(self):
+        archivo = StringIO()
+        respuestas = RespuestaEncuesta.objects.filter(fecha_local__lt=date(2026, 1, 10))
+
+        eliminadas = purgar_respuestas(respuestas, lote=2, archivo=archivo)
+
+        self.assertEqual(eliminadas, 3)
+        self.assertEqual(RespuestaEncuesta.objects.count(), 1)
+        self.assertEqual(len(archivo.getvalue().splitlines()), 3)
+        self.assertEqual(EstratoMuestra.objects.get().fecha, date(2026, 1, 20))
+        self.assertEqual(MuestraRespuesta.objects.count(), 1)
+        self.assertEqual(estimar_indicadores(FiltrosPortal())['total'], 1)
+
+    def test_purga_interrumpida_deja_muestras_coherentes(self):
+        def interrumpir(eliminadas, ultimo_id):
+            raise KeyboardInterrupt
+
+        respuestas = RespuestaEncuesta.objects.filter(fecha_local__lt=date(2026, 1, 10))
+        with self.assertRaises(KeyboardInterrupt):
+            purgar_respuestas(respuestas, lote=2, al_avanzar=interrumpir)
+
+        self.assertEqual(RespuestaEncuesta.objects.count(), 2)
+        self.assertEqual(EstratoMuestra.objects.get(fecha=date(2026, 1, 1)).total, 0)
+        self.assertEqual(MuestraRespuesta.objects.filter(fecha=date(2026, 1, 1)).count(), 0)
+        self.assertEqual(estimar_indicadores(FiltrosPortal())['total'], 2)
+
+    def test_lote_descuenta_sus_filas_del_estrato_sin_reconstruir(self):
+        def interrumpir(eliminadas, ultimo_id):
+            raise KeyboardInterrupt
+
+        respuestas = RespuestaEncuesta.objects.filter(fecha_local__lt=date(2026, 1, 10))
+        with mock.patch('encuestas.retencion.reconstruir_muestras') as reconstruir:
+            with self.assertRaises(KeyboardInterrupt):
+                purgar_respuestas(respuestas, lote=1, al_avanzar=interrumpir)
+
+        reconstruir.assert_not_called()
+        estrato = EstratoMuestra.objects.get(fecha=date(2026, 1, 1))
+        self.assertEqual((estrato.total, estrato.tamano_muestra), (1, 1))
+        self.assertEqual(estimar_indicadores(FiltrosPortal())['total'], 3)
+
+    def test_comando_exige_criterio_y_permite_simular(self):
+        with self.assertRaises(CommandError):
+            call_command('purgar_respuestas', stdout=StringIO())
+
+        salida = StringIO()
+        call_command('purgar_respuestas', '--antes', '2026-01-02', '--simular', stdout=salida)
+        self.assertIn('Se eliminarian 2 respuestas', salida.getvalue())
+        self.assertEqual(RespuestaEncuesta.objects.count(), 4)
+
+        call_command('purgar_respuestas', '--antes', '2026-01-02', '--pausa', '0', stdout=StringIO())
+        self.assertEqual(RespuestaEncuesta.objects.count(), 2)
+
+
+class FragmentosSedeTests(TestCase):
+    def setUp(self):
+        self.sede = Sede.objects.create(nombre='Sede Fragmento')
+        self.otra_sede = Sede.objects.create(nombre='Sede Principal')
+
+    def test_router_ubica_respuestas_segun_la_sede(self):
+        router = RouterFragmentos()
+        with self.settings(ENCUESTAS_FRAGMENTOS_SEDE={self.sede.pk: 'norte'}):
+            self.assertEqual(
+                router.db_for_write(RespuestaEncuesta, instance=RespuestaEncuesta(sede=self.sede)),
+                'norte',
+            )
+            self.assertEqual(
+                router.db_for_write(RespuestaEncuesta, instance=RespuestaEncuesta(sede=self.otra_sede)),
+                'default',
+            )
+            self.assertIsNone(router.db_for_write(RespuestaEncuesta, instance=self.sede))
+            self.assertIsNone(router.db_for_write(Sede, instance=self.sede))
+            self.assertTrue(router.allow_migrate('norte', 'encuestas', 'sede'))
+            self.assertFalse(router.allow_migrate('norte', 'auth', 'user'))
+            self.assertIsNone(router.allow_migrate('default', 'auth', 'user'))
+
+    def test_consultas_se_reparten_solo_a_las_bases_necesarias(self):
+        with self.settings(ENCUESTAS_FRAGMENTOS_SEDE={self.sede.pk: 'norte'}):
+            self.assertEqual(aliases_respuestas(), ['default', 'norte'])
+            self.assertEqual(aliases_respuestas(self.sede.pk), ['norte'])
+            self.assertEqual(aliases_respuestas(self.otra_sede.pk), ['default'])
+            consultas = repartir(RespuestaEncuesta.objects.all())
+            self.assertEqual([consulta.db for consulta in consultas], ['default', 'norte'])
+        self.assertEqual(aliases_respuestas(), ['default'])
+
+
+class FragmentosSedeBasesTests(TestCase):
+    # Con una segunda base real: las escrituras pasan por el router y los reportes combinan ambas bases.
+    databases = {'default', 'norte'}
+
+    def setUp(self):
+        cache.clear()
+        self.sede_norte = Sede.objects.create(nombre='Sede Norte')
+        self.sede = Sede.objects.create(nombre='Sede Central')
+        self.fragmentos = self.settings(ENCUESTAS_FRAGMENTOS_SEDE={self.sede_norte.pk: 'norte'})
+        self.fragmentos.enable()
+        self.addCleanup(self.fragmentos.disable)
+        self.sede_norte.save()
+        self.sede.save()
+        for sede, puntaje, comentario in [(self.sede_norte, 5, 'Rapido en el norte'), (self.sede, 3, 'Lento aca')]:
+            comedor = Comedor.objects.create(sede=sede, nombre=f'Comedor {sede.nombre}')
+            RespuestaEncuesta.objects.create(
+                sede=sede,
+                comedor=comedor,
+                satisfaccion_general=puntaje,
+                calidad_comida=puntaje,
+                variedad_menu=puntaje,
+                limpieza_comedor=puntaje,
+                tiempo_atencion_fila=puntaje,
+                comentario=comentario,
+            )
+
+    def test_respuestas_se_guardan_en_su_base_y_los_reportes_las_combinan(self):
+        self.assertEqual(RespuestaEncuesta.objects.using('norte').get().sede, self.sede_norte)
+        self.assertEqual(RespuestaEncuesta.objects.using('default').get().sede, self.sede)
+
+        kpis = calcular_kpis(FiltrosPortal())
+        self.assertEqual(kpis['respuestas_total'], 2)
+        self.assertAlmostEqual(kpis['promedios']['promedio_satisfaccion_general'], 4.0)
+        self.assertEqual(calcular_kpis(FiltrosPortal(sede_id=self.sede_norte.pk))['respuestas_total'], 1)
+        comentarios = [fila['comentario'] for fila in listar_comentarios(FiltrosPortal())['comentarios']]
+        self.assertCountEqual(comentarios, ['Rapido en el norte', 'Lento aca'])
+
+    def test_rellenar_campos_tiempo_recorre_cada_base(self):
+        for alias in ('default', 'norte'):
+            RespuestaEncuesta.objects.using(alias).update(fecha_local=None, hora_local=None, dia_semana=None)
+
+        call_command('rellenar_campos_tiempo', stdout=StringIO())
+
+        for alias in ('default', 'norte'):
+            self.assertFalse(RespuestaEncuesta.objects.using(alias).filter(fecha_local__isnull=True).exists())
+
+    def test_simular_purga_cuenta_todas_las_bases(self):
+        salida = StringIO()
+        call_command('purgar_respuestas', '--desde', '2000-01-01', '--simular', stdout=salida)
+
+        self.assertIn('Se eliminarian 2 respuestas', salida.getvalue())
+
+
+class ImpulsoresSatisfaccionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sede = Sede.objects.create(nombre='Sede Impulsores')
+        self.comedor = Comedor.objects.create(sede=sede, nombre='Comedor Impulsores')
+        limpieza = [1, 2, 3, 4, 5, 1, 2, 3, 4, 5]
+        calidad = [3, 1, 4, 1, 5, 2, 2, 3, 5, 3]
+        variedad = [2, 5, 3, 4, 1, 4, 3, 5, 2, 1]
+        tiempo = [4, 4, 2, 5, 3, 1, 5, 2, 1, 3]
+        RespuestaEncuesta.objects.bulk_create(
+            [
+                RespuestaEncuesta(
+                    sede=sede,
+                    comedor=self.comedor,
+                    satisfaccion_general=puntaje_limpieza,
+                    calidad_comida=puntaje_calidad,
+                    variedad_menu=puntaje_variedad,
+                    limpieza_comedor=puntaje_limpieza,
+                    tiempo_atencion_fila=puntaje_tiempo,
+                )
+                for puntaje_limpieza, puntaje_calidad, puntaje_variedad, puntaje_tiempo in zip(
+                    limpieza, calidad, variedad, tiempo
+                )
+            ]
+        )
+        staff = get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+
+    def test_identifica_impulsor_principal_con_una_sola_consulta(self):
+        obtener_nombres_catalogo()
+        with self.assertNumQueries(1):
+            analisis = analizar_impulsores(FiltrosPortal())
+
+        comedor = analisis['comedores'][0]
+        self.assertEqual(comedor['comedor_id'], self.comedor.id)
+        self.assertEqual(comedor['principal'], 'limpieza_comedor')
+        self.assertAlmostEqual(comedor['correlaciones']['limpieza_comedor'], 1.0)
+        self.assertAlmostEqual(comedor['pesos']['limpieza_comedor'], 1.0)
+        self.assertAlmostEqual(comedor['pesos']['calidad_comida'], 0.0)
+        self.assertAlmostEqual(comedor['r2'], 1.0)
+        self.assertEqual(analisis['general']['respuestas'], 10)
+
+    def test_pagina_muestra_tabla_de_impulsores(self):
+        analisis = self.client.get(reverse('encuestas:portal_impulsores'), {'formato': 'json'}).json()
+        self.assertEqual(analisis['comedores'][0]['principal'], 'limpieza_comedor')
+
+        response = self.client.get(reverse('encuestas:portal_impulsores'))
+        self.assertContains(response, 'Sede Impulsores - Comedor Impulsores')
+        self.assertContains(response, 'class="principal"')
+
+
+class MatrizComedoresTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sede = Sede.objects.create(nombre='Sede Matriz')
+        otra_sede = Sede.objects.create(nombre='Sede Vecina')
+        self.comedor_a = Comedor.objects.create(sede=self.sede, nombre='Comedor A')
+        self.comedor_b = Comedor.objects.create(sede=self.sede, nombre='Comedor B')
+        comedor_c = Comedor.objects.create(sede=otra_sede, nombre='Comedor C')
+        for comedor, puntaje in [(self.comedor_a, 5), (self.comedor_a, 5), (self.comedor_b, 2), (comedor_c, 4)]:
+            RespuestaEncuesta.objects.create(
+                sede=comedor.sede,
+                comedor=comedor,
+                satisfaccion_general=puntaje,
+                calidad_comida=puntaje,
+                variedad_menu=3,
+                limpieza_comedor=puntaje,
+                tiempo_atencion_fila=puntaje,
+            )
+        staff = get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+
+    def test_matriz_con_deltas_en_una_sola_consulta(self):
+        obtener_nombres_catalogo()
+        with self.assertNumQueries(1):
+            matriz = calcular_matriz_comedores(FiltrosPortal())
+
+        self.assertEqual(matriz['general']['total'], 4)
+        self.assertAlmostEqual(matriz['general']['promedios']['satisfaccion_general'], 4.0)
+        comedor_a = matriz['comedores'][0]
+        self.assertEqual(comedor_a['comedor_id'], self.comedor_a.id)
+        self.assertEqual(comedor_a['total'], 2)
+        self.assertAlmostEqual(comedor_a['metricas']['satisfaccion_general']['promedio'], 5.0)
+        self.assertAlmostEqual(comedor_a['metricas']['satisfaccion_general']['delta_sede'], 1.0)
+        self.assertAlmostEqual(comedor_a['metricas']['satisfaccion_general']['delta_global'], 1.0)
+        self.assertAlmostEqual(comedor_a['metricas']['variedad_menu']['delta_global'], 0.0)
+        self.assertEqual([sede['total'] for sede in matriz['sedes']], [3, 1])
+
+    def test_matriz_en_html_csv_y_json(self):
+        url = reverse('encuestas:portal_matriz')
+
+        self.assertContains(self.client.get(url), 'Comedor B')
+        datos = self.client.get(url, {'formato': 'json', 'sede': self.sede.id}).json()
+        self.assertEqual([comedor['comedor_nombre'] for comedor in datos['comedores']], ['Comedor A', 'Comedor B'])
+
+        lineas = self.client.get(url, {'formato': 'csv'}).content.decode().splitlines()
+        self.assertEqual(len(lineas), 4)
+        self.assertTrue(lineas[1].startswith('Sede Matriz,Comedor A,2,5.000,+1.000,+1.000'))
+
+
+class TerminosComentarioTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sede = Sede.objects.create(nombre='Sede Terminos')
+        self.comedor = Comedor.objects.create(sede=self.sede, nombre='Comedor Terminos')
+        self.otro_comedor = Comedor.objects.create(sede=self.sede, nombre='Comedor Vecino')
+        self.respuestas = [
+            self._crear(self.comedor, 'La fila es muy larga'),
+            self._crear(self.comedor, 'Fila lenta y comida sin temperatura'),
+            self._crear(self.otro_comedor, 'Comida fria, mala TEMPERATURA'),
+            self._crear(self.otro_comedor, ''),
+        ]
+        staff = get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+
+    def _crear(self, comedor, comentario):
+        return RespuestaEncuesta.objects.create(
+            sede=self.sede,
+            comedor=comedor,
+            satisfaccion_general=3,
+            calidad_comida=3,
+            variedad_menu=3,
+            limpieza_comedor=3,
+            tiempo_atencion_fila=3,
+            comentario=comentario,
+        )
+
+    def test_normaliza_tildes_y_descarta_palabras_vacias(self):
+        self.assertEqual(normalizar_terminos('¡Está MUY rica la ración, 10/10!'), {'rica', 'racion'})
+
+    def test_indice_incremental_y_terminos_por_comedor(self):
+        self.assertEqual(TerminoComentario.objects.filter(respuesta_id=self.respuestas[0].id).count(), 2)
+        with self.assertNumQueries(1):
+            terminos = terminos_frecuentes(FiltrosPortal())
+        self.assertEqual(
+            terminos[:3],
+            [
+                {'termino': 'comida', 'total': 2},
+                {'termino': 'fila', 'total': 2},
+                {'termino': 'temperatura', 'total': 2},
+            ],
+        )
+        por_comedor = terminos_frecuentes(FiltrosPortal(comedor_id=self.otro_comedor.id))
+        self.assertNotIn('fila', [fila['termino'] for fila in por_comedor])
+
+        self.respuestas[0].comentario = 'Excelente'
+        self.respuestas[0].save()
+        self.respuestas[1].delete()
+        self.assertFalse(TerminoComentario.objects.filter(termino='fila').exists())
+        self.assertTrue(TerminoComentario.objects.filter(termino='excelente').exists())
+
+    def test_respuesta_nueva_sin_comentario_no_toca_el_indice(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self._crear(self.comedor, '')
+            self._crear(self.comedor, 'Postre rico')
+
+        sentencias = [consulta['sql'] for consulta in consultas if 'terminocomentario' in consulta['sql']]
+        self.assertEqual(len(sentencias), 1)
+        self.assertTrue(sentencias[0].startswith('INSERT'))
+
+    def test_detalle_de_comentarios_por_termino(self):
+        url = reverse('encuestas:portal_terminos')
+        response = self.client.get(url, {'termino': 'Temperatura', 'formato': 'json'})
+        datos = response.json()
+        self.assertEqual(datos['termino'], 'temperatura')
+        self.assertEqual(
+            sorted(fila['comentario'] for fila in datos['comentarios']),
+            ['Comida fria, mala TEMPERATURA', 'Fila lenta y comida sin temperatura'],
+        )
+
+        response = self.client.get(url, {'comedor': self.comedor.id, 'termino': 'fila'})
+        self.assertContains(response, 'La fila es muy larga')
+        self.assertNotContains(response, 'Comida fria')
+
+    def test_carga_masiva_se_indexa_al_recalcular_y_la_purga_limpia(self):
+        RespuestaEncuesta.objects.cargar(
+            [
+                RespuestaEncuesta(
+                    sede=self.sede,
+                    comedor=self.comedor,
+                    satisfaccion_general=2,
+                    calidad_comida=2,
+                    variedad_menu=2,
+                    limpieza_comedor=2,
+                    tiempo_atencion_fila=2,
+                    comentario='Bandeja sucia',
+                )
+            ]
+        )
+        self.assertFalse(TerminoComentario.objects.filter(termino='bandeja').exists())
+        call_command('recalcular_resumenes', stdout=StringIO())
+        self.assertTrue(TerminoComentario.objects.filter(termino='bandeja').exists())
+
+        purgar_respuestas(RespuestaEncuesta.objects.filter(comedor=self.comedor))
+        terminos = {fila['termino'] for fila in terminos_frecuentes(FiltrosPortal())}
+        self.assertEqual(terminos, {'comida', 'fria', 'mala', 'temperatura'})
+
+
+class ComparacionPeriodosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sede = Sede.objects.create(nombre='Sede Comparada')
+        self.comedor_a = Comedor.objects.create(sede=sede, nombre='Comedor A')
+        self.comedor_b = Comedor.objects.create(sede=sede, nombre='Comedor B')
+        respuestas = [
+            (2, self.comedor_a, 2),
+            (3, self.comedor_a, 4),
+            (9, self.comedor_a, 5),
+            (10, self.comedor_b, 3),
+            (11, self.comedor_a, 5),
+            (20, self.comedor_a, 1),
+        ]
+        for dia, comedor, puntaje in respuestas:
+            RespuestaEncuesta.objects.create(
+                sede=sede,
+                comedor=comedor,
+                fecha_hora_registro=timezone.make_aware(datetime(2026, 3, dia, 12, 0)),
+                satisfaccion_general=puntaje,
+                calidad_comida=puntaje,
+                variedad_menu=puntaje,
+                limpieza_comedor=puntaje,
+                tiempo_atencion_fila=puntaje,
+            )
+        self.filtros = FiltrosPortal(fecha_inicio=date(2026, 3, 9), fecha_fin=date(2026, 3, 15), comparar='semana')
+
+    def test_periodos_previos(self):
+        marzo = FiltrosPortal(fecha_inicio=date(2026, 3, 1), fecha_fin=date(2026, 3, 31), comparar='mes')
+        self.assertEqual(marzo.periodo_previo().fecha_fin, date(2026, 2, 28))
+        anterior = FiltrosPortal(fecha_inicio=date(2026, 3, 9), fecha_fin=date(2026, 3, 15), comparar='anterior')
+        self.assertEqual(
+            (anterior.periodo_previo().fecha_inicio, anterior.periodo_previo().fecha_fin),
+            (date(2026, 3, 2), date(2026, 3, 8)),
+        )
+        self.assertEqual(FiltrosPortal(comparar='anio').periodo_previo(), None)
+
+    def test_kpis_y_ranking_comparados_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            kpis = calcular_kpis(self.filtros)
+        self.assertEqual(kpis['respuestas_total'], 3)
+        self.assertAlmostEqual(kpis['promedios']['promedio_satisfaccion_general'], 13 / 3)
+        self.assertEqual(kpis['comparacion']['respuestas_total'], 2)
+        self.assertAlmostEqual(kpis['comparacion']['promedios']['promedio_satisfaccion_general'], 3.0)
+        self.assertAlmostEqual(kpis['comparacion']['diferencias']['promedio_calidad'], 13 / 3 - 3)
+
+        obtener_nombres_catalogo()
+        with self.assertNumQueries(1):
+            ranking = calcular_ranking(self.filtros)['ranking_comedores']
+        self.assertEqual([fila['comedor_nombre'] for fila in ranking], ['Comedor A', 'Comedor B'])
+        self.assertAlmostEqual(ranking[0]['diferencia'], 2.0)
+        self.assertIsNone(ranking[1]['promedio_previo'])
+
+    def test_con_instantanea_coincide_con_la_consulta_en_vivo(self):
+        esperado = calcular_kpis(self.filtros)
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        with self.settings(ENCUESTAS_RUTA_INSTANTANEA=f'{carpeta.name}/instantanea.bin'):
+            call_command('construir_instantanea', '--corte', '2026-03-10', stdout=StringIO())
+            self.assertEqual(calcular_kpis(self.filtros), esperado)
+
+    def test_secciones_muestran_el_periodo_previo(self):
+        staff = get_user_model().objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        parametros = {'fecha_inicio': '2026-03-09', 'fecha_fin': '2026-03-15', 'comparar': 'semana'}
+
+        response = self.client.get(reverse('encuestas:portal_seccion', args=['kpis']), parametros)
+        self.assertContains(response, 'Comparado con 2026-03-02 a 2026-03-08')
+        self.assertContains(response, 'antes 3.00 (+1.33)')
+        response = self.client.get(reverse('encuestas:portal_seccion', args=['ranking']), parametros)
+        self.assertContains(response, 'antes 3.00 (+2.00)')
+
+
+class MapaCalorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sede = Sede.objects.create(nombre='Sede Horas')
+        comedor = Comedor.objects.create(sede=sede, nombre='Comedor Horas')
+        self.respuesta = RespuestaEncuesta.objects.create(
+            sede=sede,
+            comedor=comedor,
+            fecha_hora_registro=timezone.make_aware(datetime(2026, 3, 4, 13, 30)),
+            satisfaccion_general=2,
+            calidad_comida=3,
+            variedad_menu=3,
+            limpieza_comedor=4,
+            tiempo_atencion_fila=1,
+        )
+        self.staff_user = get_user_model().objects.create_user(
+            username='staff',
+            password='testpass123',
+            is_staff=True,
+        )
+
+    def test_columnas_de_tiempo_local_se_asignan_al_insertar(self):
+        self.assertEqual(self.respuesta.fecha_local, date(2026, 3, 4))
+        self.assertEqual(self.respuesta.hora_local, 13)
+        self.assertEqual(self.respuesta.dia_semana, 2)
+
+    def test_rellenar_campos_tiempo_completa_filas_pendientes(self):
+        RespuestaEncuesta.objects.update(fecha_local=None, hora_local=None, dia_semana=None)
+
+        call_command('rellenar_campos_tiempo', lote=1, stdout=StringIO())
+
+        self.respuesta.refresh_from_db()
+        self.assertEqual(self.respuesta.fecha_local, date(2026, 3, 4))
+        self.assertEqual(self.respuesta.hora_local, 13)
+
+    def test_mapa_calor_agrupa_por_dia_y_hora(self):
+        self.client.login(username='staff', password='testpass123')
+
+        response = self.client.get(
+            reverse('encuestas:portal_mapa_calor'),
+            {'metrica': 'tiempo_atencion_fila', 'formato': 'json', 'fecha_inicio': '2026-03-01'},
+        )
+
+        self.assertEqual(
+            response.json(),
+            {
+                'metrica': 'tiempo_atencion_fila',
+                'celdas': [{'dia_semana': 2, 'hora': 13, 'promedio': 1.0, 'total': 1}],
+            },
+        )
+        response = self.client.get(reverse('encuestas:portal_mapa_calor'))
+        self.assertContains(response, 'Miercoles')
 
 
 class ModelosValidacionTests(TestCase):
@@ -191,6 +1324,77 @@ class ModelosValidacionTests(TestCase):
             respuesta.full_clean()
 
 
+class InstantaneaDiasCerradosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        sede = Sede.objects.create(nombre='Sede Instantanea')
+        self.comedor = Comedor.objects.create(sede=sede, nombre='Comedor Instantanea')
+        self.turno = Turno.objects.create(nombre='Almuerzo Instantanea', modo_asignacion=Turno.ModoAsignacion.MANUAL)
+        ayer = timezone.now() - timezone.timedelta(days=1)
+        for fecha_hora, turno, puntaje in [(ayer, self.turno, 2), (ayer, None, 4), (timezone.now(), self.turno, 5)]:
+            RespuestaEncuesta.objects.create(
+                sede=sede,
+                comedor=self.comedor,
+                turno=turno,
+                fecha_hora_registro=fecha_hora,
+                satisfaccion_general=puntaje,
+                calidad_comida=puntaje,
+                variedad_menu=puntaje,
+                limpieza_comedor=puntaje,
+                tiempo_atencion_fila=puntaje,
+            )
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.ruta = f'{carpeta.name}/instantanea.bin'
+
+    def test_dias_cerrados_se_leen_del_archivo_y_hoy_en_vivo(self):
+        hoy = timezone.localdate()
+        ayer = hoy - timezone.timedelta(days=1)
+        esperado = calcular_kpis(FiltrosPortal())
+        with self.settings(ENCUESTAS_RUTA_INSTANTANEA=self.ruta):
+            call_command('construir_instantanea', stdout=StringIO())
+
+            with self.assertNumQueries(0):
+                cerrado = calcular_kpis(FiltrosPortal(fecha_fin=ayer))
+            self.assertEqual(cerrado['respuestas_total'], 2)
+            self.assertAlmostEqual(cerrado['promedios']['promedio_satisfaccion_general'], 3.0)
+            with self.assertNumQueries(0):
+                sin_turno = calcular_kpis(FiltrosPortal(fecha_fin=ayer, sin_turno=True))
+            self.assertEqual(sin_turno['respuestas_total'], 1)
+
+            with self.assertNumQueries(1):
+                completo = calcular_kpis(FiltrosPortal())
+            self.assertEqual(completo, esperado)
+            self.assertEqual(calcular_kpis(FiltrosPortal(fecha_inicio=hoy))['respuestas_total'], 1)
+
+
+class ArranqueRapidoTests(TestCase):
+    def test_omite_migrate_y_collectstatic_si_no_hay_cambios(self):
+        with tempfile.TemporaryDirectory() as carpeta, self.settings(STATIC_ROOT=carpeta):
+            salida = StringIO()
+            call_command('arranque_rapido', stdout=salida)
+            self.assertIn('Base default sin migraciones pendientes', salida.getvalue())
+            self.assertIn('Recolectando archivos estaticos', salida.getvalue())
+
+            salida = StringIO()
+            call_command('arranque_rapido', stdout=salida)
+            self.assertIn('Archivos estaticos sin cambios', salida.getvalue())
+
+    def test_build_recolecta_estaticos_sin_tocar_las_bases(self):
+        with tempfile.TemporaryDirectory() as carpeta, self.settings(STATIC_ROOT=carpeta):
+            salida = StringIO()
+            call_command('arranque_rapido', solo_estaticos=True, stdout=salida)
+            self.assertIn('Recolectando archivos estaticos', salida.getvalue())
+            self.assertNotIn('Base default', salida.getvalue())
+
+            salida = StringIO()
+            call_command('arranque_rapido', stdout=salida)
+            self.assertIn('Archivos estaticos sin cambios', salida.getvalue())
+
+    def test_solo_el_servidor_mide_el_arranque_en_frio(self):
+        self.assertIsNone(arranque._aplicacion_lista)
+
+
 class TabletResponsiveTests(TestCase):
     def setUp(self):
         self.sede = Sede.objects.create(nombre='Sede UI')
@@ -203,3 +1407,114 @@ class TabletResponsiveTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'meta name="viewport"')
         self.assertContains(response, '@media (max-width: 700px)')
+
+
+class PresupuestoConsultasTests(TestCase):
+    # Tope de consultas y de tiempo (ms, holgado) por vista, con la cache vacia (peor caso). Con
+    # REPORTE_PRESUPUESTOS=1 se imprimen los valores medidos para poder ajustar los topes. Se cuentan las
+    # consultas de todas las bases, incluidos los fragmentos por sede.
+    databases = '__all__'
+    reporte = []
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generar_dataset_2026', total=1500, seed=11, stdout=StringIO())
+        cls.staff = get_user_model().objects.create_superuser(username='presupuesto', password='testpass123')
+        cls.punto = PuntoCaptura.objects.order_by('identificador').first()
+        cls.comedor = cls.punto.comedor
+        cls.turno = Turno.objects.get(nombre='Almuerzo')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if os.getenv('REPORTE_PRESUPUESTOS') == '1':
+            sys.stderr.write('\nVista                                          consultas (tope)   ms (tope)\n')
+            for nombre, consultas, tope, duracion, tope_ms in cls.reporte:
+                sys.stderr.write(f'{nombre:<46} {consultas:>4} ({tope:>3}) {duracion:>9.1f} ({tope_ms})\n')
+
+    def _medir(self, nombre, tope, tope_ms, url, metodo='get', **kwargs):
+        cache.clear()
+        with self.subTest(vista=nombre), ExitStack() as pila:
+            capturas = [pila.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            inicio = reloj.perf_counter()
+            response = getattr(self.client, metodo)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            duracion = (reloj.perf_counter() - inicio) * 1000
+            pila.close()
+            consultas = sum(len(captura) for captura in capturas)
+            self.reporte.append((nombre, consultas, tope, duracion, tope_ms))
+            self.assertLess(response.status_code, 400, nombre)
+            self.assertLessEqual(consultas, tope, f'{nombre}: {consultas} consultas (tope {tope})')
+            self.assertLessEqual(duracion, tope_ms, f'{nombre}: {duracion:.0f} ms (tope {tope_ms} ms)')
+
+    def test_vistas_de_tablet(self):
+        identificador = self.punto.identificador
+        encuesta = reverse('encuestas:tablet_encuesta', args=[identificador])
+        self._medir('tablet_inicio', 2, 2000, reverse('encuestas:tablet_inicio'))
+        self._medir('tablet_inicio_alias', 2, 2000, reverse('encuestas:tablet_inicio_alias'))
+        self._medir('tablet_encuesta', 3, 2000, encuesta)
+        self._medir(
+            'tablet_encuesta (POST)',
+            14,
+            2000,
+            encuesta,
+            'post',
+            data={
+                'turno': self.turno.id,
+                'satisfaccion_general': 4,
+                'calidad_comida': 4,
+                'variedad_menu': 3,
+                'limpieza_comedor': 5,
+                'tiempo_atencion_fila': 4,
+                'comentario': 'Buena atencion',
+            },
+            HTTP_ACCEPT='application/json',
+        )
+        self._medir('tablet_gracias', 2, 2000, reverse('encuestas:tablet_gracias', args=[identificador]))
+        self._medir('tablet_latido', 3, 2000, reverse('encuestas:tablet_latido', args=[identificador]), 'post')
+        self._medir(
+            'tablet_telemetria',
+            1,
+            2000,
+            reverse('encuestas:tablet_telemetria', args=[identificador]),
+            'post',
+            data=json.dumps({'m': {'carga': [900]}}),
+            content_type='text/plain',
+        )
+
+    def test_vistas_del_portal(self):
+        self.client.force_login(self.staff)
+        filtros = {'fecha_inicio': '2026-03-01', 'fecha_fin': '2026-05-31', 'comedor': self.comedor.id}
+        self._medir('portal_inicio', 5, 2000, reverse('encuestas:portal_inicio'), data=filtros)
+        for seccion, tope in (('kpis', 3), ('alertas', 6), ('ranking', 6), ('comentarios', 6), ('facetas', 3)):
+            url = reverse('encuestas:portal_seccion', args=[seccion])
+            self._medir(f'portal_seccion {seccion}', tope, 2000, url)
+            self._medir(f'portal_seccion {seccion} (filtrada)', tope, 2000, url, data={**filtros, 'comparar': 'anio'})
+        self._medir('portal_exportar_csv', 6, 5000, reverse('encuestas:portal_exportar_csv'))
+        self._medir('portal_mapa_calor', 3, 2000, reverse('encuestas:portal_mapa_calor'))
+        self._medir('portal_impulsores', 6, 2000, reverse('encuestas:portal_impulsores'))
+        self._medir('portal_matriz', 6, 2000, reverse('encuestas:portal_matriz'))
+        self._medir('portal_matriz (csv)', 6, 2000, reverse('encuestas:portal_matriz'), data={'formato': 'csv'})
+        self._medir('portal_terminos', 8, 2000, reverse('encuestas:portal_terminos'), data={'termino': 'fila'})
+        self._medir('portal_tablets', 3, 2000, reverse('encuestas:portal_tablets'))
+        self._medir('portal_telemetria', 3, 2000, reverse('encuestas:portal_telemetria'))
+        self._medir('portal_cambios', 3, 2000, reverse('encuestas:portal_cambios'), data={'limite': 1000})
+        self._medir('portal_rechazos_envio', 3, 2000, reverse('encuestas:portal_rechazos_envio'))
+
+    def test_listados_del_admin(self):
+        self.client.force_login(self.staff)
+        # Los listados con llaves foraneas deben seguir en un numero fijo de consultas (list_select_related).
+        topes = {
+            Sede: 5,
+            Comedor: 6,
+            Turno: 5,
+            PuntoCaptura: 8,
+            ConfiguracionEncuesta: 5,
+            RespuestaEncuesta: 8,
+            AlertaComedor: 8,
+        }
+        for modelo, tope in topes.items():
+            nombre = f'admin {modelo._meta.model_name}'
+            url = reverse(f'admin:encuestas_{modelo._meta.model_name}_changelist')
+            self._medir(nombre, tope, 2000, url)
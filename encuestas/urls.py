@@ -1,6 +1,24 @@
 from django.urls import path
 
-from .views import portal_exportar_csv, portal_inicio, tablet_encuesta, tablet_gracias, tablet_inicio
+from .views import (
+    portal_cambios,
+    portal_exportar_csv,
+    portal_impulsores,
+    portal_inicio,
+    portal_inicio_async,
+    portal_mapa_calor,
+    portal_matriz,
+    portal_rechazos_envio,
+    portal_seccion,
+    portal_tablets,
+    portal_telemetria,
+    portal_terminos,
+    tablet_encuesta,
+    tablet_gracias,
+    tablet_inicio,
+    tablet_latido,
+    tablet_telemetria,
+)
 
 app_name = 'encuestas'
 
@@ -9,6 +27,18 @@ urlpatterns = [
     path('tablet/', tablet_inicio, name='tablet_inicio_alias'),
     path('tablet/<str:identificador>/', tablet_encuesta, name='tablet_encuesta'),
     path('tablet/<str:identificador>/gracias/', tablet_gracias, name='tablet_gracias'),
+    path('tablet/<str:identificador>/latido/', tablet_latido, name='tablet_latido'),
+    path('tablet/<str:identificador>/telemetria/', tablet_telemetria, name='tablet_telemetria'),
     path('portal/', portal_inicio, name='portal_inicio'),
+    path('portal/completo/', portal_inicio_async, name='portal_inicio_async'),
+    path('portal/secciones/<str:nombre>/', portal_seccion, name='portal_seccion'),
     path('portal/exportar.csv', portal_exportar_csv, name='portal_exportar_csv'),
+    path('portal/mapa-calor/', portal_mapa_calor, name='portal_mapa_calor'),
+    path('portal/impulsores/', portal_impulsores, name='portal_impulsores'),
+    path('portal/matriz/', portal_matriz, name='portal_matriz'),
+    path('portal/terminos/', portal_terminos, name='portal_terminos'),
+    path('portal/tablets/', portal_tablets, name='portal_tablets'),
+    path('portal/telemetria/', portal_telemetria, name='portal_telemetria'),
+    path('portal/cambios.json', portal_cambios, name='portal_cambios'),
+    path('portal/rechazos-envio.json', portal_rechazos_envio, name='portal_rechazos_envio'),
 ]
@@ -1,15 +1,48 @@
 import csv
-from datetime import date
+import heapq
+import hmac
+import json
+import logging
+import time
+from collections import Counter
+from operator import itemgetter
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Avg, Count
-from django.http import HttpRequest, HttpResponse
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
+from .analitica import IMPULSORES, analizar_impulsores
+from .cambios import listar_cambios
+from .catalogos import obtener_nombres_catalogo, obtener_opciones_filtros, obtener_turnos_activos
+from .filtros import COMPARACIONES, FiltrosPortal
 from .forms import EncuestaTabletForm
-from .models import Comedor, ConfiguracionEncuesta, PuntoCaptura, RespuestaEncuesta, Sede, Turno
+from .fragmentos import repartir
+from .latidos import estado_puntos, registrar_envio, registrar_latido
+from .limites import limitar_envios_tablet, obtener_limites_puntos, obtener_rechazos
+from .models import ConfiguracionEncuesta, PuntoCaptura, RespuestaEncuesta, Turno
+from .paginas import MARCADOR_CSRF, guardar_pagina_tablet, obtener_pagina_tablet
+from .reportes import calcular_matriz_comedores, calcular_portal_concurrente, calcular_seccion, clave_seccion
+from .telemetria import METRICAS_TELEMETRIA, TAMANO_MAXIMO_LOTE, leer_lote, registrar_lote, resumen_telemetria
+from .terminos import comentarios_con_termino, normalizar_terminos, terminos_frecuentes
+
+logger = logging.getLogger(__name__)
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes', 'Sabado', 'Domingo']
+SECCIONES_PORTAL = ['kpis', 'alertas', 'ranking', 'comentarios']
+# Secciones sin fragmento HTML: solo se sirven como JSON.
+SECCIONES_JSON = ['facetas']
 
 
 def tablet_inicio(request: HttpRequest) -> HttpResponse:
@@ -22,16 +55,22 @@ def tablet_inicio(request: HttpRequest) -> HttpResponse:
     return render(request, 'encuestas/tablet_inicio.html', contexto)
 
 
+@limitar_envios_tablet
 def tablet_encuesta(request: HttpRequest, identificador: str) -> HttpResponse:
+    turno_automatico, requiere_turno_manual = _estado_turno()
+    estado_turno = str(turno_automatico.pk) if turno_automatico else 'manual' if requiere_turno_manual else 'libre'
+    if request.method != 'POST':
+        html = obtener_pagina_tablet(identificador, estado_turno)
+        if html is not None:
+            return HttpResponse(html.replace(MARCADOR_CSRF, get_token(request)))
+
     punto = get_object_or_404(
         PuntoCaptura.objects.select_related('comedor', 'comedor__sede', 'turno_defecto'),
         identificador=identificador,
         activo=True,
     )
     configuracion = _obtener_configuracion_encuesta()
-    turno_automatico = _obtener_turno_automatico()
     turnos_disponibles = Turno.objects.filter(activo=True).order_by('nombre')
-    requiere_turno_manual = turno_automatico is None and turnos_disponibles.exists()
 
     if request.method == 'POST':
         formulario = EncuestaTabletForm(
@@ -58,7 +97,12 @@ def tablet_encuesta(request: HttpRequest, identificador: str) -> HttpResponse:
                 tiempo_atencion_fila=formulario.cleaned_data['tiempo_atencion_fila'],
                 comentario=formulario.cleaned_data.get('comentario', ''),
             )
+            registrar_envio(identificador)
+            if _espera_json(request):
+                return JsonResponse({'ok': True, 'estado_turno': estado_turno}, status=201)
             return redirect('encuestas:tablet_gracias', identificador=identificador)
+        if _espera_json(request):
+            return JsonResponse({'ok': False, 'errores': formulario.errors.get_json_data()}, status=400)
     else:
         formulario = EncuestaTabletForm(
             mostrar_comentario=configuracion.pregunta_abierta_activa,
@@ -70,10 +114,23 @@ def tablet_encuesta(request: HttpRequest, identificador: str) -> HttpResponse:
         'configuracion': configuracion,
         'formulario': formulario,
         'punto': punto,
+        'latido_url': reverse('encuestas:tablet_latido', args=[identificador]),
+        'telemetria_url': reverse('encuestas:tablet_telemetria', args=[identificador]),
         'requiere_turno_manual': requiere_turno_manual,
         'turno_automatico': turno_automatico,
+        'estado_turno': estado_turno,
     }
-    return render(request, 'encuestas/tablet_encuesta.html', contexto)
+    if request.method == 'POST':
+        return render(request, 'encuestas/tablet_encuesta.html', contexto)
+
+    # La pagina sin errores solo depende del punto, del estado del turno y de la configuracion.
+    html = render_to_string(
+        'encuestas/tablet_encuesta.html',
+        {**contexto, 'csrf_token': MARCADOR_CSRF},
+        request=request,
+    )
+    guardar_pagina_tablet(identificador, estado_turno, html)
+    return HttpResponse(html.replace(MARCADOR_CSRF, get_token(request)))
 
 
 def tablet_gracias(request: HttpRequest, identificador: str) -> HttpResponse:
@@ -87,55 +144,369 @@ def tablet_gracias(request: HttpRequest, identificador: str) -> HttpResponse:
     return render(request, 'encuestas/tablet_gracias.html', contexto)
 
 
+@csrf_exempt
+@require_POST
+def tablet_latido(request: HttpRequest, identificador: str) -> HttpResponse:
+    if identificador not in obtener_limites_puntos():
+        raise Http404('Punto de captura no encontrado.')
+    registrar_latido(identificador)
+    return HttpResponse(status=204)
+
+
+@csrf_exempt
+@require_POST
+def tablet_telemetria(request: HttpRequest, identificador: str) -> HttpResponse:
+    if identificador not in obtener_limites_puntos():
+        raise Http404('Punto de captura no encontrado.')
+    if len(request.body) > TAMANO_MAXIMO_LOTE:
+        return HttpResponse('Lote demasiado grande.', status=413)
+    try:
+        lote = leer_lote(request.body)
+    except ValueError as error:
+        return HttpResponse(str(error), status=400)
+    registrar_lote(identificador, lote)
+    return HttpResponse(status=204)
+
+
 @staff_member_required
 def portal_inicio(request: HttpRequest) -> HttpResponse:
-    respuestas = _filtrar_respuestas(request)
-    promedios = respuestas.aggregate(
-        promedio_satisfaccion_general=Avg('satisfaccion_general'),
-        promedio_calidad=Avg('calidad_comida'),
-        promedio_variedad=Avg('variedad_menu'),
-        promedio_limpieza=Avg('limpieza_comedor'),
-        promedio_tiempo=Avg('tiempo_atencion_fila'),
-    )
-    ranking_comedores = (
-        respuestas.values('comedor__nombre', 'comedor__sede__nombre')
-        .annotate(promedio=Avg('satisfaccion_general'), total=Count('id'))
-        .order_by('-promedio', '-total', 'comedor__nombre')
+    opciones = obtener_opciones_filtros()
+    querystring = request.GET.urlencode()
+    contexto = {
+        'filtros': _contexto_filtros(request),
+        'secciones': {
+            nombre: reverse('encuestas:portal_seccion', args=[nombre]) + (f'?{querystring}' if querystring else '')
+            for nombre in SECCIONES_PORTAL
+        },
+        'facetas_url': reverse('encuestas:portal_seccion', args=['facetas']) + f'?formato=json&{querystring}',
+        'sedes': opciones['sedes'],
+        'comedores': opciones['comedores'],
+        'turnos': opciones['turnos'],
+        'comparaciones': COMPARACIONES,
+        'querystring': querystring,
+    }
+    return render(request, 'encuestas/portal_inicio.html', contexto)
+
+
+async def portal_inicio_async(request: HttpRequest) -> HttpResponse:
+    # staff_member_required no admite vistas async en Django 5.0; se replica la verificacion.
+    usuario = await request.auser()
+    if not (usuario.is_active and usuario.is_staff):
+        return redirect_to_login(request.get_full_path(), reverse('admin:login'))
+
+    filtros = FiltrosPortal.desde_request(request)
+    aproximado = bool(request.GET.get('aproximado'))
+    inicio = time.perf_counter()
+    resultados = await calcular_portal_concurrente(filtros, aproximado)
+    duracion = (time.perf_counter() - inicio) * 1000
+
+    response = await sync_to_async(_renderizar_portal_completo)(request, resultados)
+    response['Server-Timing'] = f'consultas;dur={duracion:.1f}'
+    return response
+
+
+@staff_member_required
+def portal_seccion(request: HttpRequest, nombre: str) -> HttpResponse:
+    if nombre not in SECCIONES_PORTAL and nombre not in SECCIONES_JSON:
+        raise Http404('Seccion no encontrada.')
+    formato = 'json' if nombre in SECCIONES_JSON or request.GET.get('formato') == 'json' else 'html'
+    inicio = time.perf_counter()
+    clave = f'{clave_seccion(nombre, request.GET)}:{formato}'
+    contenido = cache.get(clave)
+    origen = 'hit'
+    if contenido is None:
+        origen = 'miss'
+        filtros = FiltrosPortal.desde_request(request)
+        aproximado = bool(request.GET.get('aproximado'))
+        datos = calcular_seccion(nombre, filtros, aproximado)
+        if formato == 'json':
+            contenido = json.dumps(datos, cls=DjangoJSONEncoder)
+        else:
+            contenido = render_to_string(f'encuestas/secciones/{nombre}.html', datos, request=request)
+        cache.set(clave, contenido, settings.ENCUESTAS_TIEMPO_CACHE_SECCIONES)
+
+    duracion = (time.perf_counter() - inicio) * 1000
+    logger.info('Seccion %s del portal servida en %.1f ms (cache %s)', nombre, duracion, origen)
+    response = HttpResponse(
+        contenido,
+        content_type='application/json' if formato == 'json' else 'text/html; charset=utf-8',
     )
-    comentarios = (
-        respuestas.exclude(comentario='')
-        .select_related('sede', 'comedor', 'turno')
-        .order_by('-fecha_hora_registro')
+    response['Server-Timing'] = f'{nombre};desc="cache {origen}";dur={duracion:.1f}'
+    return response
+
+
+@staff_member_required
+def portal_exportar_csv(request: HttpRequest) -> StreamingHttpResponse:
+    columnas = [
+        'fecha_hora_registro',
+        'sede_id',
+        'comedor_id',
+        'turno_id',
+        'satisfaccion_general',
+        'calidad_comida',
+        'variedad_menu',
+        'limpieza_comedor',
+        'tiempo_atencion_fila',
+        'comentario',
+    ]
+    # Cada base entrega sus filas ordenadas por fecha; heapq.merge las intercala sin cargarlas.
+    respuestas = heapq.merge(
+        *(respuestas.values_list(*columnas).iterator(chunk_size=2000) for respuestas in _repartir_respuestas(request)),
+        key=itemgetter(0),
+        reverse=True,
     )
+    nombres = obtener_nombres_catalogo()
+    response = StreamingHttpResponse(_filas_csv(respuestas, nombres), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="reporte_encuestas.csv"'
+    return response
+
+
+@staff_member_required
+def portal_mapa_calor(request: HttpRequest) -> HttpResponse:
+    metrica = request.GET.get('metrica')
+    if metrica not in RespuestaEncuesta.campos_puntaje:
+        metrica = 'satisfaccion_general'
+    sumas = Counter()
+    totales = Counter()
+    for respuestas in _repartir_respuestas(request):
+        filas = (
+            respuestas.filter(dia_semana__isnull=False)
+            .order_by()
+            .values_list('dia_semana', 'hora_local')
+            .annotate(suma=Sum(metrica), total=Count('id'))
+        )
+        for dia, hora, suma, total in filas:
+            sumas[dia, hora] += suma
+            totales[dia, hora] += total
+    celdas = {
+        (dia, hora): {'promedio': sumas[dia, hora] / total, 'total': total} for (dia, hora), total in totales.items()
+    }
 
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(
+            {
+                'metrica': metrica,
+                'celdas': [
+                    {'dia_semana': dia, 'hora': hora, 'promedio': fila['promedio'], 'total': fila['total']}
+                    for (dia, hora), fila in sorted(celdas.items())
+                ],
+            }
+        )
+
+    horas = list(range(min(hora for _, hora in celdas), max(hora for _, hora in celdas) + 1)) if celdas else []
+    matriz = []
+    for dia, nombre_dia in enumerate(DIAS_SEMANA):
+        fila_matriz = []
+        for hora in horas:
+            celda = celdas.get((dia, hora))
+            if celda:
+                celda = {**celda, 'tono': round((celda['promedio'] - 1) / 4 * 120)}
+            fila_matriz.append(celda)
+        matriz.append({'dia': nombre_dia, 'celdas': fila_matriz})
+
+    filtros = request.GET.copy()
+    filtros.pop('metrica', None)
     contexto = {
-        'respuestas_total': respuestas.count(),
-        'promedios': promedios,
-        'ranking_comedores': ranking_comedores,
-        'comentarios': comentarios,
-        'filtros': {
-            'fecha_inicio': request.GET.get('fecha_inicio', ''),
-            'fecha_fin': request.GET.get('fecha_fin', ''),
-            'sede_id': request.GET.get('sede', ''),
-            'comedor_id': request.GET.get('comedor', ''),
-            'turno_id': request.GET.get('turno', ''),
-        },
-        'sedes': Sede.objects.filter(activo=True).order_by('nombre'),
-        'comedores': Comedor.objects.filter(activo=True).select_related('sede').order_by('sede__nombre', 'nombre'),
-        'turnos': Turno.objects.filter(activo=True).order_by('nombre'),
+        'metrica': metrica,
+        'metricas': RespuestaEncuesta.campos_puntaje,
+        'horas': horas,
+        'matriz': matriz,
+        'filtros_ocultos': [(clave, valor) for clave, valor in filtros.items() if valor],
         'querystring': request.GET.urlencode(),
     }
-    return render(request, 'encuestas/portal_inicio.html', contexto)
+    return render(request, 'encuestas/portal_mapa_calor.html', contexto)
 
 
 @staff_member_required
-def portal_exportar_csv(request: HttpRequest) -> HttpResponse:
-    respuestas = _filtrar_respuestas(request).select_related('sede', 'comedor', 'turno')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="reporte_encuestas.csv"'
+def portal_impulsores(request: HttpRequest) -> HttpResponse:
+    analisis = analizar_impulsores(FiltrosPortal.desde_request(request))
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(analisis)
+
+    resultados = [('Todos los comedores', analisis['general'])] + [
+        (f"{resultado['sede_nombre']} - {resultado['comedor_nombre']}", resultado)
+        for resultado in analisis['comedores']
+    ]
+    contexto = {
+        'impulsores': IMPULSORES,
+        'filas': [
+            {
+                'nombre': nombre,
+                'resultado': resultado,
+                'valores': [
+                    {
+                        'correlacion': resultado['correlaciones'][campo],
+                        'peso': resultado['pesos'][campo],
+                        'principal': campo == resultado['principal'],
+                    }
+                    for campo in IMPULSORES
+                ],
+            }
+            for nombre, resultado in resultados
+        ],
+        'querystring': request.GET.urlencode(),
+    }
+    return render(request, 'encuestas/portal_impulsores.html', contexto)
+
+
+@staff_member_required
+def portal_matriz(request: HttpRequest) -> HttpResponse:
+    matriz = calcular_matriz_comedores(FiltrosPortal.desde_request(request))
+    formato = request.GET.get('formato')
+    if formato == 'json':
+        return JsonResponse(matriz)
+    if formato == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="matriz_comedores.csv"'
+        writer = csv.writer(response)
+        writer.writerow(
+            ['sede', 'comedor', 'respuestas']
+            + [f'{campo}_{columna}' for campo in matriz['metricas'] for columna in ('promedio', 'vs_sede', 'vs_global')]
+        )
+        for comedor in matriz['comedores']:
+            valores = []
+            for campo in matriz['metricas']:
+                celda = comedor['metricas'][campo]
+                valores += [f"{celda['promedio']:.3f}", f"{celda['delta_sede']:+.3f}", f"{celda['delta_global']:+.3f}"]
+            writer.writerow([comedor['sede_nombre'], comedor['comedor_nombre'], comedor['total'], *valores])
+        return response
+
+    contexto = {
+        'metricas': matriz['metricas'],
+        'general': matriz['general'],
+        'filas': [
+            {**comedor, 'celdas': [comedor['metricas'][campo] for campo in matriz['metricas']]}
+            for comedor in matriz['comedores']
+        ],
+        'querystring': request.GET.urlencode(),
+    }
+    return render(request, 'encuestas/portal_matriz.html', contexto)
+
 
-    writer = csv.writer(response)
-    writer.writerow(
+@staff_member_required
+def portal_terminos(request: HttpRequest) -> HttpResponse:
+    filtros = FiltrosPortal.desde_request(request)
+    terminos = terminos_frecuentes(filtros)
+    # El termino buscado pasa por la misma normalizacion que el indice ("Filas" -> "filas").
+    termino = min(normalizar_terminos(request.GET.get('termino', '')), default='')
+    comentarios = comentarios_con_termino(filtros, termino) if termino else []
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({'terminos': terminos, 'termino': termino, 'comentarios': comentarios})
+
+    parametros = request.GET.copy()
+    parametros.pop('termino', None)
+    contexto = {
+        'terminos': terminos,
+        'maximo': terminos[0]['total'] if terminos else 0,
+        'termino': termino,
+        'comentarios': comentarios,
+        'querystring': parametros.urlencode(),
+    }
+    return render(request, 'encuestas/portal_terminos.html', contexto)
+
+
+@staff_member_required
+def portal_tablets(request: HttpRequest) -> HttpResponse:
+    puntos = list(
+        PuntoCaptura.objects.filter(activo=True)
+        .select_related('comedor', 'comedor__sede')
+        .order_by('identificador')
+    )
+    rechazos = obtener_rechazos([punto.identificador for punto in puntos])
+    estados = estado_puntos(puntos)
+    for estado in estados:
+        estado['rechazos'] = rechazos[estado['punto'].identificador]
+    contexto = {
+        'estados': estados,
+        'vigencia_latido': settings.ENCUESTAS_VIGENCIA_LATIDO,
+    }
+    return render(request, 'encuestas/portal_tablets.html', contexto)
+
+
+@staff_member_required
+def portal_telemetria(request: HttpRequest) -> HttpResponse:
+    horas = request.GET.get('horas', '24')
+    horas = int(horas) if horas.isdigit() and 0 < int(horas) <= 24 * 31 else 24
+    resumen = resumen_telemetria(timezone.now() - timezone.timedelta(hours=horas))
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(
+            {
+                'horas': horas,
+                'puntos': [
+                    {
+                        'identificador': fila['punto'].identificador,
+                        'metricas': fila['metricas'],
+                        'errores': fila['errores'],
+                    }
+                    for fila in resumen
+                ],
+            }
+        )
+
+    contexto = {
+        'horas': horas,
+        'metricas': METRICAS_TELEMETRIA,
+        'filas': [
+            {**fila, 'valores': [fila['metricas'][metrica] for metrica in METRICAS_TELEMETRIA]} for fila in resumen
+        ],
+    }
+    return render(request, 'encuestas/portal_telemetria.html', contexto)
+
+
+def portal_cambios(request: HttpRequest) -> JsonResponse:
+    # Sin decorador de staff: los procesos de BI leen con el token de ENCUESTAS_TOKEN_CAMBIOS.
+    if not (_token_cambios_valido(request) or (request.user.is_active and request.user.is_staff)):
+        return JsonResponse({'error': 'No autorizado.'}, status=401)
+    desde = request.GET.get('desde', '0')
+    limite = request.GET.get('limite', '500')
+    desde = int(desde) if desde.isdigit() else 0
+    limite = min(int(limite), 1000) if limite.isdigit() and int(limite) > 0 else 500
+    return JsonResponse(listar_cambios(desde, limite))
+
+
+@staff_member_required
+def portal_rechazos_envio(request: HttpRequest) -> JsonResponse:
+    identificadores = list(PuntoCaptura.objects.order_by('identificador').values_list('identificador', flat=True))
+    return JsonResponse({'rechazos': obtener_rechazos(identificadores)})
+
+
+def _token_cambios_valido(request: HttpRequest) -> bool:
+    token = settings.ENCUESTAS_TOKEN_CAMBIOS
+    cabecera = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(cabecera.encode(), f'Bearer {token}'.encode())
+
+
+def _espera_json(request: HttpRequest) -> bool:
+    return 'application/json' in request.headers.get('Accept', '')
+
+
+def _obtener_configuracion_encuesta() -> ConfiguracionEncuesta:
+    configuracion, _ = ConfiguracionEncuesta.objects.get_or_create(nombre='configuracion_principal')
+    return configuracion
+
+
+def _estado_turno() -> tuple[Turno | None, bool]:
+    turnos = obtener_turnos_activos()
+    hora_actual = timezone.localtime().time()
+    turno_automatico = next(
+        (
+            turno
+            for turno in turnos
+            if turno.modo_asignacion == Turno.ModoAsignacion.HORARIO
+            and turno.hora_inicio is not None
+            and turno.hora_fin is not None
+            and turno.hora_inicio <= hora_actual < turno.hora_fin
+        ),
+        None,
+    )
+    return turno_automatico, turno_automatico is None and bool(turnos)
+
+
+def _filas_csv(respuestas, nombres: dict):
+    # Se escribe fila por fila sobre un cursor del lado del servidor (en PostgreSQL), de modo que
+    # ni la consulta ni el archivo completo quedan en memoria.
+    writer = csv.writer(_BufferEco())
+    yield writer.writerow(
         [
             'fecha_hora_registro',
             'sede',
@@ -149,73 +520,53 @@ def portal_exportar_csv(request: HttpRequest) -> HttpResponse:
             'comentario',
         ]
     )
-    for respuesta in respuestas:
-        writer.writerow(
+    for fecha_hora_registro, sede_id, comedor_id, turno_id, *puntajes, comentario in respuestas:
+        yield writer.writerow(
             [
-                timezone.localtime(respuesta.fecha_hora_registro).strftime('%Y-%m-%d %H:%M:%S'),
-                respuesta.sede.nombre,
-                respuesta.comedor.nombre,
-                respuesta.turno.nombre if respuesta.turno else '',
-                respuesta.satisfaccion_general,
-                respuesta.calidad_comida,
-                respuesta.variedad_menu,
-                respuesta.limpieza_comedor,
-                respuesta.tiempo_atencion_fila,
-                respuesta.comentario,
+                timezone.localtime(fecha_hora_registro).strftime('%Y-%m-%d %H:%M:%S'),
+                nombres['sedes'].get(sede_id, ''),
+                nombres['comedores'].get(comedor_id, ''),
+                nombres['turnos'].get(turno_id, '') if turno_id else '',
+                *puntajes,
+                comentario,
             ]
         )
-    return response
-
-
-def _obtener_configuracion_encuesta() -> ConfiguracionEncuesta:
-    configuracion, _ = ConfiguracionEncuesta.objects.get_or_create(nombre='configuracion_principal')
-    return configuracion
 
 
-def _obtener_turno_automatico() -> Turno | None:
-    hora_actual = timezone.localtime().time()
-    return (
-        Turno.objects.filter(
-            activo=True,
-            modo_asignacion=Turno.ModoAsignacion.HORARIO,
-            hora_inicio__lte=hora_actual,
-            hora_fin__gt=hora_actual,
-        )
-        .order_by('hora_inicio')
-        .first()
-    )
-
+class _BufferEco:
+    def write(self, valor: str) -> str:
+        return valor
 
-def _filtrar_respuestas(request: HttpRequest):
-    respuestas = RespuestaEncuesta.objects.all().select_related('sede', 'comedor', 'turno')
 
-    sede_id = request.GET.get('sede')
-    comedor_id = request.GET.get('comedor')
-    turno_id = request.GET.get('turno')
-    fecha_inicio = _parsear_fecha(request.GET.get('fecha_inicio'))
-    fecha_fin = _parsear_fecha(request.GET.get('fecha_fin'))
+def _renderizar_portal_completo(request: HttpRequest, resultados: dict) -> HttpResponse:
+    contexto = {
+        'filtros': _contexto_filtros(request),
+        'contenido_secciones': {
+            nombre: render_to_string(f'encuestas/secciones/{nombre}.html', resultados[nombre], request=request)
+            for nombre in SECCIONES_PORTAL
+        },
+        'facetas': resultados['facetas']['facetas'],
+        'sedes': resultados['opciones']['sedes'],
+        'comedores': resultados['opciones']['comedores'],
+        'turnos': resultados['opciones']['turnos'],
+        'comparaciones': COMPARACIONES,
+        'querystring': request.GET.urlencode(),
+    }
+    return render(request, 'encuestas/portal_inicio.html', contexto)
 
-    if sede_id:
-        respuestas = respuestas.filter(sede_id=sede_id)
-    if comedor_id:
-        respuestas = respuestas.filter(comedor_id=comedor_id)
-    if turno_id:
-        if turno_id == 'sin_turno':
-            respuestas = respuestas.filter(turno__isnull=True)
-        else:
-            respuestas = respuestas.filter(turno_id=turno_id)
-    if fecha_inicio:
-        respuestas = respuestas.filter(fecha_hora_registro__date__gte=fecha_inicio)
-    if fecha_fin:
-        respuestas = respuestas.filter(fecha_hora_registro__date__lte=fecha_fin)
 
-    return respuestas
+def _contexto_filtros(request: HttpRequest) -> dict:
+    return {
+        'fecha_inicio': request.GET.get('fecha_inicio', ''),
+        'fecha_fin': request.GET.get('fecha_fin', ''),
+        'sede_id': request.GET.get('sede', ''),
+        'comedor_id': request.GET.get('comedor', ''),
+        'turno_id': request.GET.get('turno', ''),
+        'comparar': request.GET.get('comparar', ''),
+        'aproximado': bool(request.GET.get('aproximado')),
+    }
 
 
-def _parsear_fecha(valor: str | None) -> date | None:
-    if not valor:
-        return None
-    try:
-        return date.fromisoformat(valor)
-    except ValueError:
-        return None
+def _repartir_respuestas(request: HttpRequest) -> list:
+    filtros = FiltrosPortal.desde_request(request)
+    return repartir(filtros.aplicar(RespuestaEncuesta.objects.all()), filtros.sede_id)
@@ -6,7 +6,8 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    pruebas = sys.argv[1:2] == ['test']
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings_pruebas' if pruebas else 'mysite.settings')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
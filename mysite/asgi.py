@@ -11,6 +11,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from encuestas.arranque import esperar_primera_solicitud
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_asgi_application()
+
+# Solo el servidor carga este modulo: las pruebas y los comandos de manage.py no miden el arranque en frio.
+esperar_primera_solicitud()
@@ -0,0 +1,6 @@
+# Configuracion de pruebas: manage.py la usa con "test". Declara un fragmento 'norte' (sin sedes asignadas)
+# para ejercitar el reparto de respuestas entre bases reales.
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, _configurar_base, urlparse
+
+DATABASES.setdefault('norte', _configurar_base(urlparse(''), str(BASE_DIR / 'db_norte.sqlite3')))